@@ -3,6 +3,12 @@ ASGI config for agriboost project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve it with an ASGI server (e.g. ``uvicorn agriboost.asgi:application``) so
+the async views run on the event loop instead of one thread per request:
+the live sensor feed (/api/sensors/live/) holds its Server-Sent Events and
+long-poll connections there, and the sensor feed (/api/sensors/feed/)
+awaits Firebase through the pooled async RTDB client (sensors.rtdb_async).
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -14,3 +20,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'agriboost.settings')
 
 application = get_asgi_application()
+
+# Load the fertilizer model before the first request instead of during it
+from sensors.model_registry import FertilizerModels  # noqa: E402
+
+FertilizerModels.warm_up()
@@ -0,0 +1,293 @@
+"""
+Streaming CSV and Parquet exports of history tables.
+
+Rows are read with ``values_list(...).iterator(chunk_size=EXPORT_CHUNK_SIZE)``
+(a server-side cursor where the database has one) and written out chunk
+by chunk, so an export holds one chunk in memory however many rows it
+has:
+
+- CSV: each chunk is written to a reused buffer and sent as one piece.
+- Parquet: each chunk becomes one row group; the file footer goes out
+  last. Needs pyarrow, which is optional: without it only CSV is offered.
+
+``EXPORTS`` lists what can be exported. ``ExportView`` serves one of them
+as a StreamingHttpResponse, limited to the requesting user's rows; the
+``export_history`` management command writes any of them to a file.
+
+Under ASGI Django consumes a synchronous streaming iterator with
+``sync_to_async(list)`` -- the whole export in memory before the first
+byte is sent -- so there the view hands it an async iterator
+(``aiter_stream``) that pulls one piece at a time instead.
+"""
+
+import csv
+import io
+from datetime import datetime
+from typing import AsyncIterator, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence
+
+from asgiref.sync import sync_to_async
+from django.apps import apps
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import models
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+
+class ExportSpec(NamedTuple):
+    """One exportable table."""
+    model: str                  # app_label.ModelName
+    columns: Sequence[str]      # values_list() lookups, also the column names
+    ordering: Sequence[str]
+    user_field: Optional[str]   # lookup of the owning user (None: not per-user)
+
+
+EXPORTS: Dict[str, ExportSpec] = {
+    'sensor_readings': ExportSpec(
+        'sensors.SensorReading',
+        ('device_id', 'label', 'timestamp', 'temperature', 'humidity', 'soil_moisture', 'soil_ph',
+         'ec', 'nitrogen', 'phosphorous', 'potassium', 'battery', 'anomalies'),
+        ('timestamp', 'id'),
+        None,
+    ),
+    'fertilizer_predictions': ExportSpec(
+        'sensors.FertilizerPrediction',
+        ('id', 'user__email', 'created_at', 'temperature', 'humidity', 'moisture', 'soil_ph', 'ec',
+         'nitrogen', 'phosphorous', 'potassium', 'soil_type', 'crop_type', 'recommended_fertilizer',
+         'fertilizer_amount', 'confidence_score', 'recommendation_details', 'alternatives'),
+        ('created_at', 'id'),
+        'user',
+    ),
+    'disease_history': ExportSpec(
+        'disease.DiseaseHistory',
+        ('id', 'user__email', 'created_at', 'label', 'confidence', 'recommendation'),
+        ('created_at', 'id'),
+        'user',
+    ),
+    'user_history': ExportSpec(
+        'users.UserHistory',
+        ('id', 'user__email', 'created_at', 'action', 'description', 'details'),
+        ('created_at', 'id'),
+        'user',
+    ),
+}
+
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+
+def available_formats() -> List[str]:
+    return ['csv', 'parquet'] if pq is not None else ['csv']
+
+
+def chunk_size() -> int:
+    return getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+
+
+def queryset_for(name: str, user=None) -> models.QuerySet:
+    """The rows of an export, limited to user's own rows when given."""
+    spec = EXPORTS[name]
+    queryset = apps.get_model(spec.model).objects.order_by(*spec.ordering)
+    if user is not None and spec.user_field:
+        queryset = queryset.filter(**{spec.user_field: user})
+    return queryset
+
+
+def _column_field(model, lookup: str) -> models.Field:
+    """Model field a values_list() lookup ends at (following relations)."""
+    field = None
+    for part in lookup.split('__'):
+        field = model._meta.get_field(part)
+        if field.is_relation:
+            model = field.related_model
+    return field
+
+
+def iter_chunks(queryset: models.QuerySet, columns: Sequence[str], size: Optional[int] = None) -> Iterator[List[tuple]]:
+    """Yield the queryset's rows as lists of at most size tuples."""
+    size = size or chunk_size()
+    chunk = []
+    for row in queryset.values_list(*columns).iterator(chunk_size=size):
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _csv_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def csv_stream(chunks: Iterable[List[tuple]], columns: Sequence[str]) -> Iterator[bytes]:
+    """Encode row chunks as CSV, one piece per chunk after the header."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    yield buffer.getvalue().encode('utf-8')
+    for chunk in chunks:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([[_csv_value(value) for value in row] for row in chunk])
+        yield buffer.getvalue().encode('utf-8')
+
+
+class _Drain(io.RawIOBase):
+    """Write-only file collecting what ParquetWriter writes until it is taken."""
+
+    def __init__(self):
+        super().__init__()
+        self._parts: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._parts.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def take(self) -> bytes:
+        data, self._parts = b''.join(self._parts), []
+        return data
+
+
+def _arrow_type(field: models.Field):
+    if isinstance(field, models.DateTimeField):
+        return pa.timestamp('us', tz='UTC')
+    if isinstance(field, models.FloatField):
+        return pa.float64()
+    if isinstance(field, models.BooleanField):
+        return pa.bool_()
+    if isinstance(field, (models.IntegerField, models.AutoField)):
+        return pa.int64()
+    return pa.string()
+
+
+def parquet_schema(model, columns: Sequence[str]):
+    return pa.schema([
+        pa.field(column, _arrow_type(_column_field(model, column))) for column in columns
+    ])
+
+
+def parquet_stream(chunks: Iterable[List[tuple]], schema) -> Iterator[bytes]:
+    """Encode row chunks as a Parquet file, one row group per chunk."""
+    sink = _Drain()
+    writer = pq.ParquetWriter(sink, schema, compression='snappy')
+    try:
+        for chunk in chunks:
+            columns = list(zip(*chunk))
+            table = pa.Table.from_arrays(
+                [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+                schema=schema,
+            )
+            writer.write_table(table, row_group_size=len(chunk))
+            data = sink.take()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    yield sink.take()
+
+
+def export_stream(name: str, file_format: str, queryset: Optional[models.QuerySet] = None,
+                  size: Optional[int] = None) -> Iterator[bytes]:
+    """
+    Stream an export as bytes.
+
+    Args:
+        name: Key of EXPORTS
+        file_format: 'csv' or 'parquet'
+        queryset: Rows to export (default: all of them)
+        size: Rows per chunk (default: EXPORT_CHUNK_SIZE)
+
+    Raises:
+        ValueError: The format is unknown or needs a library that is not installed
+    """
+    if file_format not in available_formats():
+        raise ValueError(f"Unsupported export format {file_format!r}; available: {', '.join(available_formats())}")
+    spec = EXPORTS[name]
+    if queryset is None:
+        queryset = queryset_for(name)
+    chunks = iter_chunks(queryset, spec.columns, size)
+    if file_format == 'parquet':
+        return parquet_stream(chunks, parquet_schema(queryset.model, spec.columns))
+    return csv_stream(chunks, spec.columns)
+
+
+async def aiter_stream(stream: Iterator[bytes]) -> AsyncIterator[bytes]:
+    """
+    Serve an export stream to an async response one piece at a time.
+
+    Each piece is produced in the thread that runs the request's sync code,
+    so the rows' database cursor stays on one connection.
+    """
+    pull = sync_to_async(next, thread_sensitive=True)
+    try:
+        while True:
+            piece = await pull(stream, None)
+            if piece is None:
+                return
+            yield piece
+    finally:
+        await sync_to_async(stream.close, thread_sensitive=True)()
+
+
+def export_filename(name: str, file_format: str) -> str:
+    return f"{name}-{timezone.localtime():%Y%m%d-%H%M%S}.{file_format}"
+
+
+class ExportView(APIView):
+    """
+    Stream one of EXPORTS as a file download.
+
+    Query parameters: ``type`` ('csv', the default, or 'parquet'). Rows of
+    per-user tables are limited to the requesting user. Subclasses set
+    ``export`` and may narrow the rows in ``filter_queryset``.
+    """
+    permission_classes = [IsAuthenticated]
+    export: str = ''
+
+    def filter_queryset(self, queryset: models.QuerySet, request) -> models.QuerySet:
+        return queryset
+
+    def get(self, request):
+        file_format = request.query_params.get('type', 'csv')
+        if file_format not in available_formats():
+            return Response(
+                {'type': f"Must be one of: {', '.join(available_formats())}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            queryset = self.filter_queryset(queryset_for(self.export, request.user), request)
+        except ValueError as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        content = export_stream(self.export, file_format, queryset)
+        if isinstance(request._request, ASGIRequest):
+            content = aiter_stream(content)
+        response = StreamingHttpResponse(content, content_type=CONTENT_TYPES[file_format])
+        response['Content-Disposition'] = f'attachment; filename="{export_filename(self.export, file_format)}"'
+        response['Cache-Control'] = 'no-store'
+        return response
+
@@ -0,0 +1,163 @@
+"""
+Structured, non-blocking logging for the sensors and disease apps.
+
+Used from the LOGGING setting:
+
+- ``JsonFormatter`` renders one JSON object per line, including any
+  ``extra={...}`` fields passed to the logging call.
+- ``queued_stream_handler`` builds the stdlib ``QueueHandler`` /
+  ``QueueListener`` pair (dictConfig only wires up the listener from
+  Python 3.12): records go on a bounded in-memory queue and the listener
+  thread does the stream I/O, so request threads never block on log
+  output. When the queue is full, ``DroppingQueueHandler`` drops and
+  counts records instead of raising.
+- ``RateLimitFilter`` lets each message template through at most ``burst``
+  times per ``interval`` seconds; the next record that gets through
+  carries a ``suppressed`` count.
+- ``SamplingFilter`` keeps one in every ``rate`` DEBUG records.
+"""
+
+import atexit
+import json
+import logging
+import queue
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Tuple
+
+# Attributes every LogRecord has; anything else was passed through extra={...}
+_RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as single-line JSON objects."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class DroppingQueueHandler(QueueHandler):
+    """
+    QueueHandler for a bounded queue that drops records when it is full.
+
+    The next record that fits is preceded by a warning with the number
+    dropped, so losses show up in the log itself.
+    """
+
+    def __init__(self, queue_):
+        super().__init__(queue_)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            if self.dropped:
+                self.queue.put_nowait(self.prepare(logging.makeLogRecord({
+                    'name': __name__, 'levelno': logging.WARNING, 'levelname': 'WARNING',
+                    'msg': 'Log queue full; dropped records', 'dropped': self.dropped,
+                })))
+                self.dropped = 0
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def _stop_listener(listener: QueueListener):
+    # QueueListener.stop is not idempotent before Python 3.12
+    if listener._thread is None:
+        return
+    try:
+        listener.stop()
+    except queue.Full:
+        # Could not even queue the stop sentinel; the daemon thread ends with the process
+        pass
+
+
+def queued_stream_handler(stream=None, maxsize: int = 10000) -> DroppingQueueHandler:
+    """
+    A DroppingQueueHandler whose QueueListener writes to stream (stderr by default).
+
+    The handler's formatter and filters apply on the logging thread (the
+    record is formatted when queued); the listener only writes. The
+    listener is started here and stopped at exit, after writing out what
+    is queued; it is available as ``handler.listener``.
+    """
+    handler = DroppingQueueHandler(queue.Queue(maxsize))
+    handler.listener = QueueListener(handler.queue, logging.StreamHandler(stream or sys.stderr))
+    handler.listener.start()
+    atexit.register(_stop_listener, handler.listener)
+    return handler
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Let each (logger, message template) through at most burst times per interval.
+
+    Records above ``max_level`` (WARNING by default) are never limited.
+    """
+
+    def __init__(self, burst: int = 5, interval: float = 60.0, max_level: str = 'WARNING'):
+        super().__init__()
+        self.burst = burst
+        self.interval = interval
+        self.max_level = logging.getLevelName(max_level) if isinstance(max_level, str) else max_level
+        self._lock = threading.Lock()
+        # key -> [window start, passed in window, suppressed since last pass]
+        self._windows: Dict[Tuple[str, str], list] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > self.max_level:
+            return True
+        key = (record.name, str(record.msg))
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= self.interval:
+                suppressed = window[2] if window else 0
+                if len(self._windows) > 10000:
+                    self._windows.clear()
+                self._windows[key] = [now, 1, 0]
+            elif window[1] < self.burst:
+                window[1] += 1
+                suppressed = window[2]
+                window[2] = 0
+            else:
+                window[2] += 1
+                return False
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keep one in every ``rate`` DEBUG records; other levels always pass."""
+
+    def __init__(self, rate: int = 100):
+        super().__init__()
+        self.rate = max(1, int(rate))
+        self._count = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno != logging.DEBUG:
+            return True
+        # Unlocked increment: an occasional miscount only shifts the sample
+        self._count += 1
+        if self._count % self.rate:
+            return False
+        record.sample_rate = self.rate
+        return True
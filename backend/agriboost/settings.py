@@ -158,4 +158,154 @@ DEFAULT_FROM_EMAIL = "AgriBoost <noreply@agriboost.com>"
 # 3. Save the JSON file as backend/firebase_key.json
 FIREBASE_DATABASE_URL = "https://agriboost-fyp-default-rtdb.asia-southeast1.firebasedatabase.app/"
 FIREBASE_KEY_FILE = str(BASE_DIR / "firebase_key.json")
-FIREBASE_SENSORS_PATH = "/IoT_Sensors"  # Data is at root level, not under /sensors
\ No newline at end of file
+FIREBASE_SENSORS_PATH = "/IoT_Sensors"  # Data is at root level, not under /sensors
+
+# RTDB backend: "firebase" (the real database), "local" (in-process stand-in
+# serving FIREBASE_FIXTURE_PATH, or synthetic sensors if the fixture does not
+# exist) or "record" (real database, every payload saved to the fixture)
+FIREBASE_BACKEND = os.environ.get("FIREBASE_BACKEND", "firebase")
+FIREBASE_FIXTURE_PATH = os.environ.get("FIREBASE_FIXTURE_PATH", str(BASE_DIR / "sensors" / "fixtures" / "rtdb.json"))
+FIREBASE_LOCAL_DEVICES = int(os.environ.get("FIREBASE_LOCAL_DEVICES", "3"))
+FIREBASE_LOCAL_LATENCY_MS = float(os.environ.get("FIREBASE_LOCAL_LATENCY_MS", "0"))
+FIREBASE_LOCAL_JITTER_MS = float(os.environ.get("FIREBASE_LOCAL_JITTER_MS", "0"))
+FIREBASE_LOCAL_FAILURE_RATE = float(os.environ.get("FIREBASE_LOCAL_FAILURE_RATE", "0"))
+FIREBASE_LOCAL_SEED = int(os.environ["FIREBASE_LOCAL_SEED"]) if os.environ.get("FIREBASE_LOCAL_SEED") else None
+
+# Keep an in-memory sensor snapshot current with an RTDB stream listener
+# instead of fetching FIREBASE_SENSORS_PATH on every feed request
+FIREBASE_STREAM_ENABLED = os.environ.get("FIREBASE_STREAM_ENABLED", "1") == "1"
+
+# Sensor history ingestion: stream updates are buffered and written to
+# SensorReading with bulk_create in batches
+SENSOR_INGEST_ENABLED = True
+SENSOR_INGEST_BATCH_SIZE = 500
+SENSOR_INGEST_FLUSH_SECONDS = 5.0
+
+# Live sensor feed (SSE / long-poll): fallback poll interval when the RTDB
+# stream is not delivering events, and SSE keepalive interval
+SENSOR_LIVE_POLL_SECONDS = 5.0
+SENSOR_LIVE_HEARTBEAT_SECONDS = 15.0
+
+# Rendered sensor feed responses are cached this many seconds (0 disables)
+SENSOR_FEED_CACHE_SECONDS = 2.0
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "agriboost",
+    }
+}
+
+# RTDB request timeout, and the circuit breaker that stops calling RTDB
+# during an outage (the last known good readings are served, marked stale)
+FIREBASE_HTTP_TIMEOUT_SECONDS = 5
+FIREBASE_BREAKER_FAILURE_THRESHOLD = 3
+FIREBASE_BREAKER_BACKOFF_SECONDS = 5.0
+FIREBASE_BREAKER_MAX_BACKOFF_SECONDS = 120.0
+
+# Expose per-stage latency histograms and error counters at /metrics (off
+# by default). When METRICS_TOKEN is set, scrapers must send it as
+# "Authorization: Bearer <token>"
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "0") == "1"
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+
+# Structured logging for the sensors and disease apps: JSON lines written by
+# a background thread, with repeated messages rate limited and DEBUG sampled
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {
+        "json": {"()": "agriboost.log.JsonFormatter"},
+    },
+    "filters": {
+        "rate_limit": {
+            "()": "agriboost.log.RateLimitFilter",
+            "burst": int(os.environ.get("LOG_RATE_LIMIT_BURST", "5")),
+            "interval": float(os.environ.get("LOG_RATE_LIMIT_SECONDS", "60")),
+        },
+        "sample_debug": {
+            "()": "agriboost.log.SamplingFilter",
+            "rate": int(os.environ.get("LOG_DEBUG_SAMPLE_RATE", "100")),
+        },
+    },
+    "handlers": {
+        "app": {
+            "()": "agriboost.log.queued_stream_handler",
+            "formatter": "json",
+            "filters": ["sample_debug", "rate_limit"],
+        },
+    },
+    "loggers": {
+        "sensors": {
+            "handlers": ["app"],
+            "level": os.environ.get("SENSORS_LOG_LEVEL", "INFO"),
+            "propagate": False,
+        },
+        "disease": {
+            "handlers": ["app"],
+            "level": os.environ.get("DISEASE_LOG_LEVEL", "INFO"),
+            "propagate": False,
+        },
+        "agriboost": {
+            "handlers": ["app"],
+            "level": os.environ.get("AGRIBOOST_LOG_LEVEL", "INFO"),
+            "propagate": False,
+        },
+    },
+}
+
+# Crop grown on the farm; AlertRules scoped to another crop are ignored
+SENSOR_CROP_TYPE = os.environ.get("SENSOR_CROP_TYPE", "Sugarcane")
+
+# Seconds a process keeps its compiled AlertRules before re-reading them
+# (edits made in this process invalidate them immediately)
+SENSOR_ALERT_RULES_TTL_SECONDS = float(os.environ.get("SENSOR_ALERT_RULES_TTL_SECONDS", "30"))
+
+# Streaming anomaly detection (sensors.anomaly): EWMA weight, readings seen
+# before flagging starts, rolling MAD window, spike/outlier thresholds (in
+# standard deviations) and identical readings before a probe counts as stuck
+SENSOR_ANOMALY_ENABLED = os.environ.get("SENSOR_ANOMALY_ENABLED", "1") == "1"
+SENSOR_ANOMALY_ALPHA = 0.1
+SENSOR_ANOMALY_WARMUP = 10
+SENSOR_ANOMALY_WINDOW = 31
+SENSOR_ANOMALY_Z_THRESHOLD = 4.0
+SENSOR_ANOMALY_MAD_THRESHOLD = 5.0
+SENSOR_ANOMALY_FLATLINE_COUNT = 20
+
+# Async RTDB REST client (sensors.rtdb_async) used by the async views:
+# connection pool size and idle keep-alive connections per event loop
+FIREBASE_ASYNC_MAX_CONNECTIONS = 100
+FIREBASE_ASYNC_MAX_KEEPALIVE = 20
+
+# Rows fetched per database round trip by the CSV/Parquet history exports
+# (agriboost.export); also the Parquet row group size
+EXPORT_CHUNK_SIZE = 2000
+
+# Fertilizer model bundles (sensors.model_registry): directory of the bundle
+# versions (relative to BASE_DIR), seconds between checks for a new version,
+# and whether web workers load the model at startup
+FERTILIZER_MODEL_DIR = os.environ.get("FERTILIZER_MODEL_DIR", str(BASE_DIR / "sensors" / "fertilizer model"))
+FERTILIZER_MODEL_CHECK_SECONDS = float(os.environ.get("FERTILIZER_MODEL_CHECK_SECONDS", "30"))
+FERTILIZER_MODEL_WARMUP = os.environ.get("FERTILIZER_MODEL_WARMUP", "1") == "1"
+
+# Batch fertilizer predictions (sensors.prediction): most readings accepted
+# per request, and readings scored and saved per chunk
+FERTILIZER_BATCH_MAX_ROWS = 10000
+FERTILIZER_BATCH_CHUNK_SIZE = 1000
+
+# Fertilizers returned per prediction (sensors.prediction): the recommendation
+# plus this many minus one alternatives, most probable first
+FERTILIZER_TOP_K = 3
+
+# Predict with the fertilizer forest compiled into flat NumPy arrays
+# (sensors.forest) instead of scikit-learn's predict_proba, for calls of up
+# to this many rows (above it sklearn's compiled loop is faster)
+FERTILIZER_COMPILED_FOREST = os.environ.get("FERTILIZER_COMPILED_FOREST", "1") == "1"
+FERTILIZER_COMPILED_FOREST_MAX_ROWS = 1500
+
+# Cached sensor layouts (FirebaseService.discover_layout) are discovered again
+# after FIREBASE_LAYOUT_TTL_SECONDS, or sooner when a request names a sensor
+# the layout does not list -- at most every FIREBASE_LAYOUT_RETRY_SECONDS, so
+# requests for sensors that do not exist cannot each cost a shallow query
+FIREBASE_LAYOUT_TTL_SECONDS = 300.0
+FIREBASE_LAYOUT_RETRY_SECONDS = 10.0
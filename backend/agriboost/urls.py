@@ -2,6 +2,8 @@
 from django.contrib import admin
 from django.urls import path, include
 
+from .metrics import metrics_view
+
 urlpatterns = [
     path("admin/", admin.site.urls),
 
@@ -9,4 +11,7 @@ urlpatterns = [
     path("api/users/", include("users.urls")),      # register/login
     path("api/disease/", include("disease.urls")),    # your disease app
     path("api/sensors/", include("sensors.urls")),    # your sensors app
+
+    # Prometheus scrape endpoint
+    path("metrics", metrics_view),
 ]
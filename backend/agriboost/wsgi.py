@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'agriboost.settings')
 
 application = get_wsgi_application()
+
+# Load the fertilizer model before the first request instead of during it
+from sensors.model_registry import FertilizerModels  # noqa: E402
+
+FertilizerModels.warm_up()
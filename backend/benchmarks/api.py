@@ -0,0 +1,367 @@
+"""
+Benchmark suite for the HTTP API.
+
+Runs every API endpoint in-process (Django test client, one client per
+worker thread) against:
+
+- the local Firebase stand-in (FIREBASE_BACKEND=local, synthetic sensors
+  or FIREBASE_FIXTURE_PATH), so no credentials or network are needed
+- a throwaway SQLite database with one verified benchmark user, plus
+  one user awaiting OTP verification per verify-otp request
+- the real fertilizer model pickles, and the real disease model if
+  DISEASE_MODEL_PATH exists (otherwise a stub with the same output shape;
+  force either with --disease-model)
+
+For each endpoint and concurrency level it reports throughput and
+p50/p95/p99 latency, and saves everything as JSON so two commits can be
+compared with --compare. Anything the views print (registration prints
+the OTP to the console) is discarded while requests run.
+
+The live feed is measured through its long-poll fallback with since=0,
+which answers with the current snapshot at once. The SSE stream
+(/api/sensors/live/) never completes, so it has no per-request latency.
+Its connection capacity is measured by benchmarks/live_feed_load.py.
+
+Run this from the backend directory:
+    python benchmarks/api.py --concurrency 1,8 --requests 200
+    python benchmarks/api.py --compare benchmarks/results/api-<old>.json
+"""
+
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'agriboost.settings')
+os.environ.setdefault('FIREBASE_BACKEND', 'local')
+os.environ.setdefault('FIREBASE_LOCAL_SEED', '42')
+
+import django  # noqa: E402
+
+django.setup()
+
+import numpy as np  # noqa: E402
+from django.conf import settings  # noqa: E402
+from django.db import connection, connections  # noqa: E402
+from django.test import Client  # noqa: E402
+from django.test.utils import setup_test_environment  # noqa: E402
+from PIL import Image  # noqa: E402
+from rest_framework_simplejwt.tokens import RefreshToken  # noqa: E402
+
+BENCH_EMAIL = 'bench@agriboost.local'
+BENCH_PASSWORD = 'Bench-Passw0rd!'
+PENDING_OTP = '246810'
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+
+class StubDiseaseModel:
+    """Stands in for the Keras model: confident 'Healthy' for every image."""
+
+    def predict(self, batch):
+        from disease.views import CLASS_NAMES
+        probabilities = np.full((len(batch), len(CLASS_NAMES)), 0.01, dtype=np.float32)
+        probabilities[:, CLASS_NAMES.index('Healthy')] = 0.9
+        return probabilities
+
+
+def leaf_image() -> bytes:
+    """A 256x256 green PNG, re-read for every upload."""
+    buffer = io.BytesIO()
+    Image.new('RGB', (256, 256), (40, 140, 60)).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+class Endpoint:
+    """One benchmarked request: method, path and a body builder."""
+
+    def __init__(self, name: str, method: str, path: str, auth: bool = True,
+                 body: Optional[Callable[[int], Dict]] = None, multipart: bool = False):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.auth = auth
+        self.body = body
+        self.multipart = multipart
+
+    def call(self, client: Client, index: int, headers: Dict):
+        data = self.body(index) if self.body else None
+        if self.method == 'GET':
+            return client.get(self.path, **headers)
+        if self.multipart:
+            return client.post(self.path, data, **headers)
+        return getattr(client, self.method.lower())(self.path, data, content_type='application/json', **headers)
+
+
+def build_endpoints(pending_users: List[int]) -> List[Endpoint]:
+    """
+    Every benchmarked endpoint.
+
+    Args:
+        pending_users: Ids of users awaiting OTP verification, filled in by
+            setup_fixtures; each verify-otp request activates one of them
+    """
+    image = leaf_image()
+    run_id = int(time.time())
+    registrations = itertools.count()
+
+    def fertilizer_body(index):
+        return {
+            'temperature': 26.0 + index % 10, 'humidity': 55.0, 'moisture': 40.0 + index % 20,
+            'soil_type': 'Loamy', 'nitrogen': 40.0, 'phosphorous': 25.0, 'potassium': 30.0,
+        }
+
+    def disease_body(index):
+        upload = io.BytesIO(image)
+        upload.name = 'leaf.png'
+        return {'image': upload}
+
+    def register_body(index):
+        return {
+            'email': f'bench-{run_id}-{next(registrations)}@agriboost.local',
+            'full_name': 'Bench User', 'address': '', 'password': BENCH_PASSWORD, 'confirm_password': BENCH_PASSWORD,
+        }
+
+    def verify_otp_body(index):
+        return {'user_id': pending_users.pop(), 'otp': PENDING_OTP}
+
+    return [
+        Endpoint('sensors_feed', 'GET', '/api/sensors/feed/', auth=False),
+        Endpoint('sensors_predict', 'POST', '/api/sensors/predict/', body=fertilizer_body),
+        Endpoint('sensors_predictions', 'GET', '/api/sensors/predictions/'),
+        Endpoint('sensors_history', 'GET', '/api/sensors/history/?device=sensor_1&metric=temperature', auth=False),
+        Endpoint('sensors_live_poll', 'GET', '/api/sensors/live/poll/?since=0', auth=False),
+        Endpoint('disease_predict', 'POST', '/api/disease/predict/', body=disease_body, multipart=True),
+        Endpoint('disease_crop_history', 'GET', '/api/disease/crop-history/'),
+        Endpoint('users_register', 'POST', '/api/users/register/', auth=False, body=register_body),
+        Endpoint('users_verify_otp', 'POST', '/api/users/verify-otp/', auth=False, body=verify_otp_body),
+        Endpoint('users_login', 'POST', '/api/users/login/', auth=False,
+                 body=lambda index: {'email': BENCH_EMAIL, 'password': BENCH_PASSWORD}),
+        Endpoint('users_profile', 'GET', '/api/users/profile/'),
+        Endpoint('users_history', 'GET', '/api/users/history/'),
+        Endpoint('users_change_password', 'PUT', '/api/users/change-password/',
+                 body=lambda index: {'old_password': BENCH_PASSWORD, 'new_password': BENCH_PASSWORD}),
+    ]
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+
+def run_endpoint(endpoint: Endpoint, requests: int, concurrency: int, headers: Dict) -> Dict:
+    """Send requests calls to endpoint from concurrency threads; return the statistics."""
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    lock = threading.Lock()
+    counter = iter(range(requests))
+    counter_lock = threading.Lock()
+
+    def worker():
+        client = Client()
+        local_latencies = []
+        local_statuses: Dict[str, int] = {}
+        try:
+            while True:
+                with counter_lock:
+                    index = next(counter, None)
+                if index is None:
+                    break
+                started = time.perf_counter()
+                try:
+                    status = str(endpoint.call(client, index, headers if endpoint.auth else {}).status_code)
+                except Exception as e:
+                    status = type(e).__name__
+                local_latencies.append(time.perf_counter() - started)
+                local_statuses[status] = local_statuses.get(status, 0) + 1
+        finally:
+            connections.close_all()
+        with lock:
+            latencies.extend(local_latencies)
+            for status, count in local_statuses.items():
+                statuses[status] = statuses.get(status, 0) + count
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for future in [pool.submit(worker) for _ in range(concurrency)]:
+            future.result()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    errors = sum(count for status, count in statuses.items() if not status.startswith(('2', '3')))
+    return {
+        'requests': len(latencies),
+        'concurrency': concurrency,
+        'errors': errors,
+        'statuses': statuses,
+        'elapsed_s': round(elapsed, 4),
+        'throughput_rps': round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        'mean_ms': round(statistics.fmean(latencies) * 1000, 3) if latencies else 0.0,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def setup_fixtures(disease_model: str, pending_users: int):
+    """
+    Create the benchmark users and pick the disease model.
+
+    Args:
+        disease_model: 'auto', 'real' or 'stub'
+        pending_users: Number of users awaiting verification with PENDING_OTP
+
+    Returns:
+        (auth headers, disease model used, pending user ids)
+    """
+    from django.contrib.auth.hashers import make_password
+
+    from disease import views as disease_views
+    from users.models import CustomUser
+
+    user = CustomUser.objects.create_user(
+        BENCH_EMAIL, BENCH_PASSWORD, full_name='Bench User', role='farmer', email_verified=True,
+    )
+    # One password hash for all of them: hashing is deliberately slow
+    password = make_password(BENCH_PASSWORD)
+    pending = CustomUser.objects.bulk_create(
+        CustomUser(email=f'pending-{index}@agriboost.local', full_name='Pending User', password=password,
+                   otp=PENDING_OTP, email_verified=False)
+        for index in range(pending_users)
+    )
+
+    if disease_model == 'auto':
+        disease_model = 'real' if os.path.exists(settings.DISEASE_MODEL_PATH) else 'stub'
+    if disease_model == 'stub':
+        disease_views._model = StubDiseaseModel()
+
+    token = RefreshToken.for_user(user).access_token
+    return {'HTTP_AUTHORIZATION': f'Bearer {token}'}, disease_model, [pending_user.pk for pending_user in pending]
+
+
+def compare(current: Dict, baseline_path: str):
+    """Print p50/p95/throughput changes against a previous results file."""
+    with open(baseline_path, 'r') as f:
+        baseline = json.load(f)
+    old = {(r['endpoint'], r['concurrency']): r for r in baseline['results']}
+
+    print(f"\nCompared with {baseline_path} (commit {baseline['meta'].get('commit')}):")
+    print(f"  {'endpoint':<24}{'conc':>5}{'p50 ms':>18}{'p95 ms':>18}{'req/s':>18}")
+
+    def change(new, before):
+        if not before:
+            return f"{new:>9.1f}        "
+        return f"{new:>9.1f} ({(new - before) / before * 100:+5.0f}%)"
+
+    for result in current['results']:
+        previous = old.get((result['endpoint'], result['concurrency']))
+        if previous is None:
+            continue
+        print(f"  {result['endpoint']:<24}{result['concurrency']:>5}"
+              f"{change(result['p50_ms'], previous['p50_ms'])}"
+              f"{change(result['p95_ms'], previous['p95_ms'])}"
+              f"{change(result['throughput_rps'], previous['throughput_rps'])}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AgriBoost API benchmark suite")
+    parser.add_argument('--concurrency', default='1,8', help="Comma separated worker counts (default: 1,8)")
+    parser.add_argument('--requests', type=int, default=200, help="Requests per endpoint and concurrency level")
+    parser.add_argument('--warmup', type=int, default=5, help="Untimed requests per endpoint first")
+    parser.add_argument('--endpoints', default='', help="Comma separated endpoint names (default: all)")
+    parser.add_argument('--disease-model', choices=('auto', 'real', 'stub'), default='auto')
+    parser.add_argument('--output', help="Results file (default: benchmarks/results/api-<commit>.json)")
+    parser.add_argument('--compare', help="Previous results file to compare against")
+    args = parser.parse_args()
+
+    concurrency_levels = [int(level) for level in args.concurrency.split(',') if level.strip()]
+    pending_users: List[int] = []
+    endpoints = build_endpoints(pending_users)
+    if args.endpoints:
+        wanted = {name.strip() for name in args.endpoints.split(',')}
+        endpoints = [endpoint for endpoint in endpoints if endpoint.name in wanted]
+    verifications = args.warmup + args.requests * len(concurrency_levels)
+    if not any(endpoint.name == 'users_verify_otp' for endpoint in endpoints):
+        verifications = 0
+
+    setup_test_environment()
+    # Expected 4xx responses would otherwise log a warning per request
+    logging.getLogger('django.request').setLevel(logging.ERROR)
+    with tempfile.TemporaryDirectory() as directory:
+        # A file database so worker threads share it (in-memory SQLite is per connection)
+        connection.settings_dict['TEST']['NAME'] = os.path.join(directory, 'bench.sqlite3')
+        old_name = connection.creation.create_test_db(verbosity=0)
+        try:
+            headers, disease_model, pending_ids = setup_fixtures(args.disease_model, verifications)
+            pending_users.extend(pending_ids)
+            results = []
+            for endpoint in endpoints:
+                client = Client()
+                with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                    for index in range(args.warmup):
+                        endpoint.call(client, index, headers if endpoint.auth else {})
+                for concurrency in concurrency_levels:
+                    result = {'endpoint': endpoint.name, 'method': endpoint.method, 'path': endpoint.path}
+                    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                        result.update(run_endpoint(endpoint, args.requests, concurrency, headers))
+                    results.append(result)
+                    print(f"{endpoint.name:<24} c={concurrency:<3} {result['throughput_rps']:>8.1f} req/s  "
+                          f"p50 {result['p50_ms']:>8.2f}  p95 {result['p95_ms']:>8.2f}  "
+                          f"p99 {result['p99_ms']:>8.2f} ms  errors {result['errors']}")
+        finally:
+            connections.close_all()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    commit = git_commit()
+    report = {
+        'meta': {
+            'commit': commit,
+            'created_at': datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'requests_per_level': args.requests,
+            'concurrency': concurrency_levels,
+            'firebase_backend': settings.FIREBASE_BACKEND,
+            'disease_model': disease_model,
+        },
+        'results': results,
+    }
+
+    output = args.output or os.path.join(RESULTS_DIR, f"api-{commit or 'unknown'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == '__main__':
+    main()
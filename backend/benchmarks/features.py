@@ -0,0 +1,122 @@
+"""
+Micro-benchmark for fertilizer feature assembly.
+
+Compares building the classifier input the original way (a one-row pandas
+DataFrame with both categorical columns run through LabelEncoder.transform,
+reproduced below as legacy_features) against sensors.features.FeatureAssembler,
+on its own and followed by the model call the prediction view makes.
+
+Run this from the backend directory: python benchmarks/features.py [--rows N]
+"""
+
+import argparse
+import os
+import random
+import subprocess
+import sys
+import time
+import warnings
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'agriboost.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+# sklearn is timed on plain feature arrays on purpose
+warnings.filterwarnings('ignore', message='X does not have valid feature names', category=UserWarning)
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from sensors.model_registry import FertilizerModels  # noqa: E402
+
+SOIL_TYPES = ('Loamy', 'Clayey', 'Sandy', 'Black', 'Red')
+
+
+def legacy_features(bundle, sensor_data):
+    """Pre-assembler implementation from FertilizerPredictView."""
+    data_for_model = pd.DataFrame([{
+        "Temparature": sensor_data['temperature'],
+        "Humidity": sensor_data['humidity'],
+        "Moisture": sensor_data['moisture'],
+        "Soil_Type": sensor_data['soil_type'],
+        "Crop_Type": sensor_data['crop_type'],
+        "Nitrogen": sensor_data['nitrogen'],
+        "Potassium": sensor_data['potassium'],
+        "Phosphorous": sensor_data['phosphorous'],
+    }])
+    data_for_model["Soil_Type"] = bundle.soil_encoder.transform(data_for_model["Soil_Type"])
+    data_for_model["Crop_Type"] = bundle.crop_encoder.transform(data_for_model["Crop_Type"])
+    return data_for_model
+
+
+def make_readings(count: int, seed: int = 7):
+    rng = random.Random(seed)
+    return [
+        {
+            'temperature': round(rng.uniform(15, 40), 1),
+            'humidity': round(rng.uniform(30, 90), 1),
+            'moisture': round(rng.uniform(20, 70), 1),
+            'nitrogen': rng.randint(0, 140),
+            'potassium': rng.randint(0, 200),
+            'phosphorous': rng.randint(0, 80),
+            'soil_type': rng.choice(SOIL_TYPES),
+            'crop_type': 'Sugarcane',
+        }
+        for _ in range(count)
+    ]
+
+
+def bench(label: str, func, readings, repeat: int = 3):
+    """Best-of-repeat wall time per reading."""
+    elapsed = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for reading in readings:
+            func(reading)
+        elapsed = min(elapsed, time.perf_counter() - start)
+    per_reading_us = elapsed / len(readings) * 1e6
+    print(f"  {label:<36} {per_reading_us:10.2f} us/reading")
+    return per_reading_us
+
+
+def import_seconds(module: str) -> float:
+    """Time a fresh interpreter spends importing module."""
+    code = f"import time; start = time.perf_counter(); import {module}; print(time.perf_counter() - start)"
+    return float(subprocess.check_output([sys.executable, '-c', code]).decode())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    bundle = FertilizerModels.get()
+    model, features = bundle.model, bundle.features
+    readings = make_readings(args.rows)
+
+    # Sanity check: same features, same probabilities
+    for reading in readings[:200]:
+        legacy = legacy_features(bundle, reading)
+        assert np.array_equal(legacy.to_numpy(dtype=np.float64), features.row(reading))
+        assert np.allclose(model.predict_proba(legacy), model.predict_proba(features.row(reading)))
+
+    print(f"Feature assembly over {len(readings):,} readings (model {bundle.version})")
+    before = bench('pandas DataFrame + LabelEncoder', lambda r: legacy_features(bundle, r), readings, args.repeat)
+    after = bench('FeatureAssembler.row', features.row, readings, args.repeat)
+    print(f"  speedup: {before / after:.1f}x")
+
+    print("With model.predict_proba")
+    total_before = bench('pandas path', lambda r: model.predict_proba(legacy_features(bundle, r)),
+                         readings, args.repeat)
+    total_after = bench('assembler path', lambda r: model.predict_proba(features.row(r)), readings, args.repeat)
+    print(f"  speedup: {total_before / total_after:.2f}x")
+
+    print(f"Cold import of pandas: {import_seconds('pandas') * 1000:.0f} ms")
+
+
+if __name__ == '__main__':
+    main()
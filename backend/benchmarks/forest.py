@@ -0,0 +1,126 @@
+"""
+Benchmark for the compiled fertilizer forest.
+
+Compares sensors.forest.CompiledForest with the classifier's own
+predict_proba: latency of one-row calls (what FertilizerPredictView makes),
+throughput over a large batch, and call time at batch sizes in between
+(to pick FERTILIZER_COMPILED_FOREST_MAX_ROWS). Probabilities are checked
+to agree before timing.
+
+Run this from the backend directory: python benchmarks/forest.py [--rows N]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+import warnings
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'agriboost.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+# sklearn is timed on plain feature arrays on purpose
+warnings.filterwarnings('ignore', message='X does not have valid feature names', category=UserWarning)
+
+import numpy as np  # noqa: E402
+
+from sensors.forest import CompiledForest  # noqa: E402
+from sensors.model_registry import FertilizerModels, model_dir  # noqa: E402
+
+
+def make_rows(count: int, seed: int = 11) -> np.ndarray:
+    """Feature rows in the training column order, spread over realistic ranges."""
+    rng = np.random.default_rng(seed)
+    return np.column_stack([
+        np.round(rng.uniform(15, 40, count), 1),    # Temparature
+        np.round(rng.uniform(30, 90, count), 1),    # Humidity
+        np.round(rng.uniform(20, 70, count), 1),    # Moisture
+        rng.integers(0, 5, count),                  # Soil_Type
+        rng.integers(0, 17, count),                 # Crop_Type
+        rng.integers(0, 140, count),                # Nitrogen
+        rng.integers(0, 200, count),                # Potassium
+        rng.integers(0, 80, count),                 # Phosphorous
+    ]).astype(np.float64)
+
+
+def latency(label: str, predict_proba, rows: np.ndarray, calls: int):
+    """Per-call latency of one-row predictions."""
+    timings = []
+    for index in range(calls):
+        row = rows[index % len(rows)][np.newaxis, :]
+        start = time.perf_counter()
+        predict_proba(row)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    p50 = statistics.median(timings) * 1e6
+    p99 = timings[int(len(timings) * 0.99) - 1] * 1e6
+    print(f"  {label:<12} p50 {p50:9.1f} us   p99 {p99:9.1f} us")
+    return p50
+
+
+def throughput(label: str, predict_proba, rows: np.ndarray, repeat: int):
+    """Best-of-repeat rows per second over the whole batch."""
+    elapsed = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        predict_proba(rows)
+        elapsed = min(elapsed, time.perf_counter() - start)
+    rate = len(rows) / elapsed
+    print(f"  {label:<12} {elapsed * 1000:9.1f} ms   {rate:12,.0f} rows/s")
+    return rate
+
+
+def best_call_ms(predict_proba, rows: np.ndarray, calls: int, repeat: int) -> float:
+    elapsed = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(calls):
+            predict_proba(rows)
+        elapsed = min(elapsed, time.perf_counter() - start)
+    return elapsed / calls * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100_000, help="Rows in the throughput batch")
+    parser.add_argument('--calls', type=int, default=2000, help="One-row calls timed for latency")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    model = FertilizerModels.load('base', model_dir()).model
+    start = time.perf_counter()
+    forest = CompiledForest.compile(model)
+    compile_ms = (time.perf_counter() - start) * 1000
+    rows = make_rows(args.rows)
+
+    difference = np.abs(forest.predict_proba(rows) - model.predict_proba(rows)).max()
+    assert difference <= 1e-12, difference
+    print(f"{type(model).__name__}: {forest.n_trees} trees, {len(forest.feature):,} nodes, depth {forest.depth}; "
+          f"compiled in {compile_ms:.1f} ms; max |difference| {difference:.1e}")
+
+    print(f"One-row latency ({args.calls:,} calls)")
+    before = latency('sklearn', model.predict_proba, rows, args.calls)
+    after = latency('compiled', forest.predict_proba, rows, args.calls)
+    print(f"  speedup: {before / after:.1f}x")
+
+    print(f"Throughput ({len(rows):,} rows)")
+    before = throughput('sklearn', model.predict_proba, rows, args.repeat)
+    after = throughput('compiled', forest.predict_proba, rows, args.repeat)
+    print(f"  speedup: {after / before:.1f}x")
+
+    print("Call time by batch size")
+    for size in (10, 100, 500, 1000, 2000, 5000):
+        batch = rows[:size]
+        calls = max(1, 2000 // size)
+        sklearn_ms = best_call_ms(model.predict_proba, batch, calls, args.repeat)
+        compiled_ms = best_call_ms(forest.predict_proba, batch, calls, args.repeat)
+        print(f"  {size:>6} rows   sklearn {sklearn_ms:8.3f} ms   compiled {compiled_ms:8.3f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+"""
+Load test for the live sensor feed (/api/sensors/live/).
+
+Opens N concurrent Server-Sent Events connections against the ASGI
+application on a single event loop (one worker), publishes a series of
+sensor updates from another thread, and reports:
+
+- how long it took to open every connection
+- memory held per connection
+- fan-out latency: time from one upstream update until every client has
+  received it (p50 / max over all updates)
+- how many connections one worker can hold: the smaller of what fits in
+  --memory-mib at the measured memory per connection and the process's
+  open-file limit (every connection is a socket; a few are kept back for
+  the database, log files and the listening socket)
+
+Connections are driven in-process through the ASGI interface, so the
+numbers measure the application and not the network stack.
+
+Run this from the backend directory:
+    python benchmarks/live_feed_load.py --clients 2000 --updates 20
+"""
+
+import argparse
+import asyncio
+import os
+import resource
+import statistics
+import sys
+import threading
+import time
+import tracemalloc
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'agriboost.settings')
+
+from django.core.asgi import get_asgi_application  # noqa: E402
+
+application = get_asgi_application()
+
+from sensors.live import LiveFeedHub  # noqa: E402
+
+
+def make_payload(value: float):
+    return {
+        'sensors': [{'device_id': 'probe-1', 'label': 'NPK Sensor', 'temperature': value, 'alerts': []}],
+        'last_updated': None,
+        'source': 'load_test',
+    }
+
+
+class SSEClient:
+    """One in-process ASGI connection to the live feed."""
+
+    def __init__(self, done: asyncio.Event):
+        self.done = done
+        self.requested = False
+        self.versions = {}
+        self.connected = asyncio.Event()
+
+    async def receive(self):
+        if not self.requested:
+            self.requested = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        await self.done.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(self, message):
+        if message['type'] == 'http.response.start':
+            self.connected.set()
+        elif message['type'] == 'http.response.body':
+            body = message.get('body', b'')
+            if body.startswith(b'id: '):
+                version = int(body.split(b'\n', 1)[0][4:])
+                self.versions[version] = time.perf_counter()
+
+    async def run(self):
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': '/api/sensors/live/',
+            'raw_path': b'/api/sensors/live/',
+            'query_string': b'',
+            'root_path': '',
+            'headers': [(b'host', b'localhost'), (b'accept', b'text/event-stream')],
+            'client': ('127.0.0.1', 50000),
+            'server': ('localhost', 8000),
+        }
+        await application(scope, self.receive, self.send)
+
+
+# Descriptors a worker needs besides its client sockets
+RESERVED_FILES = 64
+
+
+def worker_capacity(bytes_per_connection: float, memory_mib: int):
+    """(connections that fit in memory_mib, connections the open-file limit allows)."""
+    by_memory = int(memory_mib * 1024 * 1024 / bytes_per_connection)
+    soft_limit, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+    by_files = soft_limit - RESERVED_FILES if soft_limit != resource.RLIM_INFINITY else by_memory
+    return by_memory, by_files
+
+
+async def main(clients: int, updates: int, interval: float, memory_mib: int):
+    LiveFeedHub.publish(make_payload(0.0))
+    done = asyncio.Event()
+
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    started = time.perf_counter()
+    connections = [SSEClient(done) for _ in range(clients)]
+    tasks = [asyncio.create_task(connection.run()) for connection in connections]
+    await asyncio.gather(*(connection.connected.wait() for connection in connections))
+    connect_seconds = time.perf_counter() - started
+    await asyncio.sleep(0.2)
+    held, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    published = {}
+
+    def publisher():
+        for index in range(1, updates + 1):
+            time.sleep(interval)
+            published_at = time.perf_counter()
+            LiveFeedHub.publish(make_payload(float(index)))
+            published[LiveFeedHub.latest()[0]] = published_at
+
+    thread = threading.Thread(target=publisher)
+    thread.start()
+    while thread.is_alive():
+        await asyncio.sleep(0.05)
+    await asyncio.sleep(max(0.5, interval))
+
+    latencies = []
+    missed = 0
+    for version, published_at in published.items():
+        received = [connection.versions.get(version) for connection in connections]
+        if any(at is None for at in received):
+            missed += 1
+            continue
+        latencies.append((max(received) - published_at) * 1000)
+
+    done.set()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    print(f"Concurrent SSE connections: {clients}")
+    print(f"  connect all:               {connect_seconds:.2f}s")
+    per_connection = (held - before) / clients
+    print(f"  memory per connection:     {per_connection / 1024:.1f} KiB")
+    print(f"  updates published:         {len(published)} (missed by some client: {missed})")
+    if latencies:
+        print(f"  fan-out to all (p50/max):  {statistics.median(latencies):.1f} ms / {max(latencies):.1f} ms")
+    by_memory, by_files = worker_capacity(per_connection, memory_mib)
+    print(f"  connections per worker:    {min(by_memory, by_files):,} "
+          f"({by_memory:,} fit in {memory_mib} MiB, open-file limit allows {by_files:,})")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Live sensor feed load test")
+    parser.add_argument('--clients', type=int, default=1000)
+    parser.add_argument('--updates', type=int, default=10)
+    parser.add_argument('--interval', type=float, default=0.5, help="Seconds between updates")
+    parser.add_argument('--memory-mib', type=int, default=1024, help="Memory one worker may spend on connections")
+    args = parser.parse_args()
+    asyncio.run(main(args.clients, args.updates, args.interval, args.memory_mib))
@@ -0,0 +1,230 @@
+"""
+Micro-benchmark for sensor payload normalization.
+
+Compares the per-reading cost of the original normalize_sensor_data (alias
+probing and helper closures on every call, reproduced below as
+legacy_normalize_sensor_data) against the per-key-set resolver in
+sensors.normalization, for both the single-reading and the batched path.
+
+Run this from the backend directory: python benchmarks/normalize.py [--readings N]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime
+from typing import Dict, Optional
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sensors.normalization import normalize_batch, normalize_reading
+
+
+def legacy_normalize_sensor_data(raw_data: Optional[Dict]) -> Dict:
+    """Original implementation of FirebaseService.normalize_sensor_data."""
+    if not raw_data:
+        raw_data = {}
+
+    # Helper function to safely convert to float with fallback
+    # Handles string values from Firebase (since Firebase stores numbers as strings sometimes)
+    def safe_float(value, default=0.0):
+        """Safely convert value to float, returning default if conversion fails.
+        Handles string values from Firebase database."""
+        if value is None:
+            return default
+        try:
+            # Convert to string first to handle any type, then to float
+            if isinstance(value, str):
+                # Remove any whitespace
+                value = value.strip()
+                # Handle empty strings
+                if value == '':
+                    return default
+            return float(value)
+        except (ValueError, TypeError):
+            print(f"WARNING: Could not convert value '{value}' (type: {type(value)}) to float. Using default {default}")
+            return default
+
+    # Extract values from raw data, providing defaults if missing
+    # Handle different possible field names from Firebase
+    # IMPORTANT: Check for None explicitly to allow zero (0) values
+    # Note: User's Firebase has: temperature, Moisture, PH, EC, Potassium, Phosphorous, Nitrogen
+
+    # Helper to get value from multiple possible keys, allowing zero values
+    def get_value(keys, default=None):
+        """Get value from dict using multiple possible keys, allowing zero values."""
+        for key in keys:
+            if key in raw_data and raw_data[key] is not None:
+                return raw_data[key]
+        return default
+
+    label = get_value(['label', 'name', 'sensor_name'], 'NPK Sensor')
+
+    # Temperature in Celsius - handle typo "temprature" (missing 'a') from Firebase
+    temp_val = get_value(['temprature', 'temperature', 'Temperature', 'temp', 'Temp'])
+    temperature = safe_float(temp_val, 25.0)
+
+    # Humidity as percentage (optional field, not in user's 7 variables)
+    hum_val = get_value(['humidity', 'Humidity', 'hum', 'Hum'])
+    humidity = safe_float(hum_val, 60.0)
+
+    # Soil moisture as percentage - maps from "Moisture" in Firebase
+    moisture_val = get_value(['Moisture', 'moisture', 'soil_moisture', 'soilMoisture'])
+    soil_moisture = safe_float(moisture_val, 50.0)
+
+    # Soil pH - maps from "PH" in Firebase (note: user uses "PH" not "pH")
+    ph_val = get_value(['PH', 'ph', 'pH', 'soil_ph', 'soilPh'])
+    soil_ph = safe_float(ph_val, 6.5)
+
+    # Electrical Conductivity (EC) - direct match from Firebase
+    ec_val = get_value(['EC', 'ec', 'electrical_conductivity'])
+    ec = safe_float(ec_val, 1.5)
+
+    # NPK values - maps from user's Firebase field names
+    # Nitrogen - direct match
+    nitrogen_val = get_value(['Nitrogen', 'nitrogen', 'N'])
+    nitrogen = safe_float(nitrogen_val, 50.0)
+
+    # Phosphorus - maps from "Phosphorous" (note: user spelled it "Phosphorous")
+    phosphorous_val = get_value(['Phosphorous', 'phosphorous', 'P'])
+    phosphorous = safe_float(phosphorous_val, 30.0)
+
+    # Potassium - direct match
+    potassium_val = get_value(['Potassium', 'potassium', 'K'])
+    potassium = safe_float(potassium_val, 40.0)
+
+    # Battery level as percentage
+    battery_val = get_value(['battery', 'battery_level', 'batteryLevel'])
+    battery = safe_float(battery_val, 85.0)
+
+    # Timestamp - try to get from data, or use current time
+    timestamp_str = raw_data.get('timestamp') or raw_data.get('time') or raw_data.get('updated_at')
+    timestamp = datetime.now()  # Default to current time
+
+    if timestamp_str:
+        try:
+            # Try to parse if it's a string
+            if isinstance(timestamp_str, str):
+                # Handle ISO format with Z timezone
+                clean_timestamp = timestamp_str.replace('Z', '+00:00')
+                # Try parsing ISO format (Python 3.7+)
+                try:
+                    timestamp = datetime.fromisoformat(clean_timestamp)
+                except ValueError:
+                    # If ISO parsing fails, try without timezone
+                    clean_timestamp = clean_timestamp.split('+')[0].split('Z')[0]
+                    try:
+                        timestamp = datetime.fromisoformat(clean_timestamp)
+                    except ValueError:
+                        # If all parsing fails, keep current time
+                        timestamp = datetime.now()
+            elif isinstance(timestamp_str, (int, float)):
+                # Unix timestamp (seconds since epoch)
+                timestamp = datetime.fromtimestamp(float(timestamp_str))
+            elif isinstance(timestamp_str, datetime):
+                # Already a datetime object
+                timestamp = timestamp_str
+        except (ValueError, TypeError, OSError):
+            # If parsing fails for any reason, use current time
+            timestamp = datetime.now()
+
+    # Generate alerts based on thresholds
+    alerts = []
+    if temperature > 40:
+        alerts.append(f"High temperature alert: {temperature}°C exceeds 40°C threshold")
+    elif temperature < 10:
+        alerts.append(f"Low temperature alert: {temperature}°C below 10°C threshold")
+
+    if soil_ph < 5:
+        alerts.append(f"Low pH alert: {soil_ph} below 5.0 threshold")
+    elif soil_ph > 8:
+        alerts.append(f"High pH alert: {soil_ph} exceeds 8.0 threshold")
+
+    if soil_moisture < 30:
+        alerts.append(f"Low soil moisture alert: {soil_moisture}% below 30% threshold")
+
+    # Build normalized sensor data dictionary
+    normalized_data = {
+        'label': label,
+        'temperature': round(temperature, 2),
+        'humidity': round(humidity, 2),
+        'soil_moisture': round(soil_moisture, 2),
+        'soil_ph': round(soil_ph, 2),
+        'ec': round(ec, 2),
+        'nitrogen': round(nitrogen, 2),
+        'phosphorous': round(phosphorous, 2),
+        'potassium': round(potassium, 2),
+        'battery': round(battery, 2),
+        'timestamp': timestamp.isoformat(),
+        'alerts': alerts
+    }
+
+    return normalized_data
+
+
+
+def make_payloads(count: int, devices: int = 24, seed: int = 7):
+    """Synthetic payloads shaped like the IoT_Sensors node (string and numeric values)."""
+    rng = random.Random(seed)
+    payloads = []
+    for index in range(count):
+        device = index % devices
+        payload = {
+            'temprature': round(rng.uniform(5, 45), 2),
+            'Moisture': str(round(rng.uniform(10, 90), 1)),
+            'PH': round(rng.uniform(4, 9), 2),
+            'EC': str(round(rng.uniform(0.5, 3), 2)),
+            'Nitrogen': rng.randint(0, 140),
+            'Phosphorous': rng.randint(0, 80),
+            'Potassium': rng.randint(0, 200),
+            'timestamp': f"2025-11-{1 + index % 28:02d}T{index % 24:02d}:{index % 60:02d}:00Z",
+        }
+        if device % 3 == 0:
+            payload['humidity'] = round(rng.uniform(20, 95), 1)
+        if device % 4 == 0:
+            payload['label'] = f"Probe {device}"
+        payloads.append(payload)
+    return payloads
+
+
+def bench(label: str, func, payloads, batched: bool = False, repeat: int = 3):
+    """Best-of-repeat wall time for normalizing every payload."""
+    elapsed = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        if batched:
+            func(payloads)
+        else:
+            for payload in payloads:
+                func(payload)
+        elapsed = min(elapsed, time.perf_counter() - start)
+    per_reading_us = elapsed / len(payloads) * 1e6
+    print(f"  {label:<32} {elapsed * 1000:10.1f} ms total {per_reading_us:8.2f} us/reading")
+    return per_reading_us
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--readings', type=int, default=100_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    payloads = make_payloads(args.readings)
+
+    # Sanity check: both implementations agree (timestamps are present in every payload)
+    for payload in payloads[:1000]:
+        normalized = normalize_reading(payload)
+        normalized.pop('missing_fields')
+        assert legacy_normalize_sensor_data(payload) == normalized, payload
+
+    print(f"Normalizing {len(payloads):,} readings")
+    before = bench('legacy normalize_sensor_data', legacy_normalize_sensor_data, payloads, repeat=args.repeat)
+    after = bench('resolver normalize_reading', normalize_reading, payloads, repeat=args.repeat)
+    batched = bench('resolver normalize_batch', normalize_batch, payloads, batched=True, repeat=args.repeat)
+    print(f"  speedup: {before / after:.2f}x single, {before / batched:.2f}x batched")
+
+
+if __name__ == '__main__':
+    main()
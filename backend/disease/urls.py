@@ -1,7 +1,8 @@
 from django.urls import path
-from .views import PredictDiseaseView, UserDiseaseHistoryView
+from .views import PredictDiseaseView, UserDiseaseHistoryView, DiseaseHistoryExportView
 
 urlpatterns = [
      path("predict/", PredictDiseaseView.as_view(), name="disease-predict"),
       path("crop-history/", UserDiseaseHistoryView.as_view(), name="user-disease-history"),
+      path("crop-history/export/", DiseaseHistoryExportView.as_view(), name="user-disease-history-export"),
 ]
@@ -3,13 +3,18 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import permissions, status
 from django.conf import settings
+from agriboost.export import ExportView
+from agriboost.metrics import stage_timer
 import tensorflow as tf
 from PIL import Image
 import numpy as np
 import io
+import logging
 from .models import DiseaseHistory
 from .serializers import DiseaseHistorySerializer
 
+logger = logging.getLogger(__name__)
+
 _model = None
 
 # 🔹 Disease info dictionary
@@ -60,11 +65,13 @@ class PredictDiseaseView(APIView):
         except FileNotFoundError:
             return Response({"detail": "Model file not found on server."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
         except Exception as e:
+            logger.exception("Failed to load disease model")
             return Response({"detail": f"Failed to load model: {e}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
         try:
             input_tensor = _prepare_image(uploaded)
-            preds = model.predict(input_tensor)
+            with stage_timer("disease_predict"):
+                preds = model.predict(input_tensor)
             prob = float(np.max(preds))
             label_idx = int(np.argmax(preds))
 
@@ -90,14 +97,16 @@ class PredictDiseaseView(APIView):
                 "recommendation": recommendation,
             }
 
-            history = DiseaseHistory.objects.create(
-                user=request.user,
-                
-                label=result["label"],
-                confidence=result["confidence"],
-                recommendation=result["recommendation"],
-            )
+            with stage_timer("disease_history_write"):
+                history = DiseaseHistory.objects.create(
+                    user=request.user,
+                    
+                    label=result["label"],
+                    confidence=result["confidence"],
+                    recommendation=result["recommendation"],
+                )
         except Exception as e:
+            logger.exception("Disease prediction failed")
             return Response({"detail": f"Prediction failed: {e}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
         return Response({"prediction": result, "history_id": history.id}, status=status.HTTP_200_OK)
@@ -109,3 +118,8 @@ class UserDiseaseHistoryView(APIView):
         history = DiseaseHistory.objects.filter(user=request.user).order_by("-created_at")
         serializer = DiseaseHistorySerializer(history, many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
+
+
+class DiseaseHistoryExportView(ExportView):
+    """Download the user's disease predictions (GET ?type=csv|parquet)."""
+    export = "disease_history"
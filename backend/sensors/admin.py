@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import FertilizerPrediction
+from .models import AlertRule, FertilizerPrediction, SensorImportCheckpoint, SensorReading, SensorRollup
 
 
 @admin.register(FertilizerPrediction)
@@ -18,10 +18,42 @@ class FertilizerPredictionAdmin(admin.ModelAdmin):
             'fields': ('temperature', 'humidity', 'soil_moisture', 'soil_ph', 'ec', 'nitrogen', 'phosphorus', 'potassium')
         }),
         ('Prediction Results', {
-            'fields': ('recommended_fertilizer', 'fertilizer_amount', 'confidence_score', 'recommendation_details')
+            'fields': ('recommended_fertilizer', 'fertilizer_amount', 'confidence_score', 'recommendation_details',
+                       'alternatives')
         }),
         ('Timestamps', {
             'fields': ('created_at', 'updated_at'),
             'classes': ('collapse',)
         }),
     )
+
+
+@admin.register(SensorReading)
+class SensorReadingAdmin(admin.ModelAdmin):
+    list_display = ['id', 'device_id', 'timestamp', 'temperature', 'soil_moisture', 'soil_ph', 'battery', 'anomalies']
+    list_filter = ['device_id']
+    search_fields = ['device_id', 'label']
+    readonly_fields = ['created_at']
+    date_hierarchy = 'timestamp'
+
+
+@admin.register(SensorRollup)
+class SensorRollupAdmin(admin.ModelAdmin):
+    list_display = ['id', 'device_id', 'metric', 'resolution', 'bucket_start', 'min_value', 'max_value', 'count']
+    list_filter = ['resolution', 'metric', 'device_id']
+    date_hierarchy = 'bucket_start'
+
+
+@admin.register(AlertRule)
+class AlertRuleAdmin(admin.ModelAdmin):
+    list_display = ['id', 'name', 'metric', 'operator', 'threshold', 'hysteresis', 'device_id', 'crop_type', 'enabled']
+    list_filter = ['enabled', 'metric', 'crop_type']
+    search_fields = ['name', 'device_id']
+    readonly_fields = ['created_at', 'updated_at']
+
+
+@admin.register(SensorImportCheckpoint)
+class SensorImportCheckpointAdmin(admin.ModelAdmin):
+    list_display = ['id', 'source', 'records_done', 'rows_written', 'records_skipped', 'completed', 'updated_at']
+    list_filter = ['completed']
+    readonly_fields = ['started_at', 'updated_at']
@@ -0,0 +1,256 @@
+"""
+Threshold alert rules evaluated over whole batches of readings.
+
+``AlertRule`` rows are compiled once into NumPy arrays (metric column,
+direction, threshold and clear level per rule, plus the scope masks) so a
+batch of readings is checked against every rule with a handful of vector
+comparisons. The compiled set is cached and reloaded when a rule is saved
+or deleted, or after SENSOR_ALERT_RULES_TTL_SECONDS for changes made by
+other processes.
+
+``AlertEngine`` also remembers which rules are active for each sensor:
+
+- Hysteresis: an active alert stays active until the value moves back
+  past the threshold by the rule's hysteresis, so a sensor sitting on the
+  threshold does not flap between alerting and clear.
+- Deduplication: a rule is only *raised* (logged and counted in
+  agriboost_sensor_alerts_raised_total) when it becomes active, not on
+  every poll that sees it still active. The reading's ``alerts`` list
+  always shows every active alert.
+"""
+
+import logging
+import threading
+import time
+from collections import namedtuple
+from typing import Dict, List, Optional, Sequence, Set
+
+import numpy as np
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from agriboost.metrics import REGISTRY
+
+from .models import AlertRule
+from .normalization import (
+    FIELD_INDEX, MOISTURE_LOW, PH_HIGH, PH_LOW, TEMPERATURE_HIGH, TEMPERATURE_LOW,
+)
+
+logger = logging.getLogger(__name__)
+
+ALERTS_RAISED = REGISTRY.counter(
+    'agriboost_sensor_alerts_raised_total',
+    'Sensor alerts that became active.',
+    ('metric',),
+)
+
+# The fields of AlertRule the engine uses; BUILTIN_RULES are plain RuleSpecs
+RuleSpec = namedtuple('RuleSpec', 'id name device_id crop_type metric operator threshold hysteresis message')
+
+# Used until the AlertRule table can be read (same rules as migration 0005)
+BUILTIN_RULES = (
+    RuleSpec('builtin-1', 'High temperature', '', '', 'temperature', 'gt', TEMPERATURE_HIGH, 1.0,
+             "High temperature alert: {value}°C exceeds 40°C threshold"),
+    RuleSpec('builtin-2', 'Low temperature', '', '', 'temperature', 'lt', TEMPERATURE_LOW, 1.0,
+             "Low temperature alert: {value}°C below 10°C threshold"),
+    RuleSpec('builtin-3', 'Low pH', '', '', 'soil_ph', 'lt', PH_LOW, 0.1,
+             "Low pH alert: {value} below 5.0 threshold"),
+    RuleSpec('builtin-4', 'High pH', '', '', 'soil_ph', 'gt', PH_HIGH, 0.1,
+             "High pH alert: {value} exceeds 8.0 threshold"),
+    RuleSpec('builtin-5', 'Low soil moisture', '', '', 'soil_moisture', 'lt', MOISTURE_LOW, 2.0,
+             "Low soil moisture alert: {value}% below 30% threshold"),
+)
+
+
+class CompiledRules:
+    """
+    A rule set compiled into arrays for batch evaluation.
+
+    Every comparison is done on signed values (negated for 'lt' rules), so
+    "above the threshold" and "below the threshold" are the same test.
+
+    Args:
+        rules: AlertRule instances or RuleSpecs
+        crop_type: Crop currently grown; rules for other crops are dropped
+    """
+
+    def __init__(self, rules: Sequence, crop_type: str = ''):
+        rules = [
+            rule for rule in rules
+            if rule.metric in FIELD_INDEX and (not rule.crop_type or rule.crop_type == crop_type)
+        ]
+        self.rules = rules
+        self.ids = [rule.id for rule in rules]
+        self.columns = np.array([FIELD_INDEX[rule.metric] for rule in rules], dtype=np.intp)
+        self.signs = np.array([-1.0 if rule.operator == 'lt' else 1.0 for rule in rules])
+        self.thresholds = self.signs * np.array([rule.threshold for rule in rules], dtype=np.float64)
+        # Signed level an active alert has to drop to (or below) before it clears
+        self.clear_levels = self.thresholds - np.abs([rule.hysteresis for rule in rules])
+        self.device_ids = np.array([rule.device_id for rule in rules], dtype=object)
+        self.device_scoped = self.device_ids != ''
+        # Device rules beat crop rules, which beat global rules
+        self.specificity = self.device_scoped * 2 + np.array([bool(rule.crop_type) for rule in rules])
+        # Rules competing for the same metric and direction
+        slots: Dict[tuple, List[int]] = {}
+        for index, rule in enumerate(rules):
+            slots.setdefault((rule.metric, rule.operator), []).append(index)
+        self.slots = [np.array(members, dtype=np.intp) for members in slots.values() if len(members) > 1]
+
+    def __len__(self):
+        return len(self.rules)
+
+    def applicable(self, device_ids: Sequence[str]) -> np.ndarray:
+        """Boolean (readings x rules) matrix of the rule in force for each reading."""
+        devices = np.array(device_ids, dtype=object).reshape(-1, 1)
+        applies = ~self.device_scoped | (devices == self.device_ids)
+        if self.slots:
+            rank = np.where(applies, self.specificity, -1)
+            for members in self.slots:
+                best = rank[:, members].max(axis=1, keepdims=True)
+                applies[:, members] &= rank[:, members] == best
+        return applies
+
+    def firing(self, values: np.ndarray, device_ids: Sequence[str], active: np.ndarray) -> np.ndarray:
+        """
+        Evaluate every rule against every reading.
+
+        Args:
+            values: Float matrix with one row per reading, columns as NUMERIC_FIELDS
+            device_ids: Sensor id of each row
+            active: Boolean (readings x rules) matrix of the alerts already active
+
+        Returns:
+            Boolean (readings x rules) matrix of the alerts active after these readings
+        """
+        signed = values[:, self.columns] * self.signs
+        # Inactive rules fire past the threshold; active ones hold until the clear level
+        over = np.where(active, signed > self.clear_levels, signed > self.thresholds)
+        return over & self.applicable(device_ids)
+
+    def message(self, index: int, value: float, device_id: str) -> str:
+        rule = self.rules[index]
+        try:
+            return rule.message.format(value=value, threshold=rule.threshold, device_id=device_id)
+        except (KeyError, IndexError, ValueError):
+            # A bad template in the admin should not break the feed
+            return f"{rule.name}: {value}"
+
+
+class AlertEngine:
+    """Cached compiled rules plus the active alerts of every sensor."""
+
+    _lock = threading.Lock()
+    _compiled: Optional[CompiledRules] = None
+    _loaded_at = 0.0
+
+    # device_id -> ids of the rules currently active for it
+    _active: Dict[str, Set] = {}
+
+    @classmethod
+    def rules(cls) -> CompiledRules:
+        """Return the compiled rule set, reloading it when invalidated or expired."""
+        ttl = getattr(settings, 'SENSOR_ALERT_RULES_TTL_SECONDS', 30.0)
+        compiled = cls._compiled
+        if compiled is not None and time.monotonic() - cls._loaded_at < ttl:
+            return compiled
+
+        crop_type = getattr(settings, 'SENSOR_CROP_TYPE', '')
+        try:
+            compiled = CompiledRules(list(AlertRule.objects.filter(enabled=True)), crop_type)
+        except Exception as e:
+            # Table not migrated yet, or no database on this thread
+            logger.warning("Could not load alert rules; using built-in thresholds: %s", e)
+            compiled = cls._compiled or CompiledRules(BUILTIN_RULES, crop_type)
+        cls._compiled = compiled
+        cls._loaded_at = time.monotonic()
+        return compiled
+
+    @classmethod
+    def use_rules(cls, rules: Sequence, crop_type: str = '') -> CompiledRules:
+        """Pin the rule set (e.g. BUILTIN_RULES in tests) until the next invalidate()."""
+        cls._compiled = CompiledRules(rules, crop_type)
+        cls._loaded_at = float('inf')
+        return cls._compiled
+
+    @classmethod
+    def invalidate(cls):
+        cls._compiled = None
+
+    @classmethod
+    def reset(cls):
+        """Forget the cached rules and every active alert."""
+        with cls._lock:
+            cls._compiled = None
+            cls._active = {}
+
+    @classmethod
+    def evaluate(cls, values: np.ndarray, device_ids: Sequence[str]) -> List[List[str]]:
+        """
+        Evaluate the alert rules for a batch of readings and update the alert state.
+
+        Args:
+            values: Float matrix with one row per reading, columns as NUMERIC_FIELDS
+            device_ids: Sensor id of each row
+
+        Returns:
+            List of active alert messages per reading
+        """
+        compiled = cls.rules()
+        alerts = [[] for _ in range(len(values))]
+        if not len(compiled) or not len(values):
+            return alerts
+
+        # A sensor can appear more than once (e.g. history replays); its later
+        # readings must see the state left by the earlier ones, so rows are
+        # evaluated in rounds with each sensor at most once per round
+        rounds: List[List[int]] = []
+        seen: Dict[str, int] = {}
+        for row, device_id in enumerate(device_ids):
+            occurrence = seen.get(device_id, 0)
+            seen[device_id] = occurrence + 1
+            if occurrence == len(rounds):
+                rounds.append([])
+            rounds[occurrence].append(row)
+
+        with cls._lock:
+            for rows in rounds:
+                devices = [device_ids[row] for row in rows]
+                active = np.array(
+                    [[rule_id in cls._active.get(device_id, ()) for rule_id in compiled.ids] for device_id in devices],
+                    dtype=bool,
+                ).reshape(len(rows), len(compiled))
+                firing = compiled.firing(values[rows], devices, active)
+
+                raised = firing & ~active
+                cleared = active & ~firing
+                for position, row in enumerate(rows):
+                    if raised[position].any() or cleared[position].any():
+                        cls._active[devices[position]] = {
+                            compiled.ids[index] for index in np.flatnonzero(firing[position]).tolist()
+                        }
+                    for index in np.flatnonzero(firing[position]).tolist():
+                        value = float(values[row, compiled.columns[index]])
+                        alerts[row].append(compiled.message(index, value, devices[position]))
+                        if raised[position, index]:
+                            cls._raised(compiled.rules[index], devices[position], value)
+                    for index in np.flatnonzero(cleared[position]).tolist():
+                        logger.info(
+                            "Sensor alert cleared",
+                            extra={'device_id': devices[position], 'rule': compiled.rules[index].name},
+                        )
+        return alerts
+
+    @staticmethod
+    def _raised(rule, device_id: str, value: float):
+        ALERTS_RAISED.labels(rule.metric).inc()
+        logger.info(
+            "Sensor alert raised",
+            extra={'device_id': device_id, 'rule': rule.name, 'metric': rule.metric,
+                   'value': value, 'threshold': rule.threshold},
+        )
+
+
+@receiver([post_save, post_delete], sender=AlertRule)
+def _rules_changed(sender, **kwargs):
+    AlertEngine.invalidate()
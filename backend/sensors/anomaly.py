@@ -0,0 +1,286 @@
+"""
+Streaming anomaly and stuck-sensor detection.
+
+One small detector runs per (sensor, metric). Each reading updates it in
+constant time and memory and is checked three ways:
+
+- ``spike``: further than SENSOR_ANOMALY_Z_THRESHOLD standard deviations
+  from the EWMA mean (mean and variance are exponentially weighted).
+- ``outlier``: robust z-score above SENSOR_ANOMALY_MAD_THRESHOLD against
+  the median and MAD of the last SENSOR_ANOMALY_WINDOW values (a fixed-size
+  ring buffer).
+- ``stuck``: the value has not moved for SENSOR_ANOMALY_FLATLINE_COUNT
+  readings. Only checked for the analog metrics that always jitter a little;
+  NPK, pH and EC probes are quantized and legitimately hold a value for hours.
+
+Flags are attached to the normalized reading as ``anomalies`` (a list of
+``"metric:kind"`` strings), stored on SensorReading, left out of the
+rollups and skipped by the fertilizer prediction. Fields normalization
+filled with a default (the reading's ``missing_fields``) are not
+measurements and are skipped.
+
+Detector state is saved to SensorDetectorState with every ingestion flush
+(and at exit, by ``SensorIngestion.shutdown``) and loaded again the first
+time a sensor is seen, so it survives worker restarts. Inspecting readings
+does not start the flusher; ingesting them does.
+"""
+
+import json
+import logging
+import math
+import threading
+from typing import Dict, Iterable, List, Optional
+
+from django.conf import settings
+
+from .models import SensorDetectorState
+
+logger = logging.getLogger(__name__)
+
+# metric -> (noise floor for the spread estimates, stuck check applies)
+DETECTED_METRICS = {
+    'temperature': (0.2, True),
+    'humidity': (0.5, True),
+    'soil_moisture': (0.5, True),
+    'soil_ph': (0.05, False),
+    'ec': (0.05, False),
+    'nitrogen': (2.0, False),
+    'phosphorous': (2.0, False),
+    'potassium': (2.0, False),
+}
+
+# Scale factor making the MAD a consistent estimator of the standard deviation
+MAD_SCALE = 1.4826
+
+
+class MetricDetector:
+    """Online detector for one sensor metric."""
+
+    __slots__ = ('count', 'mean', 'variance', 'window', 'position', 'last', 'run', 'timestamp', 'flags')
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.variance = 0.0
+        self.window: List[float] = []
+        self.position = 0
+        self.last: Optional[float] = None
+        self.run = 0
+        # Timestamp of the last reading applied and the flags it got
+        self.timestamp: Optional[str] = None
+        self.flags: List[str] = []
+
+    def update(self, value: float, floor: float, check_stuck: bool, config: Dict) -> List[str]:
+        """
+        Check value against the current state, then fold it in.
+
+        Args:
+            value: The new measurement
+            floor: Minimum spread, so a perfectly steady metric does not flag every change
+            check_stuck: Whether the flat-line check applies to this metric
+            config: Thresholds (see AnomalyDetector.config)
+
+        Returns:
+            The kinds of anomaly detected ('spike', 'outlier', 'stuck')
+        """
+        flags = []
+        std = max(math.sqrt(self.variance), floor)
+        if self.count >= config['warmup']:
+            if abs(value - self.mean) > config['z_threshold'] * std:
+                flags.append('spike')
+
+            ordered = sorted(self.window)
+            median = _median(ordered)
+            mad = _median(sorted(abs(item - median) for item in ordered))
+            if abs(value - median) > config['mad_threshold'] * max(MAD_SCALE * mad, floor):
+                flags.append('outlier')
+
+        if self.last is not None and value == self.last:
+            self.run += 1
+        else:
+            self.run = 0
+        if check_stuck and self.run + 1 >= config['flatline_count']:
+            flags.append('stuck')
+        self.last = value
+
+        # Spikes are clamped before updating the EWMA so one bad value does not
+        # blow up the variance; a real level shift is still followed, gradually
+        if self.count:
+            limit = config['z_threshold'] * std
+            clamped = min(max(value, self.mean - limit), self.mean + limit)
+            delta = clamped - self.mean
+            increment = config['alpha'] * delta
+            self.mean += increment
+            self.variance = (1 - config['alpha']) * (self.variance + delta * increment)
+        else:
+            self.mean = value
+        self.count += 1
+
+        if len(self.window) < config['window']:
+            self.window.append(value)
+        else:
+            self.window[self.position % len(self.window)] = value
+        self.position = (self.position + 1) % config['window']
+        return flags
+
+    def to_json(self) -> str:
+        return json.dumps({slot: getattr(self, slot) for slot in self.__slots__})
+
+    @classmethod
+    def from_json(cls, text: str) -> 'MetricDetector':
+        detector = cls()
+        for slot, value in json.loads(text).items():
+            if slot in cls.__slots__:
+                setattr(detector, slot, value)
+        return detector
+
+
+def _median(ordered: List[float]) -> float:
+    middle = len(ordered) // 2
+    if len(ordered) % 2:
+        return ordered[middle]
+    return (ordered[middle - 1] + ordered[middle]) / 2.0
+
+
+class AnomalyDetector:
+    """Process-wide detectors for every sensor metric."""
+
+    _lock = threading.Lock()
+    # device_id -> metric -> detector
+    _detectors: Dict[str, Dict[str, MetricDetector]] = {}
+    # (device_id, metric) pairs changed since the last save
+    _dirty: set = set()
+
+    @staticmethod
+    def is_enabled() -> bool:
+        return getattr(settings, 'SENSOR_ANOMALY_ENABLED', True)
+
+    @staticmethod
+    def config() -> Dict:
+        return {
+            'alpha': getattr(settings, 'SENSOR_ANOMALY_ALPHA', 0.1),
+            'warmup': getattr(settings, 'SENSOR_ANOMALY_WARMUP', 10),
+            'window': getattr(settings, 'SENSOR_ANOMALY_WINDOW', 31),
+            'z_threshold': getattr(settings, 'SENSOR_ANOMALY_Z_THRESHOLD', 4.0),
+            'mad_threshold': getattr(settings, 'SENSOR_ANOMALY_MAD_THRESHOLD', 5.0),
+            'flatline_count': getattr(settings, 'SENSOR_ANOMALY_FLATLINE_COUNT', 20),
+        }
+
+    @classmethod
+    def inspect(cls, readings: Iterable[Dict]) -> int:
+        """
+        Run the detectors over normalized readings and set each one's ``anomalies``.
+
+        Each reading is applied once. A reading whose timestamp is not newer
+        than the last one applied for its sensor leaves the state alone; if it
+        is that same reading (a re-poll, or a reading first seen by the feed
+        and then ingested) it gets the flags it got the first time. Changed
+        detectors are saved by the next ingestion flush.
+
+        Returns:
+            Number of readings flagged
+        """
+        readings = [reading for reading in readings if reading.get('device_id')]
+        if not cls.is_enabled():
+            for reading in readings:
+                reading.setdefault('anomalies', [])
+            return 0
+
+        config = cls.config()
+        flagged = 0
+        with cls._lock:
+            for reading in readings:
+                device_id = str(reading['device_id'])
+                detectors = cls._detectors.get(device_id)
+                if detectors is None:
+                    detectors = cls._detectors[device_id] = cls._load(device_id)
+
+                timestamp = str(reading.get('timestamp') or '')
+                missing = reading.get('missing_fields') or ()
+                anomalies = []
+                for metric, (floor, check_stuck) in DETECTED_METRICS.items():
+                    value = reading.get(metric)
+                    # A default filled in by normalization is not a measurement
+                    if value is None or metric in missing:
+                        continue
+                    detector = detectors.get(metric)
+                    if detector is None:
+                        detector = detectors[metric] = MetricDetector()
+                    if detector.timestamp is not None and timestamp and timestamp <= detector.timestamp:
+                        kinds = detector.flags if timestamp == detector.timestamp else []
+                    else:
+                        kinds = detector.update(float(value), floor, check_stuck, config)
+                        detector.timestamp = timestamp or None
+                        detector.flags = kinds
+                        cls._dirty.add((device_id, metric))
+                    anomalies.extend(f"{metric}:{kind}" for kind in kinds)
+
+                reading['anomalies'] = anomalies
+                if anomalies:
+                    flagged += 1
+                    logger.info(
+                        "Sensor reading flagged as anomalous",
+                        extra={'device_id': device_id, 'anomalies': anomalies, 'timestamp': timestamp},
+                    )
+        return flagged
+
+    @staticmethod
+    def _load(device_id: str) -> Dict[str, MetricDetector]:
+        """Restore a sensor's saved detectors (empty if none or the database is unavailable)."""
+        try:
+            rows = list(SensorDetectorState.objects.filter(device_id=device_id).values_list('metric', 'state'))
+        except Exception as e:
+            logger.warning("Could not load anomaly detector state; starting fresh: %s", e)
+            return {}
+        detectors = {}
+        for metric, state in rows:
+            try:
+                detectors[metric] = MetricDetector.from_json(state)
+            except (ValueError, TypeError):
+                logger.warning("Discarding corrupt anomaly detector state",
+                               extra={'device_id': device_id, 'metric': metric})
+        return detectors
+
+    @classmethod
+    def has_unsaved(cls) -> bool:
+        return bool(cls._dirty)
+
+    @classmethod
+    def save(cls) -> int:
+        """
+        Write the detectors changed since the last save to SensorDetectorState.
+
+        Called inside the ingestion flush transaction.
+
+        Returns:
+            Number of detector states written
+        """
+        with cls._lock:
+            dirty, cls._dirty = cls._dirty, set()
+            rows = [
+                SensorDetectorState(device_id=device_id, metric=metric,
+                                    state=cls._detectors[device_id][metric].to_json())
+                for device_id, metric in dirty
+            ]
+        if not rows:
+            return 0
+        try:
+            SensorDetectorState.objects.bulk_create(
+                rows,
+                update_conflicts=True,
+                unique_fields=['device_id', 'metric'],
+                update_fields=['state', 'updated_at'],
+            )
+        except Exception:
+            # Keep them dirty so the next flush retries
+            with cls._lock:
+                cls._dirty.update(dirty)
+            raise
+        return len(rows)
+
+    @classmethod
+    def reset(cls):
+        """Forget every in-memory detector (saved state is kept)."""
+        with cls._lock:
+            cls._detectors = {}
+            cls._dirty = set()
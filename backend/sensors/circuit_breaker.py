@@ -0,0 +1,136 @@
+"""
+Circuit breaker for Firebase Realtime Database access.
+
+After ``failure_threshold`` consecutive failures the breaker opens and
+calls fail immediately with ``CircuitOpenError`` instead of waiting on a
+request that is likely to time out. Once the backoff has elapsed a single
+probe call is let through (half-open); success closes the breaker, failure
+re-opens it with the backoff doubled, up to ``max_backoff``.
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Awaitable, Callable, Optional
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling upstream while the breaker is open."""
+
+    def __init__(self, name: str, retry_in: float):
+        super().__init__(f"{name} circuit is open; next probe in {retry_in:.1f}s")
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with exponential probe backoff."""
+
+    def __init__(self, name: str, failure_threshold: int = 3, backoff: float = 5.0,
+                 max_backoff: float = 120.0, clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._clock = clock
+
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._trips = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state
+
+    def _current_backoff(self) -> float:
+        return min(self.backoff * (2 ** max(0, self._trips - 1)), self.max_backoff)
+
+    def retry_in(self) -> float:
+        """Seconds until the next probe is allowed (0 when calls go through)."""
+        with self._lock:
+            if self._state != OPEN:
+                return 0.0
+            return max(0.0, self._opened_at + self._current_backoff() - self._clock())
+
+    def allow(self) -> bool:
+        """
+        Check whether a call may go upstream now.
+
+        While open, the first caller after the backoff becomes the probe and
+        every other caller is refused until the probe reports back.
+        """
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+            if self._state == OPEN and self._clock() - self._opened_at >= self._current_backoff():
+                self._state = HALF_OPEN
+            if self._state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._state = CLOSED
+            self._failures = 0
+            self._trips = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    self._trips += 1
+                    logger.warning(
+                        "Circuit opened",
+                        extra={'circuit': self.name, 'failures': self._failures,
+                               'retry_in': self._current_backoff()},
+                    )
+                self._state = OPEN
+                self._opened_at = self._clock()
+            self._probing = False
+
+    def call(self, fn: Callable[[], Any]) -> Any:
+        """
+        Run fn through the breaker.
+
+        Raises:
+            CircuitOpenError: If the breaker refuses the call
+        """
+        if not self.allow():
+            raise CircuitOpenError(self.name, self.retry_in())
+        try:
+            result = fn()
+        except BaseException:
+            self.record_failure()
+            raise
+        self.record_success()
+        return result
+
+    async def acall(self, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Await fn() through the breaker; the coroutine version of call().
+
+        Raises:
+            CircuitOpenError: If the breaker refuses the call
+        """
+        if not self.allow():
+            raise CircuitOpenError(self.name, self.retry_in())
+        try:
+            result = await fn()
+        except BaseException:
+            self.record_failure()
+            raise
+        self.record_success()
+        return result
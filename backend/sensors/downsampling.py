@@ -0,0 +1,74 @@
+"""
+Largest-Triangle-Three-Buckets (LTTB) downsampling for chart series.
+
+LTTB keeps the first and last points and, for every bucket in between,
+the point forming the largest triangle with the previously selected point
+and the average of the next bucket. This preserves peaks and troughs far
+better than striding or averaging.
+
+The selection is inherently sequential over buckets, so the loop runs once
+per *output* point while all per-bucket work (bucket averages, triangle
+areas, argmax) is done with NumPy array operations.
+"""
+
+import numpy as np
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Select the indices of at most ``threshold`` points to keep.
+
+    Args:
+        x: Monotonically increasing x values (e.g. epoch seconds)
+        y: Values, same length as x
+        threshold: Maximum number of points to return
+
+    Returns:
+        Sorted integer indices into x / y
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    length = len(x)
+    if threshold >= length or length <= 2:
+        return np.arange(length)
+    if threshold < 3:
+        return np.array([0, length - 1])[:max(threshold, 0)]
+
+    # Interior points 1..length-2 split into threshold-2 buckets
+    bucket_count = threshold - 2
+    edges = np.floor(np.linspace(1, length - 1, bucket_count + 1)).astype(np.int64)
+    starts = edges[:-1]
+    sizes = np.diff(edges)
+
+    # Average point of every bucket; the "next" average for the last bucket is the last point
+    averages_x = np.add.reduceat(x[1:length - 1], starts - 1) / sizes
+    averages_y = np.add.reduceat(y[1:length - 1], starts - 1) / sizes
+    next_x = np.append(averages_x[1:], x[-1])
+    next_y = np.append(averages_y[1:], y[-1])
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = length - 1
+    anchor = 0
+    for bucket in range(bucket_count):
+        start, end = edges[bucket], edges[bucket + 1]
+        anchor_x, anchor_y = x[anchor], y[anchor]
+        # Twice the triangle area; the constant factor does not change the argmax
+        areas = np.abs(
+            (anchor_x - next_x[bucket]) * (y[start:end] - anchor_y)
+            - (anchor_x - x[start:end]) * (next_y[bucket] - anchor_y)
+        )
+        anchor = start + int(np.argmax(areas))
+        selected[bucket + 1] = anchor
+    return selected
+
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int):
+    """
+    Downsample a series to at most ``threshold`` points.
+
+    Returns:
+        Tuple of (x, y) arrays
+    """
+    indices = lttb_indices(x, y, threshold)
+    return np.asarray(x)[indices], np.asarray(y)[indices]
@@ -0,0 +1,141 @@
+"""
+Feature assembly for the fertilizer classifier without pandas.
+
+The classifier was trained on a DataFrame with the columns in
+TRAINING_COLUMNS, the two categorical ones label-encoded. Building a
+one-row DataFrame and calling ``LabelEncoder.transform`` on it for every
+prediction costs far more than the forest itself, so ``FeatureAssembler``
+precomputes, once per model bundle:
+
+- the column order, taken from the model's ``feature_names_in_`` and
+  checked against the training columns;
+- dict lookups replacing the soil and crop ``LabelEncoder``s.
+
+A prediction then fills a preallocated float array in that order. The
+model is fitted with feature names but gets a plain array; the names were
+checked when the assembler was built, so calls into sklearn with these
+rows are wrapped in ``unnamed_features()``, which silences its "X does not
+have valid feature names" warning for that call only.
+"""
+
+import threading
+import warnings
+from contextlib import contextmanager
+from typing import Dict, Iterable, Mapping, Optional, Tuple
+
+import numpy as np
+
+# Training columns (with the training data's spelling) -> key in sensor_data
+TRAINING_COLUMNS = (
+    ('Temparature', 'temperature'),
+    ('Humidity', 'humidity'),
+    ('Moisture', 'moisture'),
+    ('Soil_Type', 'soil_type'),
+    ('Crop_Type', 'crop_type'),
+    ('Nitrogen', 'nitrogen'),
+    ('Potassium', 'potassium'),
+    ('Phosphorous', 'phosphorous'),
+)
+
+CATEGORICAL_COLUMNS = ('Soil_Type', 'Crop_Type')
+
+
+@contextmanager
+def unnamed_features():
+    """Silence sklearn's feature-name warning while it is given assembled rows."""
+    with warnings.catch_warnings():
+        warnings.filterwarnings('ignore', message='X does not have valid feature names', category=UserWarning)
+        yield
+
+
+def _codes(encoder) -> Dict[str, int]:
+    """A fitted LabelEncoder as a {label: code} dict."""
+    return {label: code for code, label in enumerate(encoder.classes_.tolist())}
+
+
+class FeatureAssembler:
+    """
+    Turns sensor readings into the classifier's feature rows.
+
+    Args:
+        model: The fitted classifier
+        soil_encoder: LabelEncoder of the Soil_Type column
+        crop_encoder: LabelEncoder of the Crop_Type column
+
+    Raises:
+        ValueError: The model expects columns other than TRAINING_COLUMNS
+    """
+
+    def __init__(self, model, soil_encoder, crop_encoder):
+        keys = dict(TRAINING_COLUMNS)
+        names = getattr(model, 'feature_names_in_', None)
+        self.feature_names: Tuple[str, ...] = (
+            tuple(names.tolist()) if names is not None else tuple(keys)
+        )
+        if sorted(self.feature_names) != sorted(keys):
+            raise ValueError(
+                f"Classifier expects features {list(self.feature_names)}, not {list(keys)}"
+            )
+
+        self.codes = {'Soil_Type': _codes(soil_encoder), 'Crop_Type': _codes(crop_encoder)}
+        # (position, sensor_data key) of the numeric and categorical columns
+        self._numeric = tuple(
+            (position, keys[name]) for position, name in enumerate(self.feature_names)
+            if name not in CATEGORICAL_COLUMNS
+        )
+        self._categorical = tuple(
+            (position, keys[name], self.codes[name]) for position, name in enumerate(self.feature_names)
+            if name in CATEGORICAL_COLUMNS
+        )
+        self._local = threading.local()
+
+    def encode(self, column: str, label: str) -> int:
+        """
+        Code of a Soil_Type or Crop_Type label.
+
+        Raises:
+            ValueError: Unknown label (the same error LabelEncoder.transform raises)
+        """
+        try:
+            return self.codes[column][label]
+        except (KeyError, TypeError):
+            raise ValueError(f"y contains previously unseen labels: {label!r}")
+
+    def row(self, sensor_data: Mapping, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Feature row for one reading, shape (1, n_features).
+
+        Args:
+            sensor_data: Reading with temperature, humidity, moisture, nitrogen,
+                potassium, phosphorous, soil_type and crop_type (None becomes NaN)
+            out: Array to fill; by default a buffer owned by this thread, which
+                the next call on the same thread overwrites
+
+        Raises:
+            ValueError: Unknown soil or crop type, or a non-numeric value
+        """
+        if out is None:
+            out = getattr(self._local, 'buffer', None)
+            if out is None:
+                out = self._local.buffer = np.empty((1, len(self.feature_names)), dtype=np.float64)
+        target = out[0]
+        for position, key in self._numeric:
+            value = sensor_data.get(key)
+            target[position] = np.nan if value is None else value
+        for position, key, codes in self._categorical:
+            label = sensor_data.get(key)
+            code = codes.get(label)
+            if code is None:
+                raise ValueError(f"y contains previously unseen labels: {label!r}")
+            target[position] = code
+        return out
+
+    def matrix(self, readings: Iterable[Mapping], count: Optional[int] = None) -> np.ndarray:
+        """Feature matrix for many readings, one row each (count preallocates)."""
+        if count is None:
+            readings = list(readings)
+            count = len(readings)
+        out = np.empty((count, len(self.feature_names)), dtype=np.float64)
+        for index, sensor_data in enumerate(readings):
+            self.row(sensor_data, out[index:index + 1])
+        return out
@@ -0,0 +1,123 @@
+"""
+Short-lived cache of the rendered sensor feed.
+
+The feed is polled by every open dashboard, and between two sensor
+updates every poll returns the same readings. The rendered JSON body is
+kept in the Django cache for SENSOR_FEED_CACHE_SECONDS together with an
+ETag derived from the sensor values, so a burst of pollers costs one
+upstream fetch and serialization, and clients that already hold the
+current readings get a 304 without either.
+
+Once the entry has expired the feed has to be fetched again to know
+whether it changed, but a client whose If-None-Match still matches gets
+its 304 before the body is rendered. That entry keeps the payload
+instead, and the body is rendered only if a client without the current
+ETag asks for it.
+"""
+
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.renderers import JSONRenderer
+
+from .live import feed_digest
+
+CACHE_KEY_PREFIX = 'sensors:feed:'
+
+
+class FeedEntry(NamedTuple):
+    etag: str
+    # Rendered JSON body, or None while only clients holding the ETag have asked
+    body: Optional[bytes]
+    # Payload to render from when body is None
+    payload: Optional[Dict] = None
+
+
+class SensorFeedCache:
+    """Rendered feed bodies and their ETags, keyed by device filter."""
+
+    _renderer = JSONRenderer()
+
+    @staticmethod
+    def ttl() -> float:
+        """Cache lifetime in seconds (0 disables caching)."""
+        return getattr(settings, 'SENSOR_FEED_CACHE_SECONDS', 2.0)
+
+    @staticmethod
+    def cache_key(device_ids: Optional[List[str]]) -> str:
+        """
+        Cache key for a device filter.
+
+        Different orders of the same ids share the key, so callers must
+        fetch in a canonical order (SensorFeedView sorts the ids).
+        """
+        if device_ids is None:
+            return CACHE_KEY_PREFIX + '*'
+        return CACHE_KEY_PREFIX + ','.join(sorted(set(device_ids)))
+
+    @staticmethod
+    def make_etag(payload: Dict) -> str:
+        """
+        Weak ETag over the sensor values.
+
+        The body also carries timestamps and ages that change on every fetch;
+        those do not make the readings different, hence a weak validator.
+        """
+        return f'W/"{feed_digest(payload)}"'
+
+    @staticmethod
+    def matches(etag: str, if_none_match: str) -> bool:
+        """Whether an If-None-Match header value matches etag (weak comparison: W/"x" and "x" match)."""
+        client_etags = {tag.strip().removeprefix('W/') for tag in if_none_match.split(',')}
+        return '*' in client_etags or etag.removeprefix('W/') in client_etags
+
+    @classmethod
+    def get(cls, device_ids: Optional[List[str]]) -> Optional[FeedEntry]:
+        """Return the cached entry for this filter, if any."""
+        if cls.ttl() <= 0:
+            return None
+        return cache.get(cls.cache_key(device_ids))
+
+    @classmethod
+    def render(cls, device_ids: Optional[List[str]], fetch: Callable[[Optional[List[str]]], Dict],
+               if_none_match: str = '') -> FeedEntry:
+        """
+        Fetch the feed and store it in the cache.
+
+        Args:
+            device_ids: Sensor filter passed to fetch (None means all)
+            fetch: Callable returning the feed payload
+            if_none_match: The request's If-None-Match; when it matches the
+                fetched feed, the body is not rendered (body(entry) does it later)
+
+        Returns:
+            The new FeedEntry
+        """
+        return cls._store(device_ids, fetch(device_ids), if_none_match)
+
+    @classmethod
+    async def arender(cls, device_ids: Optional[List[str]],
+                      fetch: Callable[[Optional[List[str]]], Awaitable[Dict]],
+                      if_none_match: str = '') -> FeedEntry:
+        """Coroutine version of render for an async fetch."""
+        return cls._store(device_ids, await fetch(device_ids), if_none_match)
+
+    @classmethod
+    def body(cls, entry: FeedEntry) -> bytes:
+        """Rendered JSON body of an entry, rendering it now if the entry only has the payload."""
+        if entry.body is not None:
+            return entry.body
+        return cls._renderer.render(entry.payload)
+
+    @classmethod
+    def _store(cls, device_ids: Optional[List[str]], payload: Dict, if_none_match: str) -> FeedEntry:
+        etag = cls.make_etag(payload)
+        if cls.matches(etag, if_none_match):
+            entry = FeedEntry(etag, None, payload)
+        else:
+            entry = FeedEntry(etag, cls._renderer.render(payload))
+        ttl = cls.ttl()
+        if ttl > 0:
+            cache.set(cls.cache_key(device_ids), entry, ttl)
+        return entry
@@ -5,7 +5,7 @@ This service handles:
 - Firebase Admin SDK initialization
 - Fetching sensor data from Firebase Realtime Database
 - Normalizing sensor payloads to include all required fields
-- Generating alerts based on sensor thresholds
+- Generating alerts from the configurable AlertRule thresholds (see alert_rules)
 - Fallback to placeholder data if Firebase is unavailable
 
 TODO: Add your Firebase Admin SDK credentials to backend/firebase_key.json
@@ -15,12 +15,28 @@ TODO: Add your Firebase Admin SDK credentials to backend/firebase_key.json
       3. Save the JSON file as backend/firebase_key.json
 """
 
+import asyncio
 import os
 import json
+import logging
+import threading
+import time
 from datetime import datetime
 from typing import Dict, List, Optional
+from asgiref.sync import sync_to_async
 from django.conf import settings
 
+from agriboost.metrics import stage_timer
+
+from .alert_rules import AlertEngine
+from .anomaly import AnomalyDetector
+from .normalization import normalize_batch, normalize_reading
+from .circuit_breaker import CircuitBreaker, CircuitOpenError
+from .rtdb import FirebaseBackend, RecordingBackend, RTDBBackend, backend_from_settings
+from .singleflight import AsyncSingleFlight, SingleFlight
+
+logger = logging.getLogger(__name__)
+
 # Try to import Firebase Admin SDK
 try:
     import firebase_admin
@@ -28,7 +44,7 @@ try:
     FIREBASE_AVAILABLE = True
 except ImportError:
     FIREBASE_AVAILABLE = False
-    print("Warning: firebase-admin not installed. Install it with: pip install firebase-admin")
+    logger.warning("firebase-admin not installed. Install it with: pip install firebase-admin")
 
 
 class FirebaseService:
@@ -36,28 +52,69 @@ class FirebaseService:
     
     _initialized = False
     _firebase_connected = False
+    _init_lock = threading.Lock()
+
+    # RTDB access goes through this backend (see sensors.rtdb)
+    _backend: Optional[RTDBBackend] = None
+
+    # Coalesces concurrent fetches of the same sensors (see fetch_device_readings)
+    _fetches = SingleFlight()
+    _async_fetches = AsyncSingleFlight()
+
+    # Stops calling RTDB while it is failing; see get_sensor_readings
+    _breaker = CircuitBreaker(
+        'firebase',
+        failure_threshold=getattr(settings, 'FIREBASE_BREAKER_FAILURE_THRESHOLD', 3),
+        backoff=getattr(settings, 'FIREBASE_BREAKER_BACKOFF_SECONDS', 5.0),
+        max_backoff=getattr(settings, 'FIREBASE_BREAKER_MAX_BACKOFF_SECONDS', 120.0),
+    )
+
+    # Last successfully fetched normalized reading per sensor, and when it was fetched
+    _last_good: Dict[str, Dict] = {}
+    _last_good_at: Dict[str, float] = {}
+
+    # Cached layout descriptors per database path (see discover_layout)
+    _layouts: Dict[str, Dict] = {}
     
     @classmethod
     def initialize(cls):
         """
         Initialize Firebase Admin SDK.
         Falls back gracefully if credentials are missing or Firebase is unavailable.
+
+        Safe to call from many threads at once: initialization runs exactly
+        once per process, and concurrent callers wait for it to finish.
         """
+        if cls._initialized:
+            return
+        with cls._init_lock:
+            if cls._initialized:
+                return
+            cls._initialize_sdk()
+
+    @classmethod
+    def _initialize_sdk(cls):
+        """Do the actual initialization; callers must hold _init_lock."""
+        local_backend = backend_from_settings(settings)
+        if local_backend is not None:
+            # Offline stand-in: no SDK, credentials or network needed
+            cls._backend = local_backend
+            cls._firebase_connected = True
+            cls._initialized = True
+            return
+
         if not FIREBASE_AVAILABLE:
-            print("Firebase Admin SDK not available. Using placeholder data.")
+            logger.warning("Firebase Admin SDK not available. Using placeholder data.")
             cls._firebase_connected = False
             cls._initialized = True
             return
         
-        if cls._initialized:
-            return
-        
         try:
             # Get Firebase key file path from settings
             firebase_key_path = getattr(settings, 'FIREBASE_KEY_FILE', None)
             
             if not firebase_key_path or not os.path.exists(firebase_key_path):
-                print(f"Firebase key file not found at {firebase_key_path}. Using placeholder data.")
+                logger.warning("Firebase key file not found at %s. Using placeholder data.", firebase_key_path)
                 cls._firebase_connected = False
                 cls._initialized = True
                 return
@@ -67,12 +124,12 @@ class FirebaseService:
                 with open(firebase_key_path, 'r') as f:
                     key_content = json.load(f)
                     if not key_content or key_content == {}:
-                        print("Firebase key file is empty. Using placeholder data.")
+                        logger.warning("Firebase key file is empty. Using placeholder data.")
                         cls._firebase_connected = False
                         cls._initialized = True
                         return
             except (json.JSONDecodeError, ValueError):
-                print("Firebase key file is invalid. Using placeholder data.")
+                logger.warning("Firebase key file is invalid. Using placeholder data.")
                 cls._firebase_connected = False
                 cls._initialized = True
                 return
@@ -83,26 +140,63 @@ class FirebaseService:
                 # Try to get existing app - if it doesn't exist, this will raise ValueError
                 firebase_admin.get_app()
                 # If we get here, app is already initialized
+                cls._backend = cls._firebase_backend()
                 cls._firebase_connected = True
                 cls._initialized = True
-                print("Firebase already initialized.")
+                logger.info("Firebase already initialized.")
             except ValueError:
                 # App doesn't exist, so initialize it
                 cred = credentials.Certificate(firebase_key_path)
                 firebase_admin.initialize_app(cred, {
                     'databaseURL': getattr(settings, 'FIREBASE_DATABASE_URL', 
-                                          'https://agriboost-fyp-default-rtdb.firebaseio.com/')
+                                          'https://agriboost-fyp-default-rtdb.firebaseio.com/'),
+                    # Bound how long a request can wait on RTDB (the SDK default is 120s)
+                    'httpTimeout': getattr(settings, 'FIREBASE_HTTP_TIMEOUT_SECONDS', 5),
                 })
                 
+                cls._backend = cls._firebase_backend()
                 cls._firebase_connected = True
                 cls._initialized = True
-                print("Firebase initialized successfully.")
+                logger.info("Firebase initialized successfully.")
             
         except Exception as e:
-            print(f"Error initializing Firebase: {str(e)}. Using placeholder data.")
+            logger.error("Error initializing Firebase: %s. Using placeholder data.", e)
             cls._firebase_connected = False
             cls._initialized = True
     
+    @staticmethod
+    def _firebase_backend() -> RTDBBackend:
+        """The real database, wrapped in a recorder when FIREBASE_BACKEND is 'record'."""
+        backend = FirebaseBackend()
+        if getattr(settings, 'FIREBASE_BACKEND', 'firebase') == 'record':
+            fixture_path = getattr(settings, 'FIREBASE_FIXTURE_PATH', None)
+            logger.info("Recording RTDB payloads to %s", fixture_path)
+            backend = RecordingBackend(backend, fixture_path)
+        return backend
+
+    @classmethod
+    def use_backend(cls, backend: RTDBBackend):
+        """
+        Serve RTDB reads from backend instead of the configured one.
+
+        Used by benchmarks and tests; clears the cached layouts, breaker
+        state and last known good readings.
+        """
+        with cls._init_lock:
+            cls._backend = backend
+            cls._layouts = {}
+            cls._last_good = {}
+            cls._last_good_at = {}
+            cls._breaker.record_success()
+            cls._firebase_connected = True
+            cls._initialized = True
+
+    @classmethod
+    def backend(cls) -> Optional[RTDBBackend]:
+        """The RTDB backend in use (None when Firebase is not connected)."""
+        cls.initialize()
+        return cls._backend
+
     @classmethod
     def is_connected(cls) -> bool:
         """Check if Firebase is successfully connected."""
@@ -110,276 +204,396 @@ class FirebaseService:
             cls.initialize()
         return cls._firebase_connected
     
+    # Field names that mark a dict as a single sensor reading rather than {sensor_id: {...}}
+    DIRECT_READING_KEYS = (
+        'label', 'temprature', 'temperature', 'Temperature', 'Moisture', 'PH', 'EC',
+        'Nitrogen', 'Potassium', 'Phosphorous',
+    )
+
+    @classmethod
+    def split_devices(cls, sensor_data) -> Dict[str, Dict]:
+        """
+        Split a sensors node payload into raw readings keyed by sensor id.
+
+        Args:
+            sensor_data: Value of the sensors node (direct reading, {id: {...}} dict or list)
+
+        Returns:
+            Dictionary mapping sensor id to its raw reading dictionary
+        """
+        if isinstance(sensor_data, list):
+            return {str(index): item for index, item in enumerate(sensor_data) if isinstance(item, dict)}
+        if not isinstance(sensor_data, dict) or not sensor_data:
+            return {}
+        if any(key in sensor_data for key in cls.DIRECT_READING_KEYS):
+            sensors_path = getattr(settings, 'FIREBASE_SENSORS_PATH', '/sensors')
+            return {cls._direct_device_id(sensors_path): sensor_data}
+        return {str(key): value for key, value in sensor_data.items() if isinstance(value, dict)}
+
     @staticmethod
     def normalize_sensor_data(raw_data: Optional[Dict]) -> Dict:
         """
         Normalize sensor data to include all required fields.
         
+        Field aliases (e.g. "temprature", "PH", "Phosphorous"), defaults and
+        alert thresholds live in sensors.normalization; the alias lookup is
+        resolved once per distinct payload key-set.
+
         Args:
             raw_data: Raw sensor data dictionary from Firebase (may have missing fields)
         
         Returns:
             Normalized dictionary with all required sensor fields
         """
-        if not raw_data:
-            raw_data = {}
-        
-        # Helper function to safely convert to float with fallback
-        # Handles string values from Firebase (since Firebase stores numbers as strings sometimes)
-        def safe_float(value, default=0.0):
-            """Safely convert value to float, returning default if conversion fails.
-            Handles string values from Firebase database."""
-            if value is None:
-                return default
-            try:
-                # Convert to string first to handle any type, then to float
-                if isinstance(value, str):
-                    # Remove any whitespace
-                    value = value.strip()
-                    # Handle empty strings
-                    if value == '':
-                        return default
-                return float(value)
-            except (ValueError, TypeError):
-                print(f"WARNING: Could not convert value '{value}' (type: {type(value)}) to float. Using default {default}")
-                return default
-        
-        # Extract values from raw data, providing defaults if missing
-        # Handle different possible field names from Firebase
-        # IMPORTANT: Check for None explicitly to allow zero (0) values
-        # Note: User's Firebase has: temperature, Moisture, PH, EC, Potassium, Phosphorous, Nitrogen
-        
-        # Helper to get value from multiple possible keys, allowing zero values
-        def get_value(keys, default=None):
-            """Get value from dict using multiple possible keys, allowing zero values."""
-            for key in keys:
-                if key in raw_data and raw_data[key] is not None:
-                    return raw_data[key]
-            return default
-        
-        label = get_value(['label', 'name', 'sensor_name'], 'NPK Sensor')
-        
-        # Temperature in Celsius - handle typo "temprature" (missing 'a') from Firebase
-        # FIXED: Now correctly handles zero (0) values
-        temp_val = get_value(['temprature', 'temperature', 'Temperature', 'temp', 'Temp'])
-        temperature = safe_float(temp_val, 25.0)
-        
-        # Humidity as percentage (optional field, not in user's 7 variables)
-        # FIXED: Now correctly handles zero (0) values
-        hum_val = get_value(['humidity', 'Humidity', 'hum', 'Hum'])
-        humidity = safe_float(hum_val, 60.0)
-        
-        # Soil moisture as percentage - maps from "Moisture" in Firebase
-        # FIXED: Now correctly handles zero (0) values
-        moisture_val = get_value(['Moisture', 'moisture', 'soil_moisture', 'soilMoisture'])
-        soil_moisture = safe_float(moisture_val, 50.0)
-        
-        # Soil pH - maps from "PH" in Firebase (note: user uses "PH" not "pH")
-        # FIXED: Now correctly handles zero (0) values
-        ph_val = get_value(['PH', 'ph', 'pH', 'soil_ph', 'soilPh'])
-        soil_ph = safe_float(ph_val, 6.5)
-        
-        # Electrical Conductivity (EC) - direct match from Firebase
-        # FIXED: Now correctly handles zero (0) values
-        ec_val = get_value(['EC', 'ec', 'electrical_conductivity'])
-        ec = safe_float(ec_val, 1.5)
-        
-        # NPK values - maps from user's Firebase field names
-        # Nitrogen - direct match
-        # FIXED: Now correctly handles zero (0) values
-        nitrogen_val = get_value(['Nitrogen', 'nitrogen', 'N'])
-        nitrogen = safe_float(nitrogen_val, 50.0)
-        
-        # Phosphorus - maps from "Phosphorous" (note: user spelled it "Phosphorous")
-        # FIXED: Now correctly handles zero (0) values
-        phosphorous_val = get_value(['Phosphorous', 'phosphorous', 'P'])
-        phosphorous = safe_float(phosphorous_val, 30.0)
-        
-        # Potassium - direct match
-        # FIXED: Now correctly handles zero (0) values
-        potassium_val = get_value(['Potassium', 'potassium', 'K'])
-        potassium = safe_float(potassium_val, 40.0)
-        
-        # Battery level as percentage
-        # FIXED: Now correctly handles zero (0) values
-        battery_val = get_value(['battery', 'battery_level', 'batteryLevel'])
-        battery = safe_float(battery_val, 85.0)
-        
-        # Timestamp - try to get from data, or use current time
-        timestamp_str = raw_data.get('timestamp') or raw_data.get('time') or raw_data.get('updated_at')
-        timestamp = datetime.now()  # Default to current time
-        
-        if timestamp_str:
-            try:
-                # Try to parse if it's a string
-                if isinstance(timestamp_str, str):
-                    # Handle ISO format with Z timezone
-                    clean_timestamp = timestamp_str.replace('Z', '+00:00')
-                    # Try parsing ISO format (Python 3.7+)
-                    try:
-                        timestamp = datetime.fromisoformat(clean_timestamp)
-                    except ValueError:
-                        # If ISO parsing fails, try without timezone
-                        clean_timestamp = clean_timestamp.split('+')[0].split('Z')[0]
-                        try:
-                            timestamp = datetime.fromisoformat(clean_timestamp)
-                        except ValueError:
-                            # If all parsing fails, keep current time
-                            timestamp = datetime.now()
-                elif isinstance(timestamp_str, (int, float)):
-                    # Unix timestamp (seconds since epoch)
-                    timestamp = datetime.fromtimestamp(float(timestamp_str))
-                elif isinstance(timestamp_str, datetime):
-                    # Already a datetime object
-                    timestamp = timestamp_str
-            except (ValueError, TypeError, OSError):
-                # If parsing fails for any reason, use current time
-                timestamp = datetime.now()
-        
-        # Generate alerts based on thresholds
-        alerts = []
-        if temperature > 40:
-            alerts.append(f"High temperature alert: {temperature}°C exceeds 40°C threshold")
-        elif temperature < 10:
-            alerts.append(f"Low temperature alert: {temperature}°C below 10°C threshold")
-        
-        if soil_ph < 5:
-            alerts.append(f"Low pH alert: {soil_ph} below 5.0 threshold")
-        elif soil_ph > 8:
-            alerts.append(f"High pH alert: {soil_ph} exceeds 8.0 threshold")
-        
-        if soil_moisture < 30:
-            alerts.append(f"Low soil moisture alert: {soil_moisture}% below 30% threshold")
-        
-        # Build normalized sensor data dictionary
-        normalized_data = {
-            'label': label,
-            'temperature': round(temperature, 2),
-            'humidity': round(humidity, 2),
-            'soil_moisture': round(soil_moisture, 2),
-            'soil_ph': round(soil_ph, 2),
-            'ec': round(ec, 2),
-            'nitrogen': round(nitrogen, 2),
-            'phosphorous': round(phosphorous, 2),
-            'potassium': round(potassium, 2),
-            'battery': round(battery, 2),
-            'timestamp': timestamp.isoformat(),
-            'alerts': alerts
-        }
-        
-        return normalized_data
+        return normalize_reading(raw_data)
     
     @classmethod
-    def get_sensor_readings(cls) -> Dict:
+    def _layout_from_shallow(cls, path: str, shallow) -> Dict:
+        """
+        Build a layout descriptor from a shallow (keys only) query result.
+
+        Args:
+            path: Database path the query was made against
+            shallow: Result of ``Reference.get(shallow=True)``
+
+        Returns:
+            Descriptor with 'kind' ('direct', 'devices' or 'empty') and the
+            child 'devices' ids that hold readings
+        """
+        if not isinstance(shallow, dict) or not shallow:
+            return {'kind': 'empty', 'path': path, 'devices': []}
+        if any(key in shallow for key in cls.DIRECT_READING_KEYS):
+            return {'kind': 'direct', 'path': path, 'devices': [cls._direct_device_id(path)]}
+        # Shallow queries return True for children that are themselves objects
+        devices = [str(key) for key, value in shallow.items() if value is True]
+        return {'kind': 'devices', 'path': path, 'devices': devices}
+
+    @staticmethod
+    def _direct_device_id(path: str) -> str:
+        """Sensor id used when the sensors node itself is a single reading."""
+        return path.strip('/').split('/')[-1] or 'sensor'
+
+    @classmethod
+    def discover_layout(cls, path: str, refresh: bool = False, device_ids: Optional[List[str]] = None) -> Dict:
+        """
+        Return the cached layout descriptor for path, discovering it if needed.
+
+        Discovery uses a shallow query so only the child keys are downloaded.
+        Empty layouts are not cached, so data appearing later is picked up.
+        A cached layout is discovered again once it is older than
+        FIREBASE_LAYOUT_TTL_SECONDS, or older than FIREBASE_LAYOUT_RETRY_SECONDS
+        when device_ids names a sensor it does not list (a sensor added since).
+
+        Args:
+            path: Database path of the sensors node
+            refresh: Ignore the cached descriptor and query again
+            device_ids: Sensors the caller is about to fetch (None: all of them)
+        """
+        layout = cls._layouts.get(path)
+        if layout is not None and not refresh and cls._layout_is_current(layout, device_ids):
+            return layout
+
+        return cls._remember_layout(path, cls._backend.get(path, shallow=True))
+
+    @classmethod
+    async def adiscover_layout(cls, path: str, refresh: bool = False,
+                               device_ids: Optional[List[str]] = None) -> Dict:
+        """Coroutine version of discover_layout."""
+        layout = cls._layouts.get(path)
+        if layout is not None and not refresh and cls._layout_is_current(layout, device_ids):
+            return layout
+        return cls._remember_layout(path, await cls._backend.aget(path, shallow=True))
+
+    @staticmethod
+    def _layout_is_current(layout: Dict, device_ids: Optional[List[str]]) -> bool:
+        """Whether a cached layout can serve a fetch of device_ids without being discovered again."""
+        age = time.monotonic() - layout['discovered_at']
+        if age >= getattr(settings, 'FIREBASE_LAYOUT_TTL_SECONDS', 300.0):
+            return False
+        if device_ids is not None and not set(device_ids).issubset(layout['devices']):
+            return age < getattr(settings, 'FIREBASE_LAYOUT_RETRY_SECONDS', 10.0)
+        return True
+
+    @classmethod
+    def _remember_layout(cls, path: str, shallow) -> Dict:
+        """Build the layout from a shallow query result and cache it unless empty."""
+        layout = cls._layout_from_shallow(path, shallow)
+        layout['discovered_at'] = time.monotonic()
+        if layout['kind'] == 'empty':
+            cls._layouts.pop(path, None)
+        else:
+            cls._layouts[path] = layout
+        logger.info(
+            "Sensor layout discovered",
+            extra={'path': path, 'layout': layout['kind'], 'sensor_count': len(layout['devices'])},
+        )
+        return layout
+
+    @classmethod
+    def _all_devices(cls, layout: Dict, data) -> Optional[Dict[str, Dict]]:
+        """
+        Split the whole sensors node, read in one call, by sensor.
+
+        The sensor list seen is as good as a discovery, so the cached layout
+        is refreshed with it.
+
+        Returns:
+            Raw readings keyed by sensor id, or None if the node no longer
+            holds one child per sensor
+        """
+        if not isinstance(data, dict) or any(key in data for key in cls.DIRECT_READING_KEYS):
+            return None
+        readings = {str(key): value for key, value in data.items() if isinstance(value, dict)}
+        cls._layouts[layout['path']] = dict(layout, devices=list(readings), discovered_at=time.monotonic())
+        return readings
+
+    @classmethod
+    def _fetch_with_layout(cls, layout: Dict, device_ids: Optional[List[str]]) -> Optional[Dict[str, Dict]]:
+        """
+        Fetch raw readings using a layout descriptor.
+
+        Every sensor of a 'devices' layout is read with one call on the
+        sensors node; chosen sensors are read child by child.
+
+        Returns:
+            Raw readings keyed by sensor id, or None if a payload no longer
+            matches the layout (the caller should re-discover it)
+        """
+        path = layout['path']
+        if layout['kind'] == 'empty':
+            return {}
+
+        if layout['kind'] == 'direct':
+            if device_ids is not None and layout['devices'][0] not in device_ids:
+                return {}
+            data = cls._backend.get(path)
+            if not isinstance(data, dict) or not any(key in data for key in cls.DIRECT_READING_KEYS):
+                return None
+            return {layout['devices'][0]: data}
+
+        if device_ids is None:
+            return cls._all_devices(layout, cls._backend.get(path))
+
+        wanted = [d for d in device_ids if d in layout['devices']]
+        readings = {}
+        for device_id in wanted:
+            data = cls._backend.get(f"{path.rstrip('/')}/{device_id}")
+            if not isinstance(data, dict):
+                return None
+            readings[device_id] = data
+        return readings
+
+    @classmethod
+    async def _afetch_with_layout(cls, layout: Dict, device_ids: Optional[List[str]]) -> Optional[Dict[str, Dict]]:
+        """Coroutine version of _fetch_with_layout; sensor nodes are fetched concurrently."""
+        path = layout['path']
+        if layout['kind'] == 'empty':
+            return {}
+
+        if layout['kind'] == 'direct':
+            if device_ids is not None and layout['devices'][0] not in device_ids:
+                return {}
+            data = await cls._backend.aget(path)
+            if not isinstance(data, dict) or not any(key in data for key in cls.DIRECT_READING_KEYS):
+                return None
+            return {layout['devices'][0]: data}
+
+        if device_ids is None:
+            return cls._all_devices(layout, await cls._backend.aget(path))
+
+        wanted = [d for d in device_ids if d in layout['devices']]
+        payloads = await asyncio.gather(*(cls._backend.aget(f"{path.rstrip('/')}/{device_id}") for device_id in wanted))
+        if not all(isinstance(data, dict) for data in payloads):
+            return None
+        return dict(zip(wanted, payloads))
+
+    @classmethod
+    def fetch_device_readings(cls, device_ids: Optional[List[str]] = None) -> Dict[str, Dict]:
+        """
+        Fetch raw readings for the given sensors, touching only their child nodes
+        (every sensor: the sensors node, in one call).
+
+        Args:
+            device_ids: Sensor ids to fetch (None fetches every sensor)
+
+        Returns:
+            Raw reading dictionaries keyed by sensor id. The dictionary may be
+            shared with concurrent callers and must not be modified.
+
+        Raises:
+            CircuitOpenError: If RTDB has been failing and no probe is due yet
+        """
+        sensors_path = getattr(settings, 'FIREBASE_SENSORS_PATH', '/sensors')
+        key = (sensors_path, None if device_ids is None else tuple(sorted(set(device_ids))))
+        # Concurrent callers asking for the same sensors share one upstream fetch,
+        # and the fetch is refused outright while the circuit breaker is open
+        return cls._fetches.do(
+            key, lambda: cls._breaker.call(lambda: cls._fetch_device_readings(sensors_path, device_ids))
+        )
+
+    @classmethod
+    def _fetch_device_readings(cls, sensors_path: str, device_ids: Optional[List[str]]) -> Dict[str, Dict]:
+        with stage_timer('firebase_fetch'):
+            layout = cls.discover_layout(sensors_path, device_ids=device_ids)
+            readings = cls._fetch_with_layout(layout, device_ids)
+            if readings is None:
+                # Payload no longer matches the cached layout - discover it again once
+                layout = cls.discover_layout(sensors_path, refresh=True)
+                readings = cls._fetch_with_layout(layout, device_ids)
+            return readings or {}
+
+    @classmethod
+    async def afetch_device_readings(cls, device_ids: Optional[List[str]] = None) -> Dict[str, Dict]:
+        """
+        Coroutine version of fetch_device_readings.
+
+        Concurrent awaits for the same sensors on one event loop share one
+        upstream fetch, through the same circuit breaker as the sync path.
+        """
+        sensors_path = getattr(settings, 'FIREBASE_SENSORS_PATH', '/sensors')
+        key = (sensors_path, None if device_ids is None else tuple(sorted(set(device_ids))))
+        return await cls._async_fetches.do(
+            key, lambda: cls._breaker.acall(lambda: cls._afetch_device_readings(sensors_path, device_ids))
+        )
+
+    @classmethod
+    async def _afetch_device_readings(cls, sensors_path: str, device_ids: Optional[List[str]]) -> Dict[str, Dict]:
+        with stage_timer('firebase_fetch'):
+            layout = await cls.adiscover_layout(sensors_path, device_ids=device_ids)
+            readings = await cls._afetch_with_layout(layout, device_ids)
+            if readings is None:
+                layout = await cls.adiscover_layout(sensors_path, refresh=True)
+                readings = await cls._afetch_with_layout(layout, device_ids)
+            return readings or {}
+
+    @staticmethod
+    def normalize_readings(raw_readings: Dict[str, Dict]) -> List[Dict]:
+        """
+        Normalize raw readings for several sensors in one batched pass.
+
+        Args:
+            raw_readings: Raw sensor dictionaries keyed by sensor id
+
+        Returns:
+            Normalized sensor dictionaries, each tagged with its device_id and
+            its anomaly flags (see sensors.anomaly)
+        """
+        device_ids = list(raw_readings.keys())
+        with stage_timer('normalize'):
+            normalized = normalize_batch(
+                list(raw_readings.values()), alerts=lambda values: AlertEngine.evaluate(values, device_ids)
+            )
+        for device_id, reading in zip(device_ids, normalized):
+            reading['device_id'] = device_id
+        AnomalyDetector.inspect(normalized)
+        return normalized
+
+    @classmethod
+    def get_sensor_readings(cls, device_ids: Optional[List[str]] = None) -> Dict:
         """
         Fetch sensor readings from Firebase Realtime Database.
         
+        Args:
+            device_ids: Only fetch these sensors (None returns every sensor)
+
         Returns:
             Dictionary containing sensor readings and metadata
         """
         # Initialize Firebase if not already done
-        if not cls._initialized:
-            cls.initialize()
+        cls.initialize()
         
         # If Firebase is not connected, return placeholder data
         if not cls._firebase_connected:
-            print("FIREBASE: Not connected. Returning placeholder data.")
-            print(f"FIREBASE: Connection status - Initialized: {cls._initialized}, Connected: {cls._firebase_connected}")
+            logger.debug(
+                "Firebase not connected. Returning placeholder data.",
+                extra={'initialized': cls._initialized, 'connected': cls._firebase_connected},
+            )
             return cls.get_placeholder_data()
         
         try:
-            # Get the sensors path from settings
-            sensors_path = getattr(settings, 'FIREBASE_SENSORS_PATH', '/sensors')
-            
-            # First, check what's at the root to understand the structure
-            print(f"FIREBASE: Checking root path...")
-            root_ref = db.reference('/')
-            root_data = root_ref.get()
-            if root_data:
-                print(f"FIREBASE: Root data keys: {list(root_data.keys()) if isinstance(root_data, dict) else 'Not a dict'}")
-            
-            # Get reference to the sensors node
-            ref = db.reference(sensors_path)
-            
-            # Fetch data from Firebase - IMPORTANT: This fetches fresh data each time
-            print(f"FIREBASE: Fetching from path: {sensors_path}")
-            sensor_data = ref.get()
-            
-            # Debug: Print what we received from Firebase
-            print(f"FIREBASE: Received data type: {type(sensor_data)}")
-            if sensor_data:
-                if isinstance(sensor_data, dict):
-                    print(f"FIREBASE: Data keys: {list(sensor_data.keys())}")
-                    # Print actual values if it's a direct sensor object
-                    if any(key in sensor_data for key in ['temprature', 'temperature', 'Temperature', 'Moisture', 'PH', 'EC', 'Nitrogen', 'Potassium', 'Phosphorous']):
-                        print(f"FIREBASE: Direct sensor data found:")
-                        for key in ['temprature', 'temperature', 'Temperature', 'Moisture', 'PH', 'EC', 'Nitrogen', 'Potassium', 'Phosphorous']:
-                            if key in sensor_data:
-                                print(f"  {key} = {sensor_data[key]}")
-                else:
-                    print(f"FIREBASE: Data is not a dict: {sensor_data}")
-            else:
-                print("FIREBASE: sensor_data is None or empty")
-            
-            if not sensor_data:
-                print("FIREBASE: No sensor data found. Returning placeholder data.")
-                return cls.get_placeholder_data()
-            
-            # Handle different Firebase data structures
-            # Firebase can return: dict, list, or direct sensor object
-            if isinstance(sensor_data, list):
-                # If it's a list, get the first item
-                if len(sensor_data) > 0:
-                    raw_data = sensor_data[0] if isinstance(sensor_data[0], dict) else {}
-                else:
-                    # Empty list - use placeholder
-                    return cls.get_placeholder_data()
-            elif isinstance(sensor_data, dict):
-                # Check if it's a direct sensor reading or nested structure
-                # Look for the user's Firebase field names: temprature (typo), Moisture, PH, EC, Potassium, Phosphorous, Nitrogen
-                if ('label' in sensor_data or 'temprature' in sensor_data or 'temperature' in sensor_data or 'Temperature' in sensor_data or 
-                    'Moisture' in sensor_data or 'PH' in sensor_data or 'EC' in sensor_data or
-                    'Nitrogen' in sensor_data or 'Potassium' in sensor_data or 'Phosphorous' in sensor_data):
-                    # Direct sensor data object
-                    raw_data = sensor_data
-                elif len(sensor_data) == 1:
-                    # Single sensor in a dict: {sensor_id: {...}}
-                    first_key = list(sensor_data.keys())[0]
-                    raw_data = sensor_data[first_key] if isinstance(sensor_data[first_key], dict) else {}
-                elif len(sensor_data) > 1:
-                    # Multiple sensors - get the first one
-                    first_key = list(sensor_data.keys())[0]
-                    raw_data = sensor_data[first_key] if isinstance(sensor_data[first_key], dict) else {}
-                else:
-                    # Empty dict
-                    return cls.get_placeholder_data()
-            else:
-                # Unsupported type - use placeholder
-                print(f"Unexpected sensor data type: {type(sensor_data)}. Using placeholder data.")
-                return cls.get_placeholder_data()
-            
-            # Ensure raw_data is a dict
-            if not isinstance(raw_data, dict):
-                raw_data = {}
-            
-            # Print raw data before normalization
-            print(f"FIREBASE: Raw data before normalization: {raw_data}")
-            
-            # Normalize the sensor data
-            normalized_data = cls.normalize_sensor_data(raw_data)
-            
-            # Print normalized data
-            print(f"FIREBASE: Normalized data: temperature={normalized_data.get('temperature')}, moisture={normalized_data.get('soil_moisture')}, PH={normalized_data.get('soil_ph')}")
-            
-            return {
-                'sensors': [normalized_data],
-                'last_updated': normalized_data['timestamp'],
-                'source': 'firebase'
-            }
-            
+            readings = cls.fetch_device_readings(device_ids)
+        except CircuitOpenError:
+            return cls.get_stale_data(device_ids)
+        except Exception as e:
+            logger.warning("Error fetching sensor data from Firebase: %s", e)
+            return cls.get_stale_data(device_ids)
+        return cls._feed_payload(readings, device_ids)
+
+    @classmethod
+    async def aget_sensor_readings(cls, device_ids: Optional[List[str]] = None) -> Dict:
+        """
+        Coroutine version of get_sensor_readings for async views.
+
+        The fetch is awaited on the event loop (see sensors.rtdb_async);
+        only normalization, which may read alert rules and detector state
+        from the database, runs in a worker thread.
+        """
+        if not cls._initialized:
+            await sync_to_async(cls.initialize)()
+        if not cls._firebase_connected:
+            return cls.get_placeholder_data()
+
+        try:
+            readings = await cls.afetch_device_readings(device_ids)
+        except CircuitOpenError:
+            return cls.get_stale_data(device_ids)
         except Exception as e:
-            print(f"Error fetching sensor data from Firebase: {str(e)}")
+            logger.warning("Error fetching sensor data from Firebase: %s", e)
+            return cls.get_stale_data(device_ids)
+        return await sync_to_async(cls._feed_payload)(readings, device_ids)
+
+    @classmethod
+    def _feed_payload(cls, readings: Dict[str, Dict], device_ids: Optional[List[str]]) -> Dict:
+        """Normalize freshly fetched raw readings into the feed payload."""
+        if not readings and device_ids is None:
+            logger.info("No sensor data found in Firebase. Returning placeholder data.")
             return cls.get_placeholder_data()
+
+        sensors = cls.normalize_readings(readings)
+        logger.debug("Normalized sensor readings", extra={'sensor_count': len(sensors)})
+        cls.remember_readings(sensors)
+
+        return {
+            'sensors': sensors,
+            'last_updated': max((sensor['timestamp'] for sensor in sensors), default=None),
+            'source': 'firebase'
+        }
+
+    @classmethod
+    def remember_readings(cls, sensors: List[Dict]):
+        """Keep normalized readings as the last known good values for their sensors."""
+        now = time.monotonic()
+        for sensor in sensors:
+            cls._last_good[sensor['device_id']] = sensor
+            cls._last_good_at[sensor['device_id']] = now
+
+    @classmethod
+    def get_stale_data(cls, device_ids: Optional[List[str]] = None) -> Dict:
+        """
+        Return the last known good readings while Firebase is unavailable.
+
+        Falls back to placeholder data only if nothing was ever fetched.
+
+        Args:
+            device_ids: Only include these sensors (None includes every sensor)
+
+        Returns:
+            Feed payload marked ``stale`` with ``age_seconds`` since the
+            oldest included reading was fetched
+        """
+        wanted = list(cls._last_good) if device_ids is None else [d for d in device_ids if d in cls._last_good]
+        if not wanted:
+            return cls.get_placeholder_data()
+
+        sensors = [cls._last_good[device_id] for device_id in wanted]
+        fetched_at = min(cls._last_good_at[device_id] for device_id in wanted)
+        return {
+            'sensors': sensors,
+            'last_updated': max((sensor['timestamp'] for sensor in sensors), default=None),
+            'source': 'firebase',
+            'stale': True,
+            'age_seconds': round(time.monotonic() - fetched_at, 3),
+        }
     
     @staticmethod
     def get_placeholder_data() -> Dict:
@@ -403,7 +617,8 @@ class FirebaseService:
             'potassium': 35.0,
             'battery': 92.0,
             'timestamp': current_time.isoformat(),
-            'alerts': []
+            'alerts': [],
+            'device_id': 'placeholder'
         }
         
         return {
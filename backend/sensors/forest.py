@@ -0,0 +1,145 @@
+"""
+Random forest inference on flat NumPy arrays.
+
+scikit-learn's ``predict_proba`` validates its input, dispatches every tree
+through joblib and allocates per tree on each call -- a fixed cost of about
+a millisecond that dwarfs walking twenty small trees for one reading.
+``CompiledForest`` copies the fitted trees once into five flat arrays
+(feature, threshold, left, right, value) with every tree's nodes at an
+offset, and walks all trees for a block of rows together: each step is a
+handful of whole-array operations, repeated max-depth times.
+
+It reproduces sklearn's arithmetic, so probabilities match
+``predict_proba`` to float precision:
+
+- features are compared as float32, like the trees' own input;
+- NaN goes to the side each split recorded in ``missing_go_to_left``;
+- leaf values are normalized per tree and summed in tree order, then
+  divided by the number of trees.
+
+Leaves point back at themselves, so rows that reach a leaf early simply
+stay there until the deepest tree is done.
+
+Each step costs a few whole-array passes, so per row this is slower than
+sklearn's compiled tree loop: it wins up to roughly a thousand rows per
+call, sklearn wins beyond (see benchmarks/forest.py).
+"""
+
+import numpy as np
+
+# Rows walked together; bounds the (rows, trees) node index arrays and
+# keeps them in cache
+BLOCK_ROWS = 2048
+
+
+class CompiledForest:
+    """
+    A fitted RandomForestClassifier (or ExtraTreesClassifier) as flat node arrays.
+
+    Build one with ``CompiledForest.compile(model)``; ``predict_proba`` and
+    ``predict`` take the same feature rows as the model.
+    """
+
+    def __init__(self, feature, threshold, left, right, missing_left, value, roots, depth, classes, n_features):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.missing_left = missing_left
+        self.value = value
+        self.roots = roots
+        self.depth = depth
+        self.classes_ = classes
+        self.n_features_in_ = n_features
+        # children[2 * node + went_left]: one gather per step instead of two and a select
+        self._children = np.stack([right, left], axis=1).ravel()
+
+    @classmethod
+    def compile(cls, model) -> 'CompiledForest':
+        """
+        Flatten the trees of a fitted forest classifier.
+
+        Raises:
+            ValueError: model is not a fitted single-output forest classifier
+        """
+        trees = [getattr(estimator, 'tree_', None) for estimator in getattr(model, 'estimators_', ())]
+        if not trees or any(tree is None for tree in trees):
+            raise ValueError(f"{type(model).__name__} is not a fitted forest of decision trees")
+        if getattr(model, 'n_outputs_', 1) != 1 or not hasattr(model, 'classes_'):
+            raise ValueError("Only single-output forest classifiers can be compiled")
+
+        counts = np.array([tree.node_count for tree in trees])
+        offsets = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        feature, threshold, left, right, missing_left, value = [], [], [], [], [], []
+        for tree, offset in zip(trees, offsets):
+            own = np.arange(tree.node_count)
+            leaf = tree.children_left < 0
+            # Leaves loop onto themselves and test a real feature, so traversal needs no branch
+            feature.append(np.where(leaf, 0, tree.feature))
+            threshold.append(np.where(leaf, 0.0, tree.threshold))
+            left.append(np.where(leaf, own, tree.children_left) + offset)
+            right.append(np.where(leaf, own, tree.children_right) + offset)
+            missing = getattr(tree, 'missing_go_to_left', None)
+            missing_left.append(np.zeros(tree.node_count, dtype=bool) if missing is None else missing.astype(bool))
+            # DecisionTreeClassifier.predict_proba normalizes each node's value
+            proba = tree.value[:, 0, :len(model.classes_)]
+            normalizer = proba.sum(axis=1)
+            normalizer[normalizer == 0.0] = 1.0
+            value.append(proba / normalizer[:, np.newaxis])
+
+        return cls(
+            feature=np.concatenate(feature).astype(np.intp),
+            threshold=np.concatenate(threshold).astype(np.float64),
+            left=np.concatenate(left).astype(np.intp),
+            right=np.concatenate(right).astype(np.intp),
+            missing_left=np.concatenate(missing_left),
+            value=np.concatenate(value).astype(np.float64),
+            roots=offsets.astype(np.intp),
+            depth=max(tree.max_depth for tree in trees),
+            classes=np.asarray(model.classes_),
+            n_features=trees[0].n_features,
+        )
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    def apply(self, X: np.ndarray) -> np.ndarray:
+        """Leaf node (flat index) each row reaches in each tree, shape (n_rows, n_trees)."""
+        rows = len(X)
+        # Flat positions: row offset + feature column, so one take() gathers every tree's feature
+        row_offsets = (np.arange(rows, dtype=np.intp) * X.shape[1])[:, np.newaxis]
+        flat = X.ravel()
+        has_missing = bool(np.isnan(flat).any())
+        nodes = np.broadcast_to(self.roots, (rows, self.n_trees)).copy()
+        for _ in range(self.depth):
+            values = flat.take(row_offsets + self.feature.take(nodes))
+            go_left = values <= self.threshold.take(nodes)
+            if has_missing:
+                go_left |= np.isnan(values) & self.missing_left.take(nodes)
+            nodes = self._children.take(2 * nodes + go_left)
+        return nodes
+
+    def predict_proba(self, X) -> np.ndarray:
+        """
+        Class probabilities, columns in ``classes_`` order (as the model's predict_proba).
+
+        Raises:
+            ValueError: X does not have n_features_in_ columns
+        """
+        # The trees were fitted on float32 features; comparing in float32 keeps the same splits
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"Expected rows of {self.n_features_in_} features, got shape {X.shape}")
+        proba = np.empty((len(X), len(self.classes_)), dtype=np.float64)
+        for start in range(0, len(X), BLOCK_ROWS):
+            leaves = self.apply(X[start:start + BLOCK_ROWS])
+            block = proba[start:start + BLOCK_ROWS]
+            block[:] = self.value.take(leaves[:, 0], axis=0)
+            for tree in range(1, self.n_trees):
+                block += self.value.take(leaves[:, tree], axis=0)
+        proba /= self.n_trees
+        return proba
+
+    def predict(self, X) -> np.ndarray:
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
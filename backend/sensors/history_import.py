@@ -0,0 +1,479 @@
+"""
+Bulk import of historical sensor readings from Firebase JSON exports and CSV.
+
+Exports can be far larger than memory, so neither format is loaded whole:
+
+- JSON is read in chunks by ``JSONRecordScanner``, which yields every
+  object holding scalar values together with its path from the root.
+  Objects whose values are all scalars (the usual shape of a reading) are
+  decoded in one ``raw_decode`` call; anything else is walked token by
+  token with only the open containers kept in memory.
+- CSV is read row by row with ``csv.DictReader``.
+
+Either file may be gzip-compressed. Records are normalized with the same
+rules as the live feed (``normalize_batch``), run through the anomaly
+detectors (``AnomalyDetector.inspect``) and written in chunks through
+``SensorIngestion.write_rows``. Each chunk is committed together with the
+file's ``SensorImportCheckpoint`` and the detector state it produced, so
+an interrupted import resumes at the first record that was not committed.
+
+Detectors only move forward in time: importing history older than what a
+sensor's detectors have already seen stores those readings unflagged and
+leaves the state alone (see ``AnomalyDetector.inspect``).
+"""
+
+import codecs
+import csv
+import gzip
+import hashlib
+import io
+import json
+import logging
+import os
+import re
+from datetime import datetime
+from json.decoder import scanstring
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from django.db import transaction
+
+from .anomaly import AnomalyDetector
+from .ingestion import SensorIngestion
+from .models import SensorImportCheckpoint
+from .normalization import NUMERIC_FIELDS, TIMESTAMP_KEYS, normalize_batch
+
+logger = logging.getLogger(__name__)
+
+# Fields naming the sensor a record belongs to
+DEVICE_KEYS = ('device_id', 'device', 'sensor_id', 'sensor')
+
+# An object is a reading if it has at least one measurement
+READING_KEYS = frozenset(alias for _, aliases, _ in NUMERIC_FIELDS for alias in aliases)
+
+# Alphabet of Firebase push ids; the first 8 characters encode the creation time in ms
+PUSH_CHARS = '-0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ_abcdefghijklmnopqrstuvwxyz'
+PUSH_ID = re.compile(r'-[-0-9A-Za-z_]{19}$')
+
+# Numeric timestamps above this are in milliseconds
+EPOCH_MS_THRESHOLD = 1e11
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_NUMBER = re.compile(r'-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][-+]?\d+)?')
+_NUMBER_CHARS = re.compile(r'[-+.0-9eE]*')
+_NUMBER_START = frozenset('-0123456789')
+_LITERALS = (('true', True), ('false', False), ('null', None))
+_DECODER = json.JSONDecoder()
+
+
+class _NeedMore(Exception):
+    """The buffer ends inside a token."""
+
+
+class _Frame:
+    """An open object or array while scanning."""
+
+    __slots__ = ('path', 'is_object', 'scalars', 'key', 'index')
+
+    def __init__(self, path: Tuple[str, ...], is_object: bool):
+        self.path = path
+        self.is_object = is_object
+        self.scalars: Dict = {}
+        self.key: Optional[str] = None
+        self.index = 0
+
+    def child(self) -> str:
+        return self.key if self.is_object else str(self.index)
+
+    def advance(self):
+        if self.is_object:
+            self.key = None
+        else:
+            self.index += 1
+
+
+class JSONRecordScanner:
+    """
+    Iterate the objects of a JSON document without loading it.
+
+    Yields ``(path, scalars)`` for every object with at least one scalar
+    value, where ``path`` is the tuple of keys (array indexes as strings)
+    from the root and ``scalars`` its non-container values. Objects are
+    yielded when they close, so children come before their parent.
+
+    Args:
+        stream: Binary file object with UTF-8 JSON
+        chunk_size: Bytes read at a time
+        max_leaf_chars: Longest object tried in one raw_decode call
+    """
+
+    def __init__(self, stream, chunk_size: int = 1 << 16, max_leaf_chars: int = 1 << 20):
+        self._stream = stream
+        self._chunk_size = chunk_size
+        self._max_leaf_chars = max_leaf_chars
+        self._decoder = codecs.getincrementaldecoder('utf-8-sig')()
+        self._buffer = ''
+        self._position = 0
+        self._eof = False
+
+    def _fill(self):
+        chunk = self._stream.read(self._chunk_size)
+        if chunk:
+            text = self._decoder.decode(chunk)
+        else:
+            text = self._decoder.decode(b'', final=True)
+            self._eof = True
+        self._buffer = self._buffer[self._position:] + text
+        self._position = 0
+
+    def _token(self):
+        """Next token: one of '{}[]:,' or a one-tuple holding a value (None at the end)."""
+        while True:
+            try:
+                return self._read_token()
+            except _NeedMore:
+                if self._eof:
+                    raise ValueError("JSON document is truncated")
+                self._fill()
+
+    def _read_token(self):
+        buffer = self._buffer
+        position = _WHITESPACE.match(buffer, self._position).end()
+        self._position = position
+        if position >= len(buffer):
+            if self._eof:
+                return None
+            raise _NeedMore
+        char = buffer[position]
+        if char in '{}[]:,':
+            self._position = position + 1
+            return char
+        if char == '"':
+            try:
+                value, end = scanstring(buffer, position + 1)
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise ValueError(f"Invalid JSON string near {buffer[position:position + 40]!r}")
+                raise _NeedMore
+            self._position = end
+            return (value,)
+        if char in _NUMBER_START and not self._eof and _NUMBER_CHARS.match(buffer, position).end() == len(buffer):
+            raise _NeedMore
+        match = _NUMBER.match(buffer, position)
+        if match:
+            text = match.group()
+            self._position = match.end()
+            return (int(text) if text.lstrip('-').isdigit() else float(text),)
+        for literal, value in _LITERALS:
+            if buffer.startswith(literal, position):
+                self._position = position + len(literal)
+                return (value,)
+            if not self._eof and literal.startswith(buffer[position:]):
+                raise _NeedMore
+        raise ValueError(f"Invalid JSON near {buffer[position:position + 40]!r}")
+
+    def _leaf(self):
+        """
+        Decode the object just opened in one call if it holds no containers.
+
+        Returns the object, or None (nothing consumed) to scan it token by token.
+        """
+        # Step back onto the '{' so refills keep it in the buffer
+        self._position -= 1
+        while True:
+            end = self._buffer.find('}', self._position)
+            if end != -1 or self._eof or len(self._buffer) - self._position > self._max_leaf_chars:
+                break
+            self._fill()
+        body = self._buffer[self._position + 1:end] if end != -1 else ''
+        if end != -1 and '{' not in body and '[' not in body:
+            try:
+                value, self._position = _DECODER.raw_decode(self._buffer, self._position)
+                return value
+            except json.JSONDecodeError:
+                # A '}' inside a string that runs past the buffer
+                pass
+        self._position += 1
+        return None
+
+    def __iter__(self) -> Iterator[Tuple[Tuple[str, ...], Dict]]:
+        stack: List[_Frame] = []
+        while True:
+            token = self._token()
+            if token is None:
+                if stack:
+                    raise ValueError("JSON document is truncated")
+                return
+            if token == ',' or token == ':':
+                continue
+
+            top = stack[-1] if stack else None
+            if token == '{' or token == '[':
+                path = top.path + (top.child(),) if top else ()
+                if token == '{':
+                    # _leaf() expects the '{' to be consumed
+                    value = self._leaf()
+                    if value is not None:
+                        yield from _walk(path, value)
+                        if top:
+                            top.advance()
+                        continue
+                stack.append(_Frame(path, token == '{'))
+            elif token == '}' or token == ']':
+                frame = stack.pop()
+                if frame.scalars:
+                    yield frame.path, frame.scalars
+                if stack:
+                    stack[-1].advance()
+            elif top is None:
+                # A bare scalar document has no records
+                continue
+            elif top.is_object and top.key is None:
+                top.key = str(token[0])
+            else:
+                if top.is_object:
+                    top.scalars[top.key] = token[0]
+                top.advance()
+
+
+def _walk(path: Tuple[str, ...], value) -> Iterator[Tuple[Tuple[str, ...], Dict]]:
+    """Yield the objects of an already decoded value in the scanner's order."""
+    if isinstance(value, dict):
+        scalars = {}
+        for key, child in value.items():
+            if isinstance(child, (dict, list)):
+                yield from _walk(path + (key,), child)
+            else:
+                scalars[key] = child
+        if scalars:
+            yield path, scalars
+    elif isinstance(value, list):
+        for index, child in enumerate(value):
+            yield from _walk(path + (str(index),), child)
+
+
+def push_id_time(key: str) -> Optional[float]:
+    """Creation time (unix seconds) encoded in a Firebase push id, or None."""
+    if not PUSH_ID.match(key):
+        return None
+    milliseconds = 0
+    for char in key[:8]:
+        milliseconds = milliseconds * 64 + PUSH_CHARS.index(char)
+    return milliseconds / 1000.0
+
+
+def clean_timestamp(value):
+    """
+    Timestamp in a form normalize_batch parses, or None if it has none.
+
+    Epoch values may be numbers or numeric strings, in seconds or ms.
+    Unparseable strings are rejected instead of becoming "now".
+    """
+    if value is None or value == '' or isinstance(value, bool):
+        return None
+    if isinstance(value, str):
+        value = value.strip()
+        try:
+            value = float(value)
+        except ValueError:
+            try:
+                datetime.fromisoformat(value.replace('Z', '+00:00'))
+            except ValueError:
+                return None
+            return value
+    if not isinstance(value, (int, float)) or value <= 0:
+        return None
+    return value / 1000.0 if value > EPOCH_MS_THRESHOLD else float(value)
+
+
+def file_fingerprint(path: str) -> str:
+    """Size, mtime and a hash of the first 64KB: enough to notice a replaced file."""
+    stat = os.stat(path)
+    with open(path, 'rb') as handle:
+        digest = hashlib.sha1(handle.read(1 << 16)).hexdigest()
+    return f"{stat.st_size}:{int(stat.st_mtime)}:{digest[:16]}"
+
+
+def detect_format(path: str) -> str:
+    """'json' or 'csv', from the extension or else the first character."""
+    name = path.lower()
+    if name.endswith('.gz'):
+        name = name[:-3]
+    if name.endswith('.csv'):
+        return 'csv'
+    if name.endswith('.json'):
+        return 'json'
+    opener = gzip.open if path.lower().endswith('.gz') else open
+    with opener(path, 'rb') as handle:
+        head = handle.read(1024).decode('utf-8-sig', errors='ignore').lstrip()
+    return 'json' if head[:1] in ('{', '[') else 'csv'
+
+
+class HistoryImport:
+    """
+    Import one export file into SensorReading.
+
+    Args:
+        path: JSON or CSV file, optionally gzip-compressed
+        file_format: 'json', 'csv' or 'auto' (from the extension or content)
+        device: Sensor id for records that do not name one
+        root: Only import JSON records below this path, e.g. "/sensors"
+        batch_size: Records per committed chunk
+    """
+
+    def __init__(self, path: str, file_format: str = 'auto', device: Optional[str] = None,
+                 root: str = '', batch_size: int = 2000):
+        self.path = os.path.abspath(path)
+        self.file_format = detect_format(self.path) if file_format == 'auto' else file_format
+        self.device = device
+        self.root = tuple(part for part in root.split('/') if part)
+        self.batch_size = max(1, batch_size)
+        self.total_bytes = os.path.getsize(self.path)
+        self._raw = None
+        # Records already committed when run() started (None until it starts importing)
+        self.resumed_from: Optional[int] = None
+
+    def bytes_read(self) -> int:
+        """Position in the (compressed) file, for progress reporting."""
+        try:
+            return self._raw.tell() if self._raw else self.total_bytes
+        except (ValueError, OSError):
+            return self.total_bytes
+
+    def records(self) -> Iterator[Optional[Tuple[str, Dict]]]:
+        """
+        Yield ``(device_id, raw)`` for every record, or None for one that cannot be imported.
+
+        The sequence is deterministic for a given file: the checkpoint
+        counts positions in it.
+        """
+        with open(self.path, 'rb') as raw:
+            self._raw = raw
+            stream = gzip.GzipFile(fileobj=raw, mode='rb') if self.path.lower().endswith('.gz') else raw
+            if self.file_format == 'csv':
+                yield from self._csv_records(stream)
+            else:
+                yield from self._json_records(stream)
+        self._raw = None
+
+    def _json_records(self, stream) -> Iterator[Optional[Tuple[str, Dict]]]:
+        root = self.root
+        for path, scalars in JSONRecordScanner(stream):
+            if path[:len(root)] != root or READING_KEYS.isdisjoint(scalars):
+                continue
+            key = path[-1] if path else ''
+            timestamp = self._timestamp(scalars)
+            pushed = push_id_time(key)
+            if timestamp is None:
+                timestamp = pushed
+            # History entries sit under push ids or array indexes below their sensor
+            if pushed is not None or key.isdigit():
+                parent = path[-2] if len(path) > 1 else None
+            else:
+                parent = key or None
+            yield self._record(scalars, timestamp, parent)
+
+    def _csv_records(self, stream) -> Iterator[Optional[Tuple[str, Dict]]]:
+        text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+        reader = csv.DictReader(text)
+        if not self.device and not any(key in (reader.fieldnames or ()) for key in DEVICE_KEYS):
+            raise ValueError(
+                f"{self.path} has no {'/'.join(DEVICE_KEYS)} column; pass --device"
+            )
+        for row in reader:
+            # Empty cells are missing values, not zeros
+            row = {key: value for key, value in row.items() if key and value not in (None, '')}
+            yield self._record(row, self._timestamp(row), None)
+
+    @staticmethod
+    def _timestamp(raw: Dict):
+        for key in TIMESTAMP_KEYS:
+            if key in raw:
+                return clean_timestamp(raw[key])
+        return None
+
+    def _record(self, raw: Dict, timestamp, parent: Optional[str]) -> Optional[Tuple[str, Dict]]:
+        device_id = next((str(raw[key]) for key in DEVICE_KEYS if raw.get(key) not in (None, '')), None)
+        device_id = device_id or parent or self.device
+        if timestamp is None or not device_id:
+            return None
+        raw = {key: value for key, value in raw.items() if key not in TIMESTAMP_KEYS}
+        raw['timestamp'] = timestamp
+        return device_id, raw
+
+    def run(self, restart: bool = False,
+            progress: Optional[Callable[['HistoryImport', SensorImportCheckpoint], None]] = None
+            ) -> SensorImportCheckpoint:
+        """
+        Import the file, resuming from its checkpoint.
+
+        Args:
+            restart: Ignore any checkpoint and start from the first record
+            progress: Called with (importer, checkpoint) after every chunk
+
+        Returns:
+            The file's checkpoint
+
+        Raises:
+            ValueError: The file changed since the checkpoint was made, or cannot be parsed
+        """
+        fingerprint = file_fingerprint(self.path)
+        checkpoint, created = SensorImportCheckpoint.objects.get_or_create(
+            source=self.path, defaults={'fingerprint': fingerprint},
+        )
+        if restart:
+            checkpoint.fingerprint = fingerprint
+            checkpoint.records_done = checkpoint.rows_written = checkpoint.records_skipped = 0
+            checkpoint.completed = False
+            checkpoint.save()
+        elif checkpoint.fingerprint != fingerprint:
+            raise ValueError(f"{self.path} changed since it was last imported; use --restart")
+        if checkpoint.completed:
+            return checkpoint
+
+        resume_at = self.resumed_from = checkpoint.records_done
+        if resume_at:
+            logger.info("Resuming sensor history import", extra={'source': self.path, 'records': resume_at})
+        batch = []
+        for position, record in enumerate(self.records()):
+            # Committed records are skipped without normalizing them
+            if position < resume_at:
+                continue
+            batch.append(record)
+            if len(batch) >= self.batch_size:
+                self._commit(checkpoint, batch)
+                batch = []
+                if progress:
+                    progress(self, checkpoint)
+
+        checkpoint.completed = True
+        self._commit(checkpoint, batch)
+        if progress:
+            progress(self, checkpoint)
+        return checkpoint
+
+    def _commit(self, checkpoint: SensorImportCheckpoint, batch: List[Optional[Tuple[str, Dict]]]):
+        """Write a chunk, its detector state and the advanced checkpoint in one transaction."""
+        records = [record for record in batch if record is not None]
+        readings = normalize_batch([raw for _, raw in records], alerts=_no_alerts)
+        for (device_id, _), reading in zip(records, readings):
+            reading['device_id'] = device_id
+
+        try:
+            with transaction.atomic():
+                # Flagged readings are stored with their flags and kept out of the rollups, as live ones are
+                AnomalyDetector.inspect(readings)
+                written = SensorIngestion.write_rows([SensorIngestion.to_model(reading) for reading in readings])
+                AnomalyDetector.save()
+                checkpoint.records_done += len(batch)
+                checkpoint.records_skipped += len(batch) - len(records)
+                checkpoint.rows_written += written
+                checkpoint.save()
+        except Exception:
+            # The detectors saw a chunk that was rolled back; reload the committed state
+            AnomalyDetector.reset()
+            raise
+
+
+def _no_alerts(values) -> List[List[str]]:
+    # Alerts are not stored, and replaying history must not raise them
+    return [[] for _ in range(len(values))]
@@ -0,0 +1,116 @@
+"""
+Sensor history queries for charts.
+
+Picks the coarsest source that still has enough points for the requested
+window - day, hour or minute rollups, or raw SensorReading rows for short
+windows - and downsamples the series to the requested number of points
+with LTTB, so the response size does not depend on the window length.
+"""
+
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+import numpy as np
+
+from .downsampling import lttb_indices
+from .models import SensorReading, SensorRollup
+from .rollups import ROLLUP_METRICS
+
+RESOLUTION_SECONDS = (
+    ('day', 86400),
+    ('hour', 3600),
+    ('minute', 60),
+)
+
+DEFAULT_POINTS = 500
+MAX_POINTS = 5000
+DEFAULT_WINDOW = timedelta(hours=24)
+
+
+class SensorHistoryService:
+    """Range queries over sensor history with server-side downsampling."""
+
+    METRICS = ROLLUP_METRICS
+
+    @staticmethod
+    def choose_resolution(start: datetime, end: datetime, points: int) -> str:
+        """
+        Return the coarsest resolution that still yields at least ``points`` buckets.
+
+        Falls back to 'raw' when even minute buckets would be too few.
+        """
+        span = (end - start).total_seconds()
+        for resolution, seconds in RESOLUTION_SECONDS:
+            if span / seconds >= points:
+                return resolution
+        return 'raw'
+
+    @classmethod
+    def get_series(cls, device_id: str, metric: str, start: datetime, end: datetime,
+                   points: int = DEFAULT_POINTS, resolution: Optional[str] = None) -> Dict:
+        """
+        Fetch one metric of one sensor between start and end, downsampled.
+
+        Args:
+            device_id: Sensor id
+            metric: One of ROLLUP_METRICS
+            start, end: Aware datetimes bounding the window (inclusive)
+            points: Maximum number of points returned
+            resolution: Force 'raw', 'minute', 'hour' or 'day' instead of choosing
+
+        Returns:
+            Dictionary with the resolution used, source and returned point counts,
+            and the points as {'timestamp', 'value'} dictionaries
+        """
+        resolution = resolution or cls.choose_resolution(start, end, points)
+
+        if resolution == 'raw':
+            rows = SensorReading.objects.filter(
+                device_id=device_id,
+                timestamp__gte=start,
+                timestamp__lte=end,
+                **{f'{metric}__isnull': False},
+            ).order_by('timestamp').values_list('timestamp', metric)
+            timestamps, values = cls._columns(rows)
+        else:
+            rows = SensorRollup.objects.filter(
+                device_id=device_id,
+                metric=metric,
+                resolution=resolution,
+                bucket_start__gte=start,
+                bucket_start__lte=end,
+            ).order_by('bucket_start').values_list('bucket_start', 'sum_value', 'count')
+            timestamps, sums, counts = cls._columns(rows, width=3)
+            values = sums / np.maximum(counts, 1)
+
+        source_count = len(timestamps)
+        if source_count:
+            seconds = np.array([timestamp.timestamp() for timestamp in timestamps], dtype=np.float64)
+            keep = lttb_indices(seconds, values, points)
+            timestamps = [timestamps[index] for index in keep.tolist()]
+            values = values[keep]
+
+        return {
+            'device_id': device_id,
+            'metric': metric,
+            'resolution': resolution,
+            'from': start.isoformat(),
+            'to': end.isoformat(),
+            'source_count': source_count,
+            'count': len(timestamps),
+            'points': [
+                {'timestamp': timestamp.isoformat(), 'value': round(value, 2)}
+                for timestamp, value in zip(timestamps, np.asarray(values, dtype=np.float64).tolist())
+            ],
+        }
+
+    @staticmethod
+    def _columns(rows, width: int = 2):
+        """Split (timestamp, value, ...) rows into a timestamp list and float arrays."""
+        rows = list(rows)
+        timestamps = [row[0] for row in rows]
+        columns = [
+            np.fromiter((row[index] for row in rows), dtype=np.float64, count=len(rows))
+            for index in range(1, width)
+        ]
+        return (timestamps, *columns)
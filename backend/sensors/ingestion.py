@@ -0,0 +1,259 @@
+"""
+Buffered ingestion of normalized sensor readings into SensorReading.
+
+Readings are appended to an in-process buffer and written with
+``bulk_create`` once the buffer reaches SENSOR_INGEST_BATCH_SIZE rows, or
+by a background flusher every SENSOR_INGEST_FLUSH_SECONDS. Duplicate
+(device_id, timestamp) pairs are dropped before insertion, so replays and
+re-sent readings are harmless. If another writer (a second worker's
+stream listener) stores some of the same readings in between, the insert
+fails on the unique constraint and is retried without them; only rows
+this process actually inserted are folded into the rollups.
+
+Readings go through the anomaly detectors (sensors.anomaly) on the way
+in; each written batch is folded into the rollup tables, and the detector
+state saved, in the same transaction. A batch whose write fails goes back
+to the front of the buffer and is retried by the next flush.
+"""
+
+import atexit
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, List
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, connection, transaction
+from django.utils import timezone
+
+from agriboost.metrics import stage_timer
+
+from .anomaly import AnomalyDetector
+from .models import SensorDetectorState, SensorReading
+from .normalization import FIELD_NAMES
+from .rollups import SensorRollups
+
+logger = logging.getLogger(__name__)
+
+
+class SensorIngestion:
+    """Process-wide buffer that batches SensorReading inserts."""
+
+    _lock = threading.Lock()
+    _flush_lock = threading.Lock()
+    _buffer: List[SensorReading] = []
+    _flusher = None
+    _stop_event = threading.Event()
+
+    @classmethod
+    def is_enabled(cls) -> bool:
+        """Check whether ingestion is enabled in settings."""
+        return getattr(settings, 'SENSOR_INGEST_ENABLED', True)
+
+    @staticmethod
+    def batch_size() -> int:
+        return getattr(settings, 'SENSOR_INGEST_BATCH_SIZE', 500)
+
+    @staticmethod
+    def flush_seconds() -> float:
+        return getattr(settings, 'SENSOR_INGEST_FLUSH_SECONDS', 5.0)
+
+    @staticmethod
+    def to_model(reading: Dict) -> SensorReading:
+        """
+        Build an unsaved SensorReading from a normalized reading.
+
+        Args:
+            reading: Normalized reading (see normalize_sensor_data) with device_id
+        """
+        timestamp = reading['timestamp']
+        if isinstance(timestamp, str):
+            timestamp = datetime.fromisoformat(timestamp)
+        if timezone.is_naive(timestamp):
+            timestamp = timezone.make_aware(timestamp)
+
+        return SensorReading(
+            device_id=str(reading.get('device_id') or 'sensor'),
+            label=str(reading.get('label') or '')[:100],
+            timestamp=timestamp,
+            anomalies=','.join(reading.get('anomalies') or [])[:255],
+            **{field: reading.get(field) for field in FIELD_NAMES},
+        )
+
+    @classmethod
+    def add_many(cls, readings: Iterable[Dict]):
+        """
+        Queue normalized readings for insertion.
+
+        Flushes synchronously once the buffer holds a full batch; otherwise the
+        background flusher writes them within SENSOR_INGEST_FLUSH_SECONDS.
+        """
+        if not cls.is_enabled():
+            return
+        readings = list(readings)
+        # Readings from FirebaseService were inspected when normalized
+        AnomalyDetector.inspect([reading for reading in readings if 'anomalies' not in reading])
+        rows = [cls.to_model(reading) for reading in readings]
+        if not rows:
+            return
+
+        with cls._lock:
+            cls._buffer.extend(rows)
+            full = len(cls._buffer) >= cls.batch_size()
+        cls.ensure_flusher()
+        if full:
+            cls.flush()
+
+    @classmethod
+    def add(cls, reading: Dict):
+        """Queue a single normalized reading for insertion."""
+        cls.add_many([reading])
+
+    @classmethod
+    def flush(cls) -> int:
+        """
+        Write every buffered reading with batched bulk_create.
+
+        Returns:
+            Number of new readings written
+
+        Raises:
+            DatabaseError: The write failed; the readings are back in the buffer
+        """
+        with cls._flush_lock:
+            with cls._lock:
+                buffered, cls._buffer = cls._buffer, []
+            try:
+                rows = cls._new_rows(buffered)
+                if not rows and not AnomalyDetector.has_unsaved():
+                    return 0
+                with stage_timer('sensor_history_write'), transaction.atomic():
+                    written = cls._insert(rows) if rows else 0
+                    AnomalyDetector.save()
+            except Exception:
+                # Ahead of anything buffered meanwhile, so readings stay in order
+                with cls._lock:
+                    cls._buffer[:0] = buffered
+                raise
+            return written
+
+    @classmethod
+    def write_rows(cls, rows: List[SensorReading]) -> int:
+        """
+        Write readings straight to the database, bypassing the buffer.
+
+        Used by bulk imports (see sensors.history_import). Rows already
+        stored are skipped; the rest are inserted and folded into the
+        rollups in one transaction (joining the caller's, if any).
+
+        Returns:
+            Number of new readings written
+        """
+        rows = cls._new_rows(rows)
+        if not rows:
+            return 0
+        with stage_timer('sensor_history_write'), transaction.atomic():
+            return cls._insert(rows)
+
+    @classmethod
+    def _insert(cls, rows: List[SensorReading]) -> int:
+        """Insert new readings and fold exactly those into the rollups (inside a transaction)."""
+        size = cls.batch_size()
+        inserted: List[SensorReading] = []
+        for start in range(0, len(rows), size):
+            inserted.extend(cls._insert_chunk(rows[start:start + size]))
+        SensorRollups.apply(inserted)
+        return len(inserted)
+
+    @classmethod
+    def _insert_chunk(cls, chunk: List[SensorReading]) -> List[SensorReading]:
+        """
+        Insert a chunk, retrying without readings another writer stored meanwhile.
+
+        Returns:
+            The readings inserted
+        """
+        while chunk:
+            try:
+                with transaction.atomic():
+                    SensorReading.objects.bulk_create(chunk)
+                return chunk
+            except IntegrityError:
+                remaining = cls._new_rows(chunk)
+                if len(remaining) == len(chunk):
+                    # Not a duplicate reading: a real constraint violation
+                    raise
+                chunk = remaining
+        return []
+
+    @staticmethod
+    def _new_rows(rows: List[SensorReading]) -> List[SensorReading]:
+        """
+        Drop readings already stored or repeated within the batch.
+
+        Rollups are updated incrementally, so each reading must be counted once.
+        """
+        unique: Dict[tuple, SensorReading] = {}
+        for row in rows:
+            unique.setdefault((row.device_id, row.timestamp), row)
+        if not unique:
+            return []
+
+        stored = set(SensorReading.objects.filter(
+            device_id__in={device_id for device_id, _ in unique},
+            timestamp__gte=min(timestamp for _, timestamp in unique),
+            timestamp__lte=max(timestamp for _, timestamp in unique),
+        ).values_list('device_id', 'timestamp'))
+        return [row for key, row in unique.items() if key not in stored]
+
+    @classmethod
+    def ensure_flusher(cls):
+        """Start the periodic background flusher thread once per process."""
+        if cls._flusher is not None:
+            return
+        with cls._lock:
+            if cls._flusher is not None:
+                return
+            cls._flusher = threading.Thread(target=cls._flush_loop, name='sensor-ingestion', daemon=True)
+            cls._flusher.start()
+
+    @classmethod
+    def _flush_loop(cls):
+        while not cls._stop_event.wait(cls.flush_seconds()):
+            try:
+                cls.flush()
+            except Exception:
+                logger.exception("Failed to flush sensor readings")
+            finally:
+                close_old_connections()
+
+    @classmethod
+    def shutdown(cls):
+        """
+        Stop the flusher and write whatever is still buffered.
+
+        Skipped when there is nothing to write, or when the tables are not
+        there (e.g. a test database already dropped).
+        """
+        cls._stop_event.set()
+        if not cls._buffer and not AnomalyDetector.has_unsaved():
+            return
+        if not cls._tables_exist():
+            logger.warning("Sensor history tables unavailable; dropping buffered readings on shutdown",
+                           extra={'readings': len(cls._buffer)})
+            return
+        try:
+            cls.flush()
+        except Exception:
+            logger.exception("Failed to flush sensor readings on shutdown")
+
+    @staticmethod
+    def _tables_exist() -> bool:
+        try:
+            tables = set(connection.introspection.table_names())
+        except Exception:
+            return False
+        return {SensorReading._meta.db_table, SensorDetectorState._meta.db_table} <= tables
+
+
+atexit.register(SensorIngestion.shutdown)
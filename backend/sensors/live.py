@@ -0,0 +1,185 @@
+"""
+Fan-out hub for the live sensor feed (Server-Sent Events and long-poll).
+
+A single upstream source - the RTDB stream listener, or one shared poller
+thread when streaming is unavailable - publishes feed snapshots to the
+hub. The hub keeps only the latest snapshot and a version number, and
+only bumps the version when a sensor value actually changes (timestamps
+and ages are ignored). Waiting clients are woken with one asyncio.Event
+per event loop, so an update costs one cross-thread call per worker loop
+no matter how many clients are connected.
+
+Versions count from 1 in every process. A client presenting a version
+newer than this process has (the worker restarted, or a load balancer
+sent it to another worker) is behind, not ahead: it gets the current
+snapshot straight away.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+from typing import Callable, Dict, Optional, Tuple
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Keys that change on every fetch without the readings changing
+VOLATILE_KEYS = ('timestamp', 'age_seconds', 'last_updated')
+
+
+def feed_digest(payload: Dict) -> str:
+    """Digest of a feed payload's sensor values; timestamps and ages are ignored."""
+    sensors = [
+        {key: value for key, value in sensor.items() if key not in VOLATILE_KEYS}
+        for sensor in payload.get('sensors', [])
+    ]
+    encoded = json.dumps([payload.get('source'), sensors], sort_keys=True, default=str)
+    return hashlib.sha1(encoded.encode('utf-8')).hexdigest()
+
+
+class LiveFeedHub:
+    """Latest feed snapshot plus change notification for async consumers."""
+
+    _lock = threading.Lock()
+    _version = 0
+    _message: Optional[str] = None
+    _digest: Optional[str] = None
+    _events: Dict[asyncio.AbstractEventLoop, asyncio.Event] = {}
+
+    _subscribers = 0
+    _poller = None
+    _poller_stop: Optional[threading.Event] = None
+    _fetch: Optional[Callable[[], Dict]] = None
+
+    @classmethod
+    def publish(cls, payload: Optional[Dict]) -> bool:
+        """
+        Publish a feed snapshot from any thread.
+
+        Returns:
+            True if the values changed and waiting clients were woken
+        """
+        if not payload:
+            return False
+        digest = feed_digest(payload)
+        with cls._lock:
+            if digest == cls._digest:
+                return False
+            cls._version += 1
+            cls._digest = digest
+            cls._message = json.dumps({'version': cls._version, **payload}, default=str)
+            loops = list(cls._events.keys())
+
+        for loop in loops:
+            try:
+                loop.call_soon_threadsafe(cls._wake, loop)
+            except RuntimeError:
+                # Loop closed; forget it
+                with cls._lock:
+                    cls._events.pop(loop, None)
+        return True
+
+    @classmethod
+    def _wake(cls, loop: asyncio.AbstractEventLoop):
+        """Runs on the target loop: release every waiter of the current event."""
+        with cls._lock:
+            event = cls._events.get(loop)
+            cls._events[loop] = asyncio.Event()
+        if event is not None:
+            event.set()
+
+    @classmethod
+    def latest(cls) -> Tuple[int, Optional[str]]:
+        """Return the current (version, JSON message)."""
+        with cls._lock:
+            return cls._version, cls._message
+
+    @classmethod
+    async def wait_for_change(cls, since_version: int, timeout: float) -> Optional[Tuple[int, str]]:
+        """
+        Wait until a version other than since_version is available.
+
+        A since_version newer than the current one comes from another process
+        (or before a restart) and is answered with the current snapshot.
+
+        Returns:
+            (version, JSON message), or None if nothing changed within timeout
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            with cls._lock:
+                if cls._version != since_version and cls._message is not None:
+                    return cls._version, cls._message
+                event = cls._events.get(loop)
+                if event is None:
+                    event = cls._events[loop] = asyncio.Event()
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return None
+            try:
+                await asyncio.wait_for(event.wait(), remaining)
+            except asyncio.TimeoutError:
+                return None
+
+    @classmethod
+    def subscribe(cls, fetch: Callable[[], Dict]):
+        """
+        Register a connected client.
+
+        Starts the shared poller thread on first use; it keeps the hub fed
+        when the RTDB stream is not delivering events.
+        """
+        with cls._lock:
+            cls._subscribers += 1
+            cls._fetch = fetch
+            start_poller = cls._poller is None
+            if start_poller:
+                cls._poller_stop = threading.Event()
+                cls._poller = threading.Thread(target=cls._poll_loop, args=(cls._poller_stop,),
+                                               name='live-feed-poller', daemon=True)
+        if start_poller:
+            cls._poller.start()
+
+    @classmethod
+    def unsubscribe(cls):
+        with cls._lock:
+            cls._subscribers = max(0, cls._subscribers - 1)
+
+    @classmethod
+    def subscriber_count(cls) -> int:
+        return cls._subscribers
+
+    @classmethod
+    def stop_poller(cls, timeout: Optional[float] = None):
+        """Stop the shared poller thread, if running; the next subscribe starts a new one."""
+        with cls._lock:
+            poller, stop = cls._poller, cls._poller_stop
+            cls._poller = cls._poller_stop = None
+        if poller is not None:
+            stop.set()
+            poller.join(timeout)
+
+    @classmethod
+    def reset(cls):
+        """Stop the poller and forget the snapshot, version and subscribers."""
+        cls.stop_poller()
+        with cls._lock:
+            cls._version = 0
+            cls._message = cls._digest = cls._fetch = None
+            cls._events = {}
+            cls._subscribers = 0
+
+    @classmethod
+    def _poll_loop(cls, stop: threading.Event):
+        interval = getattr(settings, 'SENSOR_LIVE_POLL_SECONDS', 5.0)
+        while not stop.wait(interval):
+            if not cls._subscribers or cls._fetch is None:
+                continue
+            try:
+                cls.publish(cls._fetch())
+            except Exception as e:
+                logger.warning("Failed to poll sensor feed: %s", e)
@@ -0,0 +1,73 @@
+"""
+Export sensor, prediction, disease or account history to CSV or Parquet.
+
+Usage: python manage.py export_history {sensor_readings,fertilizer_predictions,disease_history,user_history}
+       [--type csv|parquet] [--output PATH] [--user EMAIL] [--chunk-size N]
+
+Rows are streamed from the database and written chunk by chunk, so memory
+use does not grow with the table.
+"""
+
+import sys
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from agriboost.export import EXPORTS, available_formats, chunk_size, export_filename, export_stream, queryset_for
+
+
+class Command(BaseCommand):
+    help = "Stream a history table to a CSV or Parquet file."
+
+    def add_arguments(self, parser):
+        parser.add_argument('export', choices=sorted(EXPORTS), help="Table to export")
+        parser.add_argument(
+            '--type',
+            choices=('csv', 'parquet'),
+            default='csv',
+            help="File format (default: csv; parquet needs pyarrow)",
+        )
+        parser.add_argument(
+            '--output',
+            help="File to write, or - for stdout (default: <export>-<timestamp>.<type>)",
+        )
+        parser.add_argument('--user', help="Only export this user's rows (email)")
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=chunk_size(),
+            help="Rows fetched and written at a time (default: EXPORT_CHUNK_SIZE)",
+        )
+
+    def handle(self, *args, **options):
+        name, file_format = options['export'], options['type']
+        if file_format not in available_formats():
+            raise CommandError("Parquet export needs pyarrow; install it or use --type csv.")
+
+        user = None
+        if options['user']:
+            if not EXPORTS[name].user_field:
+                raise CommandError(f"{name} is not per-user; drop --user.")
+            try:
+                user = get_user_model().objects.get(email=options['user'])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f"No user with email {options['user']}.")
+
+        output = options['output'] or export_filename(name, file_format)
+        started = time.monotonic()
+        stream = export_stream(name, file_format, queryset_for(name, user), max(1, options['chunk_size']))
+        written = 0
+        handle = sys.stdout.buffer if output == '-' else open(output, 'wb')
+        try:
+            for data in stream:
+                handle.write(data)
+                written += len(data)
+        finally:
+            if handle is not sys.stdout.buffer:
+                handle.close()
+
+        if output != '-':
+            self.stdout.write(self.style.SUCCESS(
+                f"Wrote {name} to {output} ({written / 1024:.0f} KiB in {time.monotonic() - started:.1f}s)"
+            ))
@@ -0,0 +1,107 @@
+"""
+Import historical sensor readings from Firebase JSON exports or CSV files.
+
+Usage: python manage.py import_sensor_history FILE [FILE ...] [--format auto|json|csv]
+       [--device ID] [--root /sensors] [--batch-size N] [--restart]
+
+Files are streamed, so exports larger than memory are fine. Progress is
+checkpointed with every chunk: re-running the command after an
+interruption resumes where it stopped.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from sensors.history_import import HistoryImport
+
+
+class Command(BaseCommand):
+    help = "Stream historical sensor readings from JSON exports or CSV files into SensorReading."
+
+    # Seconds between progress lines
+    progress_interval = 2.0
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', help="Export files (.json, .csv, optionally .gz)")
+        parser.add_argument(
+            '--format',
+            choices=('auto', 'json', 'csv'),
+            default='auto',
+            help="File format (default: from the extension or content)",
+        )
+        parser.add_argument(
+            '--device',
+            help="Sensor id for records that do not name one (required for CSV without a device column)",
+        )
+        parser.add_argument(
+            '--root',
+            default='',
+            help="Only import JSON records below this path, e.g. /sensors",
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=2000,
+            help="Records written per transaction (default: 2000)",
+        )
+        parser.add_argument(
+            '--restart',
+            action='store_true',
+            help="Ignore saved progress and import each file from the start",
+        )
+
+    def handle(self, *args, **options):
+        for path in options['paths']:
+            try:
+                importer = HistoryImport(
+                    path,
+                    file_format=options['format'],
+                    device=options['device'],
+                    root=options['root'],
+                    batch_size=options['batch_size'],
+                )
+            except OSError as e:
+                raise CommandError(f"Cannot read {path}: {e}")
+            self._import(importer, options['restart'])
+
+    def _import(self, importer: HistoryImport, restart: bool):
+        self.stdout.write(f"Importing {importer.path} ({importer.file_format})")
+        started = time.monotonic()
+        # (time, records_done) of the last progress line
+        reported = [started, None]
+
+        def progress(importer, checkpoint):
+            now = time.monotonic()
+            if checkpoint.records_done == reported[1]:
+                return
+            if now - reported[0] < self.progress_interval and not checkpoint.completed:
+                return
+            reported[:] = [now, checkpoint.records_done]
+            percent = 100.0 * importer.bytes_read() / importer.total_bytes if importer.total_bytes else 100.0
+            self.stdout.write(
+                f"  {checkpoint.records_done} records, {checkpoint.rows_written} written, "
+                f"{checkpoint.records_skipped} skipped ({percent:.0f}%, {self._rate(importer, checkpoint, now - started)})"
+            )
+
+        try:
+            checkpoint = importer.run(restart=restart, progress=progress)
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        if importer.resumed_from is None:
+            self.stdout.write(self.style.WARNING(
+                f"Already imported ({checkpoint.rows_written} readings); use --restart to import it again"
+            ))
+            return
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {checkpoint.rows_written} readings from {checkpoint.records_done} records "
+            f"in {elapsed:.1f}s ({self._rate(importer, checkpoint, elapsed)})"
+        ))
+
+    @staticmethod
+    def _rate(importer: HistoryImport, checkpoint, elapsed: float) -> str:
+        # Records skipped on resume are not counted
+        done = checkpoint.records_done - importer.resumed_from
+        return f"{done / elapsed:.0f} rows/s" if elapsed > 0 and done > 0 else "- rows/s"
@@ -0,0 +1,82 @@
+"""
+Publish a fertilizer model bundle as a new version.
+
+Usage: python manage.py publish_fertilizer_model VERSION [--source DIR] [--no-activate]
+
+Copies the four artifacts (from --source, default the bundle being served)
+into FERTILIZER_MODEL_DIR/VERSION as joblib files, which are memory-mapped
+when loaded, then points CURRENT at the new version. Running web workers
+pick it up within FERTILIZER_MODEL_CHECK_SECONDS.
+"""
+
+import os
+import shutil
+from pathlib import Path
+
+import joblib
+from django.core.management.base import BaseCommand, CommandError
+
+from sensors.model_registry import (
+    ARTIFACTS, BASE_VERSION, POINTER_FILE, FertilizerModels, model_dir,
+)
+
+
+class Command(BaseCommand):
+    help = "Write a fertilizer model bundle as a new memory-mappable version and activate it."
+
+    def add_arguments(self, parser):
+        parser.add_argument('version', help="Name of the new version, e.g. v2")
+        parser.add_argument(
+            '--source',
+            help="Directory with classifier1, fertilizer1, soil_encoder and crop_encoder "
+                 "(.pkl or .joblib; default: the bundle currently served)",
+        )
+        parser.add_argument(
+            '--no-activate',
+            action='store_true',
+            help="Write the version without pointing CURRENT at it",
+        )
+
+    def handle(self, *args, **options):
+        version = options['version']
+        if version == BASE_VERSION or not version or '/' in version or version.startswith('.'):
+            raise CommandError(f"Invalid version name {version!r}.")
+        directory = model_dir()
+        target = directory / version
+        if target.exists():
+            raise CommandError(f"{target} already exists.")
+
+        try:
+            served, served_path = FertilizerModels.resolve()
+            source = Path(options['source']) if options['source'] else served_path
+            bundle = FertilizerModels.load(version, source)
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Cannot load the source bundle: {e}")
+
+        # Written under a hidden name and renamed, so the registry never sees half a bundle
+        staging = directory / f".{version}.tmp"
+        shutil.rmtree(staging, ignore_errors=True)
+        staging.mkdir(parents=True)
+        try:
+            for attribute, name in ARTIFACTS:
+                joblib.dump(getattr(bundle, attribute), staging / f"{name}.joblib")
+            os.rename(staging, target)
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        if options['no_activate']:
+            # Without a pointer the newest version directory would be served
+            if not (directory / POINTER_FILE).exists():
+                self._point(directory, served)
+            self.stdout.write(self.style.SUCCESS(f"Wrote version {version} to {target} (not activated)"))
+            return
+        self._point(directory, version)
+        self.stdout.write(self.style.SUCCESS(f"Published and activated version {version} ({target})"))
+
+    @staticmethod
+    def _point(directory: Path, version: str):
+        """Atomically replace CURRENT."""
+        temporary = directory / f".{POINTER_FILE}.tmp"
+        temporary.write_text(f"{version}\n")
+        os.replace(temporary, directory / POINTER_FILE)
@@ -0,0 +1,35 @@
+"""
+Rebuild the minute/hour/day sensor rollups from the SensorReading table.
+
+Usage: python manage.py rebuild_sensor_rollups [--chunk-size N]
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from sensors.rollups import SensorRollups
+
+
+class Command(BaseCommand):
+    help = "Drop and rebuild every SensorRollup bucket from stored sensor readings."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=5000,
+            help="Number of readings aggregated per database write (default: 5000)",
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+
+        def progress(processed):
+            self.stdout.write(f"  {processed} readings applied")
+
+        processed = SensorRollups.rebuild(chunk_size=options['chunk_size'], progress=progress)
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt rollups from {processed} readings in {elapsed:.1f}s"
+        ))
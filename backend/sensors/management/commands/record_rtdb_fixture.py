@@ -0,0 +1,47 @@
+"""
+Capture the live sensors node into a fixture for the local RTDB backend.
+
+Usage: python manage.py record_rtdb_fixture [--output PATH] [--path /IoT_Sensors]
+
+Replay it offline with FIREBASE_BACKEND=local FIREBASE_FIXTURE_PATH=PATH.
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from sensors.firebase_service import FirebaseService
+from sensors.rtdb import FirebaseBackend, RecordingBackend
+
+
+class Command(BaseCommand):
+    help = "Record the Firebase sensors node into a JSON fixture for FIREBASE_BACKEND=local."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output',
+            default=getattr(settings, 'FIREBASE_FIXTURE_PATH', None),
+            help="Fixture file to write (default: FIREBASE_FIXTURE_PATH)",
+        )
+        parser.add_argument(
+            '--path',
+            default=getattr(settings, 'FIREBASE_SENSORS_PATH', '/sensors'),
+            help="Database path to record (default: FIREBASE_SENSORS_PATH)",
+        )
+
+    def handle(self, *args, **options):
+        if getattr(settings, 'FIREBASE_BACKEND', 'firebase') == 'local':
+            raise CommandError("FIREBASE_BACKEND is 'local'; recording needs the real database.")
+        if not options['output']:
+            raise CommandError("No --output given and FIREBASE_FIXTURE_PATH is not set.")
+        if not FirebaseService.is_connected():
+            raise CommandError("Firebase is not connected; check FIREBASE_KEY_FILE.")
+
+        recorder = RecordingBackend(FirebaseBackend(), options['output'])
+        data = recorder.get(options['path'])
+        if data is None:
+            raise CommandError(f"Nothing stored at {options['path']}.")
+
+        devices = FirebaseService.split_devices(data)
+        self.stdout.write(self.style.SUCCESS(
+            f"Recorded {options['path']} ({len(devices)} sensors) to {options['output']}"
+        ))
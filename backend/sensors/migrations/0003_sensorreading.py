@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sensors', '0002_rename_soil_moisture_fertilizerprediction_moisture_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SensorReading',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('device_id', models.CharField(help_text='Sensor id (Firebase child key)', max_length=100)),
+                ('label', models.CharField(blank=True, default='', max_length=100)),
+                ('timestamp', models.DateTimeField(help_text='Time the reading was taken')),
+                ('temperature', models.FloatField(blank=True, help_text='Temperature in Celsius', null=True)),
+                ('humidity', models.FloatField(blank=True, help_text='Humidity percentage', null=True)),
+                ('soil_moisture', models.FloatField(blank=True, help_text='Soil moisture percentage', null=True)),
+                ('soil_ph', models.FloatField(blank=True, help_text='Soil pH value', null=True)),
+                ('ec', models.FloatField(blank=True, help_text='Electrical Conductivity', null=True)),
+                ('nitrogen', models.FloatField(blank=True, help_text='Nitrogen level', null=True)),
+                ('phosphorous', models.FloatField(blank=True, help_text='Phosphorus level', null=True)),
+                ('potassium', models.FloatField(blank=True, help_text='Potassium level', null=True)),
+                ('battery', models.FloatField(blank=True, help_text='Battery percentage', null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Sensor Reading',
+                'verbose_name_plural': 'Sensor Readings',
+                'ordering': ['-timestamp'],
+                'constraints': [models.UniqueConstraint(fields=('device_id', 'timestamp'), name='unique_sensor_reading')],
+            },
+        ),
+    ]
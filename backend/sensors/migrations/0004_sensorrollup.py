@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sensors', '0003_sensorreading'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SensorRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('device_id', models.CharField(max_length=100)),
+                ('metric', models.CharField(max_length=30)),
+                ('resolution', models.CharField(choices=[('minute', 'Minute'), ('hour', 'Hour'), ('day', 'Day')], max_length=10)),
+                ('bucket_start', models.DateTimeField(help_text='Start of the aggregation bucket')),
+                ('min_value', models.FloatField()),
+                ('max_value', models.FloatField()),
+                ('sum_value', models.FloatField()),
+                ('count', models.PositiveIntegerField()),
+                ('last_value', models.FloatField()),
+                ('last_timestamp', models.DateTimeField(help_text='Timestamp of the reading that set last_value')),
+            ],
+            options={
+                'verbose_name': 'Sensor Rollup',
+                'verbose_name_plural': 'Sensor Rollups',
+                'ordering': ['bucket_start'],
+                'constraints': [models.UniqueConstraint(fields=('device_id', 'metric', 'resolution', 'bucket_start'), name='unique_sensor_rollup')],
+            },
+        ),
+    ]
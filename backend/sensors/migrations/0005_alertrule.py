@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:23
+
+from django.db import migrations, models
+
+# The thresholds that were hard-coded in sensors.normalization
+DEFAULT_RULES = [
+    ('High temperature', 'temperature', 'gt', 40.0, 1.0, "High temperature alert: {value}°C exceeds 40°C threshold"),
+    ('Low temperature', 'temperature', 'lt', 10.0, 1.0, "Low temperature alert: {value}°C below 10°C threshold"),
+    ('Low pH', 'soil_ph', 'lt', 5.0, 0.1, "Low pH alert: {value} below 5.0 threshold"),
+    ('High pH', 'soil_ph', 'gt', 8.0, 0.1, "High pH alert: {value} exceeds 8.0 threshold"),
+    ('Low soil moisture', 'soil_moisture', 'lt', 30.0, 2.0, "Low soil moisture alert: {value}% below 30% threshold"),
+]
+
+
+def create_default_rules(apps, schema_editor):
+    AlertRule = apps.get_model('sensors', 'AlertRule')
+    AlertRule.objects.bulk_create([
+        AlertRule(name=name, metric=metric, operator=operator, threshold=threshold,
+                  hysteresis=hysteresis, message=message)
+        for name, metric, operator, threshold, hysteresis, message in DEFAULT_RULES
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sensors', '0004_sensorrollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlertRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('device_id', models.CharField(blank=True, default='', help_text='Only apply to this sensor (blank for every sensor)', max_length=100)),
+                ('crop_type', models.CharField(blank=True, default='', help_text='Only apply while this crop is grown (blank for every crop)', max_length=50)),
+                ('metric', models.CharField(choices=[('temperature', 'Temperature'), ('humidity', 'Humidity'), ('soil_moisture', 'Soil moisture'), ('soil_ph', 'Soil pH'), ('ec', 'Electrical conductivity'), ('nitrogen', 'Nitrogen'), ('phosphorous', 'Phosphorous'), ('potassium', 'Potassium'), ('battery', 'Battery')], max_length=30)),
+                ('operator', models.CharField(choices=[('gt', 'Above threshold'), ('lt', 'Below threshold')], max_length=2)),
+                ('threshold', models.FloatField()),
+                ('hysteresis', models.FloatField(default=0.0, help_text='How far back past the threshold the value must move before an active alert clears')),
+                ('message', models.CharField(help_text='Alert text; {value}, {threshold} and {device_id} are filled in', max_length=255)),
+                ('enabled', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Alert Rule',
+                'verbose_name_plural': 'Alert Rules',
+                'ordering': ['id'],
+            },
+        ),
+        migrations.RunPython(create_default_rules, migrations.RunPython.noop),
+    ]
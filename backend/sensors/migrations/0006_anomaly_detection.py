@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sensors', '0005_alertrule'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sensorreading',
+            name='anomalies',
+            field=models.CharField(blank=True, default='', help_text='Comma separated metric:kind flags set by sensors.anomaly (blank when clean)', max_length=255),
+        ),
+        migrations.CreateModel(
+            name='SensorDetectorState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('device_id', models.CharField(max_length=100)),
+                ('metric', models.CharField(max_length=30)),
+                ('state', models.TextField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Sensor Detector State',
+                'verbose_name_plural': 'Sensor Detector States',
+                'constraints': [models.UniqueConstraint(fields=('device_id', 'metric'), name='unique_sensor_detector_state')],
+            },
+        ),
+    ]
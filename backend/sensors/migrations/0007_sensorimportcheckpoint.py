@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sensors', '0006_anomaly_detection'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SensorImportCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(help_text='Absolute path of the imported file', max_length=500, unique=True)),
+                ('fingerprint', models.CharField(help_text='Size, mtime and content hash of the file', max_length=100)),
+                ('records_done', models.PositiveBigIntegerField(default=0, help_text='Records read and committed')),
+                ('rows_written', models.PositiveBigIntegerField(default=0, help_text='New SensorReading rows written')),
+                ('records_skipped', models.PositiveBigIntegerField(default=0, help_text='Records without a usable timestamp or sensor id')),
+                ('completed', models.BooleanField(default=False)),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Sensor Import Checkpoint',
+                'verbose_name_plural': 'Sensor Import Checkpoints',
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sensors', '0007_sensorimportcheckpoint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fertilizerprediction',
+            name='alternatives',
+            field=models.TextField(blank=True, help_text='Next most likely fertilizers with their probabilities (JSON)', null=True),
+        ),
+    ]
@@ -0,0 +1,235 @@
+"""
+Versioned fertilizer model bundles.
+
+The classifier and its three label encoders only make sense together, so
+they are loaded, versioned and swapped as one ``ModelBundle``. Bundles live
+under FERTILIZER_MODEL_DIR (relative paths are resolved against BASE_DIR)::
+
+    fertilizer model/
+        classifier1.pkl, fertilizer1.pkl, ...   the original bundle, version "base"
+        v2/
+            classifier1.joblib, ...             a published version
+        CURRENT                                 optional: the version to serve
+
+Without a CURRENT file the highest complete version directory is served,
+else the top-level files. Artifacts are read with ``joblib.load``: files
+written by ``joblib.dump`` (see the publish_fertilizer_model command) have
+their NumPy arrays memory-mapped read-only instead of copied; plain pickles
+are unpickled as before.
+
+Nothing is loaded at import time. Web workers load the bundle at startup
+(agriboost.wsgi / agriboost.asgi call ``warm_up``); management commands
+load it only if they predict. Every FERTILIZER_MODEL_CHECK_SECONDS the
+current version is resolved again; a new one is loaded beside the old and
+swapped in with a single assignment, so a request that took a bundle
+keeps using that complete bundle.
+
+With FERTILIZER_COMPILED_FOREST a random forest classifier is also
+compiled into flat arrays (sensors.forest) when the bundle loads, and
+``ModelBundle.predict_proba`` uses that instead of sklearn for up to
+FERTILIZER_COMPILED_FOREST_MAX_ROWS rows.
+"""
+
+import logging
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import joblib
+import numpy as np
+from django.conf import settings
+
+from agriboost.metrics import stage_timer
+
+from .features import FeatureAssembler, unnamed_features
+from .forest import CompiledForest
+
+logger = logging.getLogger(__name__)
+
+# Bundle attribute -> artifact file name (without extension)
+ARTIFACTS = (
+    ('model', 'classifier1'),
+    ('fertilizer_encoder', 'fertilizer1'),
+    ('soil_encoder', 'soil_encoder'),
+    ('crop_encoder', 'crop_encoder'),
+)
+
+# Preferred first: joblib files can be memory-mapped
+EXTENSIONS = ('.joblib', '.pkl')
+
+BASE_VERSION = 'base'
+POINTER_FILE = 'CURRENT'
+
+
+class ModelBundle:
+    """A loaded classifier with its encoders, feature assembler and compiled forest."""
+
+    __slots__ = ('version', 'path', 'model', 'fertilizer_encoder', 'soil_encoder', 'crop_encoder',
+                 'features', 'forest', 'loaded_at')
+
+    def __init__(self, version: str, path: Path, model, fertilizer_encoder, soil_encoder, crop_encoder):
+        self.version = version
+        self.path = path
+        self.model = model
+        self.fertilizer_encoder = fertilizer_encoder
+        self.soil_encoder = soil_encoder
+        self.crop_encoder = crop_encoder
+        self.features = FeatureAssembler(model, soil_encoder, crop_encoder)
+        self.forest = self._compile(model)
+        self.loaded_at = time.time()
+
+    @staticmethod
+    def _compile(model) -> Optional[CompiledForest]:
+        if not getattr(settings, 'FERTILIZER_COMPILED_FOREST', True):
+            return None
+        try:
+            return CompiledForest.compile(model)
+        except ValueError as e:
+            # Not a forest (e.g. a different estimator was published): sklearn serves it
+            logger.info("Fertilizer model not compiled: %s", e)
+            return None
+
+    def predict_proba(self, matrix) -> np.ndarray:
+        """Class probabilities of the feature rows, through the compiled forest for small inputs."""
+        max_rows = getattr(settings, 'FERTILIZER_COMPILED_FOREST_MAX_ROWS', 1500)
+        if self.forest is not None and len(matrix) <= max_rows:
+            return self.forest.predict_proba(matrix)
+        with unnamed_features():
+            return self.model.predict_proba(matrix)
+
+    def __repr__(self):
+        return f"<ModelBundle {self.version} from {self.path}>"
+
+
+def model_dir() -> Path:
+    path = Path(getattr(settings, 'FERTILIZER_MODEL_DIR', 'sensors/fertilizer model'))
+    return path if path.is_absolute() else Path(settings.BASE_DIR) / path
+
+
+def artifact_paths(directory: Path) -> Optional[Dict[str, Path]]:
+    """Files of the bundle in directory, or None if any artifact is missing."""
+    paths = {}
+    for attribute, name in ARTIFACTS:
+        found = next((directory / f"{name}{extension}" for extension in EXTENSIONS
+                      if (directory / f"{name}{extension}").is_file()), None)
+        if found is None:
+            return None
+        paths[attribute] = found
+    return paths
+
+
+def _version_key(name: str):
+    # v10 sorts after v9
+    return [(0, int(part), '') if part.isdigit() else (1, 0, part) for part in re.split(r'(\d+)', name)]
+
+
+class FertilizerModels:
+    """The process-wide current fertilizer model bundle."""
+
+    _lock = threading.Lock()
+    _bundle: Optional[ModelBundle] = None
+    _checked_at = 0.0
+
+    @staticmethod
+    def check_seconds() -> float:
+        return getattr(settings, 'FERTILIZER_MODEL_CHECK_SECONDS', 30.0)
+
+    @staticmethod
+    def resolve() -> Tuple[str, Path]:
+        """
+        Version to serve and its directory.
+
+        Raises:
+            FileNotFoundError: CURRENT names a version that is missing or incomplete
+        """
+        directory = model_dir()
+        pointer = directory / POINTER_FILE
+        if pointer.is_file():
+            version = pointer.read_text().strip() or BASE_VERSION
+            path = directory if version == BASE_VERSION else directory / version
+            if artifact_paths(path) is None:
+                raise FileNotFoundError(f"{pointer} names version {version!r}, which is missing or incomplete")
+            return version, path
+
+        # A directory being copied in is skipped until all four artifacts exist
+        versions = sorted(
+            (child.name for child in directory.iterdir()
+             if child.is_dir() and not child.name.startswith('.') and artifact_paths(child)),
+            key=_version_key,
+        ) if directory.is_dir() else []
+        if versions:
+            return versions[-1], directory / versions[-1]
+        return BASE_VERSION, directory
+
+    @staticmethod
+    def load(version: str, path: Path) -> ModelBundle:
+        """Load a bundle from disk (does not make it current)."""
+        paths = artifact_paths(path)
+        if paths is None:
+            raise FileNotFoundError(f"Fertilizer model bundle at {path} is incomplete")
+        with stage_timer('model_load'):
+            artifacts = {attribute: joblib.load(file, mmap_mode='r') for attribute, file in paths.items()}
+        return ModelBundle(version, path, **artifacts)
+
+    @classmethod
+    def get(cls) -> ModelBundle:
+        """
+        The current bundle, loading it on first use and picking up new versions.
+
+        Raises:
+            FileNotFoundError: No bundle could be loaded (only before the first success)
+        """
+        bundle = cls._bundle
+        if bundle is not None and time.monotonic() - cls._checked_at < cls.check_seconds():
+            return bundle
+        if bundle is None:
+            cls._lock.acquire()
+        elif not cls._lock.acquire(blocking=False):
+            # Another thread is checking; serve the bundle we have meanwhile
+            return bundle
+        try:
+            if cls._bundle is None or time.monotonic() - cls._checked_at >= cls.check_seconds():
+                cls._refresh()
+            return cls._bundle
+        finally:
+            cls._lock.release()
+
+    @classmethod
+    def _refresh(cls):
+        cls._checked_at = time.monotonic()
+        current = cls._bundle
+        try:
+            version, path = cls.resolve()
+            if current is not None and (current.version, current.path) == (version, path):
+                return
+            bundle = cls.load(version, path)
+        except Exception as e:
+            if current is None:
+                raise
+            logger.error("Could not load fertilizer model bundle; keeping version %s: %s", current.version, e)
+            return
+        cls._bundle = bundle
+        logger.info(
+            "Fertilizer model bundle loaded",
+            extra={'version': version, 'path': str(path),
+                   'previous': current.version if current is not None else None},
+        )
+
+    @classmethod
+    def warm_up(cls):
+        """Load the bundle now (web workers call this at startup) if FERTILIZER_MODEL_WARMUP."""
+        if not getattr(settings, 'FERTILIZER_MODEL_WARMUP', True):
+            return
+        try:
+            cls.get()
+        except Exception as e:
+            # The first prediction will try again and report the error
+            logger.error("Fertilizer model warm-up failed: %s", e)
+
+    @classmethod
+    def reset(cls):
+        with cls._lock:
+            cls._bundle = None
+            cls._checked_at = 0.0
@@ -49,6 +49,12 @@ class FertilizerPrediction(models.Model):
         null=True,
         blank=True
     )
+    # JSON list of the runner-up fertilizers, e.g. [{"fertilizer": "DAP", "probability": 0.2}]
+    alternatives = models.TextField(
+        help_text="Next most likely fertilizers with their probabilities (JSON)",
+        null=True,
+        blank=True
+    )
     
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
@@ -61,3 +67,201 @@ class FertilizerPrediction(models.Model):
     
     def __str__(self):
         return f"Prediction: {self.recommended_fertilizer} - {self.created_at.strftime('%Y-%m-%d %H:%M')}"
+
+
+class SensorReading(models.Model):
+    """
+    Time-series history of normalized sensor readings.
+
+    Rows are written in batches by sensors.ingestion; the unique constraint on
+    (device_id, timestamp) also serves as the (device, time) index used by
+    history queries and makes re-ingesting the same reading a no-op.
+    """
+    device_id = models.CharField(max_length=100, help_text="Sensor id (Firebase child key)")
+    label = models.CharField(max_length=100, blank=True, default='')
+    timestamp = models.DateTimeField(help_text="Time the reading was taken")
+
+    temperature = models.FloatField(help_text="Temperature in Celsius", null=True, blank=True)
+    humidity = models.FloatField(help_text="Humidity percentage", null=True, blank=True)
+    soil_moisture = models.FloatField(help_text="Soil moisture percentage", null=True, blank=True)
+    soil_ph = models.FloatField(help_text="Soil pH value", null=True, blank=True)
+    ec = models.FloatField(help_text="Electrical Conductivity", null=True, blank=True)
+    nitrogen = models.FloatField(help_text="Nitrogen level", null=True, blank=True)
+    phosphorous = models.FloatField(help_text="Phosphorus level", null=True, blank=True)
+    potassium = models.FloatField(help_text="Potassium level", null=True, blank=True)
+    battery = models.FloatField(help_text="Battery percentage", null=True, blank=True)
+
+    anomalies = models.CharField(
+        max_length=255, blank=True, default='',
+        help_text="Comma separated metric:kind flags set by sensors.anomaly (blank when clean)",
+    )
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-timestamp']
+        verbose_name = "Sensor Reading"
+        verbose_name_plural = "Sensor Readings"
+        constraints = [
+            models.UniqueConstraint(fields=['device_id', 'timestamp'], name='unique_sensor_reading'),
+        ]
+
+    def __str__(self):
+        return f"{self.device_id} @ {self.timestamp.strftime('%Y-%m-%d %H:%M:%S')}"
+
+    @property
+    def flagged_metrics(self) -> set:
+        """Metrics whose value in this reading was flagged as anomalous."""
+        return {flag.split(':', 1)[0] for flag in self.anomalies.split(',') if flag}
+
+
+class SensorRollup(models.Model):
+    """
+    Pre-aggregated statistics of one metric for one sensor over a time bucket.
+
+    Maintained incrementally by sensors.rollups as readings are ingested, at
+    minute, hour and day resolution. The mean is derived from sum and count so
+    buckets can be merged without losing precision.
+    """
+    RESOLUTION_CHOICES = [
+        ('minute', 'Minute'),
+        ('hour', 'Hour'),
+        ('day', 'Day'),
+    ]
+
+    device_id = models.CharField(max_length=100)
+    metric = models.CharField(max_length=30)
+    resolution = models.CharField(max_length=10, choices=RESOLUTION_CHOICES)
+    bucket_start = models.DateTimeField(help_text="Start of the aggregation bucket")
+
+    min_value = models.FloatField()
+    max_value = models.FloatField()
+    sum_value = models.FloatField()
+    count = models.PositiveIntegerField()
+    last_value = models.FloatField()
+    last_timestamp = models.DateTimeField(help_text="Timestamp of the reading that set last_value")
+
+    class Meta:
+        ordering = ['bucket_start']
+        verbose_name = "Sensor Rollup"
+        verbose_name_plural = "Sensor Rollups"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['device_id', 'metric', 'resolution', 'bucket_start'],
+                name='unique_sensor_rollup',
+            ),
+        ]
+
+    @property
+    def mean_value(self) -> float:
+        return self.sum_value / self.count if self.count else 0.0
+
+    def __str__(self):
+        return f"{self.device_id} {self.metric} {self.resolution} @ {self.bucket_start.strftime('%Y-%m-%d %H:%M')}"
+
+
+class AlertRule(models.Model):
+    """
+    Threshold alert on one sensor metric, evaluated by sensors.alert_rules.
+
+    A rule with no device_id and no crop_type applies to every sensor. When
+    several rules share a metric and operator, the most specific one that
+    applies to a sensor wins (device over crop over global), so a device
+    can override the farm-wide threshold.
+    """
+    METRIC_CHOICES = [
+        ('temperature', 'Temperature'),
+        ('humidity', 'Humidity'),
+        ('soil_moisture', 'Soil moisture'),
+        ('soil_ph', 'Soil pH'),
+        ('ec', 'Electrical conductivity'),
+        ('nitrogen', 'Nitrogen'),
+        ('phosphorous', 'Phosphorous'),
+        ('potassium', 'Potassium'),
+        ('battery', 'Battery'),
+    ]
+    OPERATOR_CHOICES = [
+        ('gt', 'Above threshold'),
+        ('lt', 'Below threshold'),
+    ]
+
+    name = models.CharField(max_length=100)
+    device_id = models.CharField(max_length=100, blank=True, default='',
+                                 help_text="Only apply to this sensor (blank for every sensor)")
+    crop_type = models.CharField(max_length=50, blank=True, default='',
+                                 help_text="Only apply while this crop is grown (blank for every crop)")
+
+    metric = models.CharField(max_length=30, choices=METRIC_CHOICES)
+    operator = models.CharField(max_length=2, choices=OPERATOR_CHOICES)
+    threshold = models.FloatField()
+    hysteresis = models.FloatField(
+        default=0.0,
+        help_text="How far back past the threshold the value must move before an active alert clears",
+    )
+    message = models.CharField(
+        max_length=255,
+        help_text="Alert text; {value}, {threshold} and {device_id} are filled in",
+    )
+    enabled = models.BooleanField(default=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['id']
+        verbose_name = "Alert Rule"
+        verbose_name_plural = "Alert Rules"
+
+    def __str__(self):
+        scope = self.device_id or self.crop_type or 'all sensors'
+        return f"{self.name} ({self.metric} {self.operator} {self.threshold}, {scope})"
+
+
+class SensorDetectorState(models.Model):
+    """
+    Persisted state of one sensors.anomaly detector (one sensor, one metric).
+
+    Saved with each ingestion flush so detectors resume where they left off
+    after a worker restart instead of warming up again.
+    """
+    device_id = models.CharField(max_length=100)
+    metric = models.CharField(max_length=30)
+    # Using TextField to avoid DB-specific JSON dependencies; store JSON-serialized text
+    state = models.TextField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Sensor Detector State"
+        verbose_name_plural = "Sensor Detector States"
+        constraints = [
+            models.UniqueConstraint(fields=['device_id', 'metric'], name='unique_sensor_detector_state'),
+        ]
+
+    def __str__(self):
+        return f"{self.device_id} {self.metric}"
+
+
+class SensorImportCheckpoint(models.Model):
+    """
+    Progress of one import_sensor_history file.
+
+    Updated in the same transaction as each imported chunk, so after an
+    interruption the import resumes at the first record not yet committed.
+    """
+    source = models.CharField(max_length=500, unique=True, help_text="Absolute path of the imported file")
+    fingerprint = models.CharField(max_length=100, help_text="Size, mtime and content hash of the file")
+    records_done = models.PositiveBigIntegerField(default=0, help_text="Records read and committed")
+    rows_written = models.PositiveBigIntegerField(default=0, help_text="New SensorReading rows written")
+    records_skipped = models.PositiveBigIntegerField(default=0, help_text="Records without a usable timestamp or sensor id")
+    completed = models.BooleanField(default=False)
+
+    started_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Sensor Import Checkpoint"
+        verbose_name_plural = "Sensor Import Checkpoints"
+
+    def __str__(self):
+        state = 'done' if self.completed else f'{self.records_done} records'
+        return f"{self.source} ({state})"
@@ -0,0 +1,390 @@
+"""
+Normalization of raw sensor payloads.
+
+Firebase payloads spell the same field in several ways ("temprature",
+"Temperature", "temp", ...). Rather than probing every alias spelling for
+every reading, a ``KeyResolver`` is built once per distinct payload
+key-set: it keeps, for every canonical field, only the alias spellings
+that are actually present, and remembers which timestamp format the
+payloads use. Readings from the same device almost always share a
+key-set, so the lookup work is paid once per device instead of once per
+reading.
+
+``normalize_reading`` handles a single payload; ``normalize_batch``
+handles a list of payloads and evaluates the alert thresholds as NumPy
+vector comparisons.
+
+A field the payload lacks (or holds an empty or unparseable value for) is
+filled with its default so every reading has the same shape; its name is
+listed in the reading's ``missing_fields`` so consumers that need real
+measurements (sensors.anomaly) can tell the two apart.
+"""
+
+import logging
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Canonical field -> (alias spellings in lookup order, default value)
+# Note: the user's Firebase has the typos "temprature" and "Phosphorous"
+LABEL_ALIASES = ('label', 'name', 'sensor_name')
+DEFAULT_LABEL = 'NPK Sensor'
+
+NUMERIC_FIELDS = (
+    ('temperature', ('temprature', 'temperature', 'Temperature', 'temp', 'Temp'), 25.0),
+    ('humidity', ('humidity', 'Humidity', 'hum', 'Hum'), 60.0),
+    ('soil_moisture', ('Moisture', 'moisture', 'soil_moisture', 'soilMoisture'), 50.0),
+    ('soil_ph', ('PH', 'ph', 'pH', 'soil_ph', 'soilPh'), 6.5),
+    ('ec', ('EC', 'ec', 'electrical_conductivity'), 1.5),
+    ('nitrogen', ('Nitrogen', 'nitrogen', 'N'), 50.0),
+    ('phosphorous', ('Phosphorous', 'phosphorous', 'P'), 30.0),
+    ('potassium', ('Potassium', 'potassium', 'K'), 40.0),
+    ('battery', ('battery', 'battery_level', 'batteryLevel'), 85.0),
+)
+
+TIMESTAMP_KEYS = ('timestamp', 'time', 'updated_at')
+
+FIELD_NAMES = tuple(field for field, _, _ in NUMERIC_FIELDS)
+FIELD_INDEX = {field: index for index, field in enumerate(FIELD_NAMES)}
+
+# Alert thresholds
+TEMPERATURE_HIGH = 40
+TEMPERATURE_LOW = 10
+PH_LOW = 5
+PH_HIGH = 8
+MOISTURE_LOW = 30
+
+# Resolvers are cached per key-set; the cache is cleared when it
+# grows past this size so malformed payloads cannot grow it without bound
+MAX_RESOLVERS = 512
+
+# Bound on the cache of rounded values (see _round2)
+MAX_ROUNDED = 65536
+
+
+def safe_float(value, default: float) -> float:
+    """Convert a single value to float, returning default if conversion fails."""
+    if value is None:
+        return default
+    try:
+        if isinstance(value, str):
+            value = value.strip()
+            if value == '':
+                return default
+        return float(value)
+    except (ValueError, TypeError):
+        # Rate limited by the LOGGING config: one bad device can send this on every reading
+        logger.warning(
+            "Could not convert sensor value to float; using default",
+            extra={'value': repr(value), 'value_type': type(value).__name__, 'default': default},
+        )
+        return default
+
+
+def _to_float(value, default: float) -> float:
+    """Fast-path float conversion: exact float/int/str types skip the generic checks."""
+    value_type = type(value)
+    if value_type is float:
+        return value
+    if value_type is int or value_type is str:
+        # float() already ignores surrounding whitespace; only bad or empty
+        # strings need the slow path
+        try:
+            return float(value)
+        except ValueError:
+            pass
+    return safe_float(value, default)
+
+
+_rounded: Dict[float, float] = {}
+
+
+def _round2(value: float) -> float:
+    """
+    round(value, 2), cached.
+
+    Probes report a small set of quantized values over and over, and a
+    correctly rounded round() costs more than the rest of a reading's
+    normalization put together.
+    """
+    rounded = _rounded.get(value)
+    if rounded is None:
+        if len(_rounded) >= MAX_ROUNDED:
+            _rounded.clear()
+        rounded = _rounded[value] = round(value, 2)
+    return rounded
+
+
+def _parse_iso_utc(value: str) -> datetime:
+    """ISO string with a trailing 'Z' (which Python before 3.11 does not parse)."""
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+
+def _parse_iso_naive(value: str) -> datetime:
+    """ISO string whose timezone suffix does not parse: the suffix is dropped."""
+    return datetime.fromisoformat(value.replace('Z', '+00:00').split('+')[0].split('Z')[0])
+
+
+# ISO string formats, tried in this order
+ISO_PARSERS = (datetime.fromisoformat, _parse_iso_utc, _parse_iso_naive)
+
+
+def _detect_iso_parser(value: str) -> Optional[Callable]:
+    """The first ISO parser that accepts value (None if none does)."""
+    for parser in ISO_PARSERS:
+        try:
+            parser(value)
+        except ValueError:
+            continue
+        return parser
+    return None
+
+
+def _parse_iso(value: str) -> datetime:
+    """Parse an ISO string, dropping an unparseable timezone suffix if needed."""
+    parser = _detect_iso_parser(value)
+    return parser(value) if parser else datetime.now()
+
+
+def _parse_epoch(value) -> datetime:
+    try:
+        return datetime.fromtimestamp(float(value))
+    except (ValueError, TypeError, OSError):
+        return datetime.now()
+
+
+def _parse_datetime(value) -> datetime:
+    return value
+
+
+def _detect_timestamp_parser(value) -> Optional[Callable]:
+    """Pick the parser for a timestamp value's format (None if unsupported or unparseable)."""
+    if isinstance(value, str):
+        return _detect_iso_parser(value)
+    if isinstance(value, datetime):
+        return _parse_datetime
+    if isinstance(value, (int, float)):
+        return _parse_epoch
+    return None
+
+
+def parse_timestamp(value) -> datetime:
+    """Parse a Firebase timestamp (ISO string, unix seconds or datetime), defaulting to now."""
+    if not value:
+        return datetime.now()
+    parser = _detect_timestamp_parser(value)
+    return parser(value) if parser else datetime.now()
+
+
+class KeyResolver:
+    """
+    Alias resolution for one payload key-set.
+
+    ``lookups`` holds one (column, field, first key, fallback keys) tuple
+    per canonical field the key-set has an alias for, keeping only the
+    spellings that are present: resolving a reading is then one dictionary
+    access per present field, with no probing for spellings the payloads
+    never use. Fields with no alias in the key-set are defaults up front.
+    """
+
+    __slots__ = ('label_keys', 'lookups', 'defaults', 'absent', 'timestamp_keys', '_timestamp_format')
+
+    def __init__(self, keys):
+        present = set(keys)
+        self.label_keys = tuple(key for key in LABEL_ALIASES if key in present)
+        lookups, absent = [], []
+        for column, (field, aliases, _) in enumerate(NUMERIC_FIELDS):
+            found = [key for key in aliases if key in present]
+            if found:
+                lookups.append((column, field, found[0], tuple(found[1:])))
+            else:
+                absent.append(field)
+        self.lookups = tuple(lookups)
+        self.absent = absent
+        self.defaults = [float(default) for _, _, default in NUMERIC_FIELDS]
+        self.timestamp_keys = tuple(key for key in TIMESTAMP_KEYS if key in present)
+        # (value type, parser) of the format last detected, swapped as one tuple
+        self._timestamp_format = (None, None)
+
+    def values(self, raw_data: Dict) -> Tuple[List[float], List[str]]:
+        """
+        The reading's numeric values in NUMERIC_FIELDS order.
+
+        Returns:
+            (values, missing_fields): fields that are absent, empty or do not
+            parse get their default and are listed in missing_fields
+        """
+        values = self.defaults.copy()
+        missing = self.absent.copy()
+        for column, field, key, fallbacks in self.lookups:
+            value = raw_data[key]
+            if value is None:
+                for key in fallbacks:
+                    value = raw_data[key]
+                    if value is not None:
+                        break
+            if type(value) is not float:
+                if value is not None:
+                    value = _to_float(value, None)
+                if value is None:
+                    missing.append(field)
+                    continue
+            values[column] = value
+        return values, missing
+
+    def normalize(self, raw_data: Dict) -> Dict:
+        """Normalize one payload of this key-set (see normalize_reading)."""
+        values, missing = self.values(raw_data)
+        reading = {'label': self.label(raw_data)}
+        reading.update(zip(FIELD_NAMES, [_round2(value) for value in values]))
+        reading['timestamp'] = self.timestamp(raw_data).isoformat()
+        reading['alerts'] = reading_alerts(
+            values[FIELD_INDEX['temperature']], values[FIELD_INDEX['soil_ph']], values[FIELD_INDEX['soil_moisture']]
+        )
+        reading['missing_fields'] = missing
+        return reading
+
+    def label(self, raw_data: Dict):
+        for key in self.label_keys:
+            value = raw_data[key]
+            if value is not None:
+                return value
+        return DEFAULT_LABEL
+
+    def timestamp(self, raw_data: Dict) -> datetime:
+        """Parse the reading's timestamp with the format detected for this key-set."""
+        value = None
+        for key in self.timestamp_keys:
+            value = raw_data[key]
+            if value:
+                break
+        if not value:
+            return datetime.now()
+
+        # Payloads sharing a key-set share a timestamp format: the parser that
+        # worked last time is tried first, and the format is detected again
+        # only when the value type changes or the parser rejects the value
+        value_type, parser = self._timestamp_format
+        if type(value) is value_type and parser is not None:
+            try:
+                return parser(value)
+            except ValueError:
+                pass
+        parser = _detect_timestamp_parser(value)
+        # Dropping the timezone is a last resort for one value, not a format to
+        # assume: it would also accept, and strip, timezones that do parse
+        self._timestamp_format = (type(value), None if parser is _parse_iso_naive else parser)
+        if parser is None:
+            return datetime.now()
+        return parser(value)
+
+
+_resolvers: Dict[Tuple, KeyResolver] = {}
+
+
+def get_resolver(raw_data: Dict) -> KeyResolver:
+    """Return the resolver for raw_data's key-set, building it on first use."""
+    key_set = tuple(raw_data)
+    resolver = _resolvers.get(key_set)
+    if resolver is None:
+        if len(_resolvers) >= MAX_RESOLVERS:
+            _resolvers.clear()
+        resolver = _resolvers[key_set] = KeyResolver(key_set)
+    return resolver
+
+
+def reading_alerts(temperature: float, soil_ph: float, soil_moisture: float) -> List[str]:
+    """Evaluate the alert thresholds for a single reading."""
+    alerts = []
+    if temperature > TEMPERATURE_HIGH:
+        alerts.append(f"High temperature alert: {temperature}°C exceeds 40°C threshold")
+    elif temperature < TEMPERATURE_LOW:
+        alerts.append(f"Low temperature alert: {temperature}°C below 10°C threshold")
+
+    if soil_ph < PH_LOW:
+        alerts.append(f"Low pH alert: {soil_ph} below 5.0 threshold")
+    elif soil_ph > PH_HIGH:
+        alerts.append(f"High pH alert: {soil_ph} exceeds 8.0 threshold")
+
+    if soil_moisture < MOISTURE_LOW:
+        alerts.append(f"Low soil moisture alert: {soil_moisture}% below 30% threshold")
+    return alerts
+
+
+def build_alerts(values: np.ndarray) -> List[List[str]]:
+    """
+    Evaluate the alert thresholds for a whole batch of readings.
+
+    Args:
+        values: Float matrix with one row per reading, columns as NUMERIC_FIELDS
+
+    Returns:
+        List of alert message lists, one per reading
+    """
+    temperature = values[:, FIELD_INDEX['temperature']]
+    soil_ph = values[:, FIELD_INDEX['soil_ph']]
+    soil_moisture = values[:, FIELD_INDEX['soil_moisture']]
+
+    flagged = ((temperature > TEMPERATURE_HIGH) | (temperature < TEMPERATURE_LOW)
+               | (soil_ph < PH_LOW) | (soil_ph > PH_HIGH) | (soil_moisture < MOISTURE_LOW))
+
+    alerts = [[] for _ in range(len(values))]
+    # Only flagged rows pay for message formatting
+    for row in np.flatnonzero(flagged).tolist():
+        alerts[row] = reading_alerts(
+            float(temperature[row]), float(soil_ph[row]), float(soil_moisture[row])
+        )
+    return alerts
+
+
+def normalize_reading(raw_data: Optional[Dict]) -> Dict:
+    """
+    Normalize a single raw payload.
+
+    Args:
+        raw_data: Raw sensor dictionary from Firebase (may have missing fields)
+
+    Returns:
+        Normalized dictionary with all required sensor fields, plus the
+        ``missing_fields`` that were filled with their defaults
+    """
+    if not raw_data:
+        raw_data = {}
+    return get_resolver(raw_data).normalize(raw_data)
+
+
+def normalize_batch(raw_readings: List[Optional[Dict]],
+                    alerts: Callable[[np.ndarray], List[List[str]]] = build_alerts) -> List[Dict]:
+    """
+    Normalize a batch of raw sensor payloads in one pass.
+
+    Args:
+        raw_readings: Raw sensor dictionaries from Firebase (may have missing fields)
+        alerts: Evaluates the alerts for the batch's value matrix (default: the
+            built-in thresholds; see sensors.alert_rules for the configurable rules)
+
+    Returns:
+        Normalized dictionaries in the same order and format as normalize_reading
+    """
+    raw_readings = [raw if isinstance(raw, dict) else {} for raw in raw_readings]
+    if not raw_readings:
+        return []
+
+    resolvers = [get_resolver(raw) for raw in raw_readings]
+    resolved = [resolver.values(raw) for resolver, raw in zip(resolvers, raw_readings)]
+    values = np.array([row for row, _ in resolved], dtype=np.float64)
+    batch_alerts = alerts(values)
+    rounded = np.round(values, 2).tolist()
+
+    normalized = []
+    for resolver, raw, row, (_, missing), row_alerts in zip(resolvers, raw_readings, rounded, resolved, batch_alerts):
+        reading = {'label': resolver.label(raw)}
+        reading.update(zip(FIELD_NAMES, row))
+        reading['timestamp'] = resolver.timestamp(raw).isoformat()
+        reading['alerts'] = row_alerts
+        reading['missing_fields'] = missing
+        normalized.append(reading)
+    return normalized
@@ -0,0 +1,148 @@
+"""
+Fertilizer predictions from class probabilities.
+
+``rank`` runs the forest once per feature matrix (the compiled forest of
+sensors.forest when the bundle has one): ``predict_proba`` gives
+every fertilizer's probability and its argmax is the predicted class --
+which is what ``predict`` computes internally, so calling both would
+only traverse the forest twice. The FERTILIZER_TOP_K most probable
+fertilizers are kept: the first is the recommendation, the rest are
+stored as its alternatives.
+
+``predict_batch`` scores many readings chunk by chunk: one feature matrix
+(sensors.features), one ``rank`` and one ``bulk_create`` per chunk, all in
+a single transaction. Memory depends on the chunk size
+(FERTILIZER_BATCH_CHUNK_SIZE), not on the number of readings, apart from
+the short result rows returned to the caller.
+"""
+
+import json
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+
+from agriboost.metrics import stage_timer
+
+from .model_registry import ModelBundle
+from .models import FertilizerPrediction
+
+
+def batch_max_rows() -> int:
+    return getattr(settings, 'FERTILIZER_BATCH_MAX_ROWS', 10000)
+
+
+def batch_chunk_size() -> int:
+    return getattr(settings, 'FERTILIZER_BATCH_CHUNK_SIZE', 1000)
+
+
+def top_k() -> int:
+    return getattr(settings, 'FERTILIZER_TOP_K', 3)
+
+
+def rank(bundle: ModelBundle, matrix: np.ndarray, k: Optional[int] = None) -> List[List[Tuple[str, float]]]:
+    """
+    Most probable fertilizers for each row of a feature matrix.
+
+    Args:
+        bundle: Model bundle to predict with
+        matrix: Feature rows (sensors.features)
+        k: Fertilizers kept per row (default: FERTILIZER_TOP_K)
+
+    Returns:
+        Per row, up to k (fertilizer, probability) pairs, most probable first.
+        The first is the class ``model.predict`` returns (ties go to the lower
+        class, like argmax); later fertilizers with probability 0 are dropped.
+    """
+    k = k or top_k()
+    proba = bundle.predict_proba(matrix)
+    # Stable sort of the negated probabilities keeps argmax's tie-breaking
+    order = np.argsort(-proba, axis=1, kind='stable')[:, :k]
+    names = bundle.fertilizer_encoder.inverse_transform(bundle.model.classes_[order.ravel()]).reshape(order.shape)
+    probabilities = np.take_along_axis(proba, order, axis=1)
+    return [
+        [(name, probability) for position, (name, probability) in enumerate(zip(row_names, row_probabilities))
+         if position == 0 or probability > 0]
+        for row_names, row_probabilities in zip(names.tolist(), probabilities.tolist())
+    ]
+
+
+def ranking_json(ranked: Sequence[Tuple[str, float]]) -> List[Dict]:
+    """(fertilizer, probability) pairs as the JSON stored and returned."""
+    return [{'fertilizer': name, 'probability': probability} for name, probability in ranked]
+
+
+def alternatives_text(ranked: Sequence[Tuple[str, float]]) -> str:
+    """Value of FertilizerPrediction.alternatives: everything after the recommendation."""
+    return json.dumps(ranking_json(ranked[1:]))
+
+
+def recommendation_details(sensor_data: Mapping) -> str:
+    """Explanation stored with a prediction."""
+    return (
+        f"Predicted using ML model for {sensor_data.get('soil_type', 'Unknown')} "
+        f"soil and {sensor_data.get('crop_type', 'Sugarcane')} crop. "
+        f"Based on current sensor readings: Temperature={sensor_data['temperature']}°C, "
+        f"Moisture={sensor_data['moisture']}%, N={sensor_data['nitrogen']}, "
+        f"P={sensor_data['phosphorous']}, K={sensor_data['potassium']}."
+    )
+
+
+def predict_batch(bundle: ModelBundle, readings: Sequence[Mapping], user=None) -> List[Dict]:
+    """
+    Predict and save a fertilizer recommendation for every reading.
+
+    Args:
+        bundle: Model bundle to predict with
+        readings: Validated readings (temperature, humidity, moisture, nitrogen,
+            potassium, phosphorous, soil_type, crop_type)
+        user: Owner of the saved FertilizerPredictions
+
+    Returns:
+        One {'id', 'recommended_fertilizer', 'confidence_score', 'alternatives'}
+        per reading, in order
+
+    Raises:
+        ValueError: A reading the model cannot take (e.g. an unknown soil type);
+            nothing is saved
+    """
+    size = batch_chunk_size()
+    results = []
+    with transaction.atomic():
+        for start in range(0, len(readings), size):
+            chunk = readings[start:start + size]
+            with stage_timer('batch_feature_build'):
+                matrix = bundle.features.matrix(chunk, len(chunk))
+            with stage_timer('batch_model_predict'):
+                ranked = rank(bundle, matrix)
+
+            with stage_timer('batch_history_write'):
+                predictions = FertilizerPrediction.objects.bulk_create([
+                    FertilizerPrediction(
+                        user=user,
+                        temperature=sensor_data['temperature'],
+                        humidity=sensor_data.get('humidity'),
+                        moisture=sensor_data['moisture'],
+                        nitrogen=sensor_data['nitrogen'],
+                        phosphorous=sensor_data['phosphorous'],
+                        potassium=sensor_data['potassium'],
+                        soil_type=sensor_data.get('soil_type'),
+                        crop_type=sensor_data.get('crop_type'),
+                        recommended_fertilizer=ranking[0][0],
+                        confidence_score=ranking[0][1],
+                        recommendation_details=recommendation_details(sensor_data),
+                        alternatives=alternatives_text(ranking),
+                    )
+                    for sensor_data, ranking in zip(chunk, ranked)
+                ])
+            results.extend(
+                {
+                    'id': prediction.pk,
+                    'recommended_fertilizer': prediction.recommended_fertilizer,
+                    'confidence_score': prediction.confidence_score,
+                    'alternatives': ranking_json(ranking[1:]),
+                }
+                for prediction, ranking in zip(predictions, ranked)
+            )
+    return results
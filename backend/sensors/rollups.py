@@ -0,0 +1,201 @@
+"""
+Incrementally maintained minute/hour/day rollups of sensor metrics.
+
+Every batch of newly ingested SensorReading rows is folded into
+SensorRollup buckets: the batch is aggregated in memory first, then
+merged into the stored buckets with one additive upsert per bucket
+(INSERT ... ON CONFLICT DO UPDATE, run as a single executemany). Trend queries can then read a handful of
+pre-aggregated rows instead of scanning raw readings. Values flagged by
+the anomaly detectors are left out.
+"""
+
+from datetime import datetime
+from typing import Dict, Iterable, List, Tuple
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import SensorReading, SensorRollup
+
+# Metrics rolled up (SensorReading field names)
+ROLLUP_METRICS = (
+    'temperature', 'soil_moisture', 'soil_ph', 'ec', 'nitrogen', 'phosphorous', 'potassium',
+)
+
+RESOLUTIONS = ('minute', 'hour', 'day')
+
+# Columns written by the upsert: the unique key, then the aggregate in Aggregate order
+UPSERT_COLUMNS = (
+    'device_id', 'metric', 'resolution', 'bucket_start',
+    'min_value', 'max_value', 'sum_value', 'count', 'last_value', 'last_timestamp',
+)
+
+# [min, max, sum, count, last_value, last_timestamp]
+Aggregate = List
+AggregateKey = Tuple[str, str, str, datetime]
+
+
+class SensorRollups:
+    """Build and merge SensorRollup buckets."""
+
+    @staticmethod
+    def bucket_start(timestamp: datetime, resolution: str) -> datetime:
+        """
+        Truncate timestamp to the start of its bucket.
+
+        Buckets follow the project TIME_ZONE so day rollups match local days.
+        """
+        local = timezone.localtime(timestamp) if timezone.is_aware(timestamp) else timestamp
+        if resolution == 'minute':
+            local = local.replace(second=0, microsecond=0)
+        elif resolution == 'hour':
+            local = local.replace(minute=0, second=0, microsecond=0)
+        elif resolution == 'day':
+            local = local.replace(hour=0, minute=0, second=0, microsecond=0)
+        else:
+            raise ValueError(f"Unknown rollup resolution: {resolution}")
+        return local
+
+    @classmethod
+    def aggregate(cls, readings: Iterable[SensorReading]) -> Dict[AggregateKey, Aggregate]:
+        """
+        Aggregate readings in memory, keyed by (device_id, metric, resolution, bucket_start).
+        """
+        aggregates: Dict[AggregateKey, Aggregate] = {}
+        bucket_cache: Dict[Tuple[datetime, str], datetime] = {}
+
+        for reading in readings:
+            timestamp = reading.timestamp
+            buckets = []
+            for resolution in RESOLUTIONS:
+                cache_key = (timestamp, resolution)
+                bucket = bucket_cache.get(cache_key)
+                if bucket is None:
+                    bucket = bucket_cache[cache_key] = cls.bucket_start(timestamp, resolution)
+                buckets.append((resolution, bucket))
+
+            flagged = reading.flagged_metrics
+            for metric in ROLLUP_METRICS:
+                value = getattr(reading, metric)
+                if value is None or metric in flagged:
+                    continue
+                for resolution, bucket in buckets:
+                    key = (reading.device_id, metric, resolution, bucket)
+                    current = aggregates.get(key)
+                    if current is None:
+                        aggregates[key] = [value, value, value, 1, value, timestamp]
+                        continue
+                    if value < current[0]:
+                        current[0] = value
+                    if value > current[1]:
+                        current[1] = value
+                    current[2] += value
+                    current[3] += 1
+                    if timestamp >= current[5]:
+                        current[4] = value
+                        current[5] = timestamp
+        return aggregates
+
+    @classmethod
+    def apply(cls, readings: Iterable[SensorReading]) -> int:
+        """
+        Fold newly ingested readings into the rollup tables.
+
+        Readings must not have been applied before (the ingestion pipeline
+        only passes rows it inserted). Each bucket is merged with a single
+        INSERT ... ON CONFLICT DO UPDATE whose SET clauses add to the stored
+        values, so concurrent writers never overwrite each other's counts or
+        fail on unique_sensor_rollup when both create the same bucket.
+
+        Returns:
+            Number of rollup buckets created or updated
+
+        Raises:
+            NotImplementedError: The database has no ON CONFLICT ... DO UPDATE
+        """
+        aggregates = cls.aggregate(readings)
+        if not aggregates:
+            return 0
+        if not connection.features.supports_update_conflicts_with_target:
+            raise NotImplementedError(f"Sensor rollups need ON CONFLICT upserts, which {connection.vendor} lacks")
+
+        fields = {name: SensorRollup._meta.get_field(name) for name in UPSERT_COLUMNS}
+        params = [
+            [fields[name].get_db_prep_value(value, connection)
+             for name, value in zip(UPSERT_COLUMNS, (*key, *aggregate))]
+            for key, aggregate in aggregates.items()
+        ]
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.executemany(cls._upsert_sql(), params)
+        return len(params)
+
+    @staticmethod
+    def _upsert_sql() -> str:
+        quote = connection.ops.quote_name
+        table = quote(SensorRollup._meta.db_table)
+        stored = {name: f"{table}.{quote(name)}" for name in UPSERT_COLUMNS}
+        new = {name: f"excluded.{quote(name)}" for name in UPSERT_COLUMNS}
+        newer = f"{new['last_timestamp']} >= {stored['last_timestamp']}"
+        updates = {
+            'min_value': f"CASE WHEN {new['min_value']} < {stored['min_value']} "
+                         f"THEN {new['min_value']} ELSE {stored['min_value']} END",
+            'max_value': f"CASE WHEN {new['max_value']} > {stored['max_value']} "
+                         f"THEN {new['max_value']} ELSE {stored['max_value']} END",
+            'sum_value': f"{stored['sum_value']} + {new['sum_value']}",
+            'count': f"{stored['count']} + {new['count']}",
+            'last_value': f"CASE WHEN {newer} THEN {new['last_value']} ELSE {stored['last_value']} END",
+            'last_timestamp': f"CASE WHEN {newer} THEN {new['last_timestamp']} ELSE {stored['last_timestamp']} END",
+        }
+        return (
+            f"INSERT INTO {table} ({', '.join(quote(name) for name in UPSERT_COLUMNS)}) "
+            f"VALUES ({', '.join(['%s'] * len(UPSERT_COLUMNS))}) "
+            f"ON CONFLICT ({', '.join(quote(name) for name in UPSERT_COLUMNS[:4])}) DO UPDATE SET "
+            + ', '.join(f"{quote(name)} = {expression}" for name, expression in updates.items())
+        )
+
+    @classmethod
+    def rebuild(cls, chunk_size: int = 5000, progress=None) -> int:
+        """
+        Drop every rollup and rebuild them from the SensorReading table.
+
+        Readings are streamed in timestamp order and applied chunk by chunk, so
+        memory use is bounded by chunk_size. Everything runs in one
+        transaction: an interrupted rebuild leaves the old rollups in place,
+        and readings cannot be ingested halfway through and counted twice
+        (on SQLite the transaction holds the write lock; on PostgreSQL the
+        reading table is locked against writes). Ingestion flushes blocked
+        meanwhile fail and are retried with their readings kept.
+
+        Args:
+            chunk_size: Number of readings aggregated per write
+            progress: Optional callable receiving the number of readings applied so far
+
+        Returns:
+            Number of readings processed
+        """
+        with transaction.atomic():
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute(f"LOCK TABLE {connection.ops.quote_name(SensorReading._meta.db_table)} "
+                                   f"IN SHARE MODE")
+            SensorRollup.objects.all().delete()
+
+            processed = 0
+            chunk: List[SensorReading] = []
+            queryset = SensorReading.objects.order_by('timestamp').only(
+                'device_id', 'timestamp', 'anomalies', *ROLLUP_METRICS
+            )
+            for reading in queryset.iterator(chunk_size=chunk_size):
+                chunk.append(reading)
+                if len(chunk) >= chunk_size:
+                    cls.apply(chunk)
+                    processed += len(chunk)
+                    chunk = []
+                    if progress:
+                        progress(processed)
+            if chunk:
+                cls.apply(chunk)
+                processed += len(chunk)
+                if progress:
+                    progress(processed)
+        return processed
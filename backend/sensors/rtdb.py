@@ -0,0 +1,378 @@
+"""
+Pluggable Realtime Database backends for FirebaseService.
+
+FirebaseService and SensorStream only use three RTDB operations: a
+(optionally shallow) ``get`` of a path and a streaming ``listen`` on a
+path. The backends here implement those operations, plus ``aget``, the
+coroutine version of ``get`` used by the async views:
+
+- ``FirebaseBackend``: the real database through firebase_admin.
+- ``LocalBackend``: an in-process tree loaded from a fixture file or
+  generated synthetically, with configurable latency and failure
+  injection. It needs no credentials or network, so the feed, prediction
+  and ingestion paths can be load-tested reproducibly on a laptop or in CI.
+- ``RecordingBackend``: wraps another backend and saves every payload it
+  reads into a fixture file that LocalBackend can replay.
+
+The backend is chosen with the FIREBASE_BACKEND setting
+('firebase', 'local' or 'record').
+"""
+
+import asyncio
+import copy
+import json
+import logging
+import os
+import queue
+import random
+import tempfile
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from .rtdb_async import AsyncRTDBClient, LoopClients
+
+logger = logging.getLogger(__name__)
+
+try:
+    from firebase_admin import db
+except ImportError:
+    db = None
+
+
+class RTDBUnavailable(ConnectionError):
+    """Raised by LocalBackend to simulate a failed RTDB request."""
+
+
+class Event:
+    """Streaming event with the attributes of firebase_admin.db.Event."""
+
+    __slots__ = ('event_type', 'path', 'data')
+
+    def __init__(self, event_type: str, path: str, data):
+        self.event_type = event_type
+        self.path = path
+        self.data = data
+
+
+def split_path(path: str) -> List[str]:
+    return [segment for segment in path.split('/') if segment]
+
+
+class RTDBBackend:
+    """Interface used by FirebaseService and SensorStream."""
+
+    name = 'base'
+
+    def get(self, path: str, shallow: bool = False) -> Any:
+        """Return the value at path (children replaced by True when shallow)."""
+        raise NotImplementedError
+
+    async def aget(self, path: str, shallow: bool = False) -> Any:
+        """Coroutine version of get (runs get in a worker thread unless overridden)."""
+        return await asyncio.to_thread(self.get, path, shallow)
+
+    def listen(self, path: str, callback: Callable[[Event], None]):
+        """
+        Stream changes under path to callback.
+
+        The first event is a 'put' of the whole node at '/'. Returns a
+        registration object with a ``close()`` method.
+        """
+        raise NotImplementedError
+
+
+class FirebaseBackend(RTDBBackend):
+    """
+    The real Realtime Database (firebase_admin must be initialized).
+
+    ``get`` and ``listen`` go through the SDK; ``aget`` uses the pooled
+    REST client in sensors.rtdb_async.
+    """
+
+    name = 'firebase'
+
+    def __init__(self):
+        self._async_clients = LoopClients(AsyncRTDBClient.from_app)
+
+    async def aget(self, path: str, shallow: bool = False) -> Any:
+        return await self._async_clients.for_loop().get(path, shallow=shallow)
+
+    def get(self, path: str, shallow: bool = False) -> Any:
+        if shallow:
+            return db.reference(path).get(shallow=True)
+        return db.reference(path).get()
+
+    def listen(self, path: str, callback: Callable[[Event], None]):
+        return db.reference(path).listen(callback)
+
+
+class _LocalListener:
+    """Delivers LocalBackend events on a background thread, like the SDK does."""
+
+    def __init__(self, callback: Callable[[Event], None]):
+        self._callback = callback
+        self._events: queue.Queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='local-rtdb-listener', daemon=True)
+        self._thread.start()
+
+    def push(self, event: Event):
+        self._events.put(event)
+
+    def _run(self):
+        while True:
+            event = self._events.get()
+            if event is None:
+                return
+            try:
+                self._callback(event)
+            except Exception:
+                logger.exception("Local RTDB listener callback failed")
+
+    def close(self):
+        self._events.put(None)
+        self._thread.join(timeout=5.0)
+
+
+class LocalBackend(RTDBBackend):
+    """
+    In-process RTDB stand-in.
+
+    Args:
+        tree: Initial database contents (root node)
+        latency: Seconds added to every get
+        jitter: Extra random latency, uniform in [0, jitter] seconds
+        failure_rate: Probability in [0, 1] that a get raises RTDBUnavailable
+        seed: Seed for the latency/failure random generator, for reproducible runs
+    """
+
+    name = 'local'
+
+    def __init__(self, tree: Optional[Dict] = None, latency: float = 0.0, jitter: float = 0.0,
+                 failure_rate: float = 0.0, seed: Optional[int] = None):
+        self.tree = tree if tree is not None else {}
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._listeners: List[tuple] = []
+        self.get_count = 0
+
+    @classmethod
+    def from_fixture(cls, fixture_path: str, **options) -> 'LocalBackend':
+        """Load the database contents from a JSON fixture (see RecordingBackend)."""
+        with open(fixture_path, 'r') as f:
+            return cls(json.load(f), **options)
+
+    @classmethod
+    def synthetic(cls, sensors_path: str, devices: int = 3, seed: Optional[int] = None,
+                  **options) -> 'LocalBackend':
+        """Build a backend holding generated readings for devices sensors under sensors_path."""
+        generator = random.Random(seed)
+        readings = {f"sensor_{index + 1}": synthetic_reading(generator) for index in range(devices)}
+        backend = cls({}, seed=seed, **options)
+        backend.tree = backend._set_in(backend.tree, split_path(sensors_path), readings)
+        return backend
+
+    def _draw(self):
+        """Pick one request's (delay, fail) from the configured latency and failure rate."""
+        with self._lock:
+            self.get_count += 1
+            delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0.0)
+            fail = self.failure_rate and self._random.random() < self.failure_rate
+        return delay, fail
+
+    def _inject(self):
+        """Apply the configured latency and failures to one request."""
+        delay, fail = self._draw()
+        if delay:
+            time.sleep(delay)
+        if fail:
+            raise RTDBUnavailable("Injected RTDB failure")
+
+    @staticmethod
+    def _lookup(tree, segments: List[str]):
+        node = tree
+        for segment in segments:
+            if not isinstance(node, dict) or segment not in node:
+                return None
+            node = node[segment]
+        return node
+
+    @classmethod
+    def _set_in(cls, tree, segments: List[str], value):
+        if not segments:
+            return value
+        tree = dict(tree) if isinstance(tree, dict) else {}
+        child = cls._set_in(tree.get(segments[0]), segments[1:], value)
+        if child is None:
+            tree.pop(segments[0], None)
+        else:
+            tree[segments[0]] = child
+        return tree
+
+    def get(self, path: str, shallow: bool = False) -> Any:
+        self._inject()
+        return self._read(path, shallow)
+
+    async def aget(self, path: str, shallow: bool = False) -> Any:
+        # Latency is awaited, so concurrent requests overlap as they would over HTTP
+        delay, fail = self._draw()
+        if delay:
+            await asyncio.sleep(delay)
+        if fail:
+            raise RTDBUnavailable("Injected RTDB failure")
+        return self._read(path, shallow)
+
+    def _read(self, path: str, shallow: bool) -> Any:
+        with self._lock:
+            node = self._lookup(self.tree, split_path(path))
+            if shallow and isinstance(node, dict):
+                return {key: True if isinstance(value, dict) else value for key, value in node.items()}
+            return copy.deepcopy(node)
+
+    def set(self, path: str, value):
+        """Write value at path (None deletes it) and notify listeners above it."""
+        segments = split_path(path)
+        with self._lock:
+            self.tree = self._set_in(self.tree, segments, copy.deepcopy(value))
+            listeners = list(self._listeners)
+        for listen_segments, listener in listeners:
+            if segments[:len(listen_segments)] == listen_segments:
+                relative = '/' + '/'.join(segments[len(listen_segments):])
+                listener.push(Event('put', relative, copy.deepcopy(value)))
+
+    def listen(self, path: str, callback: Callable[[Event], None]):
+        listener = _LocalListener(callback)
+        segments = split_path(path)
+        with self._lock:
+            listener.push(Event('put', '/', copy.deepcopy(self._lookup(self.tree, segments))))
+            self._listeners.append((segments, listener))
+        return _LocalRegistration(self, listener)
+
+    def _remove_listener(self, listener: _LocalListener):
+        with self._lock:
+            self._listeners = [entry for entry in self._listeners if entry[1] is not listener]
+
+    def tick(self, sensors_path: str):
+        """Move every sensor under sensors_path one random step, as a device update would."""
+        with self._lock:
+            node = self._lookup(self.tree, split_path(sensors_path))
+            device_ids = list(node) if isinstance(node, dict) else []
+            current = {device_id: node[device_id] for device_id in device_ids if isinstance(node[device_id], dict)}
+            updates = {device_id: synthetic_reading(self._random, previous) for device_id, previous in current.items()}
+        for device_id, reading in updates.items():
+            self.set(f"{sensors_path.rstrip('/')}/{device_id}", reading)
+
+
+class _LocalRegistration:
+    def __init__(self, backend: LocalBackend, listener: _LocalListener):
+        self._backend = backend
+        self._listener = listener
+
+    def close(self):
+        self._backend._remove_listener(self._listener)
+        self._listener.close()
+
+
+class RecordingBackend(RTDBBackend):
+    """
+    Pass-through backend that records every full (non-shallow) read.
+
+    The recorded values are merged into one database tree and written to
+    fixture_path after each read, in the format LocalBackend.from_fixture loads.
+    """
+
+    name = 'record'
+
+    def __init__(self, inner: RTDBBackend, fixture_path: str):
+        self.inner = inner
+        self.fixture_path = fixture_path
+        self._lock = threading.Lock()
+        self.tree: Dict = {}
+        if os.path.exists(fixture_path):
+            with open(fixture_path, 'r') as f:
+                self.tree = json.load(f)
+
+    def get(self, path: str, shallow: bool = False) -> Any:
+        value = self.inner.get(path, shallow=shallow)
+        if not shallow:
+            self._record(path, value)
+        return value
+
+    async def aget(self, path: str, shallow: bool = False) -> Any:
+        value = await self.inner.aget(path, shallow=shallow)
+        if not shallow:
+            self._record(path, value)
+        return value
+
+    def _record(self, path: str, value):
+        with self._lock:
+            self.tree = LocalBackend._set_in(self.tree, split_path(path), copy.deepcopy(value))
+            self._save()
+
+    def listen(self, path: str, callback: Callable[[Event], None]):
+        return self.inner.listen(path, callback)
+
+    def _save(self):
+        """Write the fixture atomically so a crash never leaves a truncated file."""
+        directory = os.path.dirname(os.path.abspath(self.fixture_path))
+        os.makedirs(directory, exist_ok=True)
+        handle, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(handle, 'w') as f:
+            json.dump(self.tree, f, indent=2, default=str)
+        os.replace(temp_path, self.fixture_path)
+
+
+def synthetic_reading(generator: random.Random, previous: Optional[Dict] = None) -> Dict:
+    """
+    One sensor payload in the field spellings the real devices use.
+
+    With previous, every value takes a small random step from it instead.
+    """
+    def value(key, low, high, step):
+        if previous is not None and isinstance(previous.get(key), (int, float)):
+            return round(min(high, max(low, previous[key] + generator.uniform(-step, step))), 2)
+        return round(generator.uniform(low, high), 2)
+
+    return {
+        'label': (previous or {}).get('label', 'NPK Sensor'),
+        'temprature': value('temprature', 15.0, 42.0, 0.5),
+        'Humidity': value('Humidity', 30.0, 90.0, 1.0),
+        'Moisture': value('Moisture', 20.0, 80.0, 1.0),
+        'PH': value('PH', 4.5, 8.5, 0.05),
+        'EC': value('EC', 0.5, 3.0, 0.05),
+        'Nitrogen': value('Nitrogen', 10.0, 120.0, 2.0),
+        'Phosphorous': value('Phosphorous', 5.0, 80.0, 2.0),
+        'Potassium': value('Potassium', 10.0, 120.0, 2.0),
+        'timestamp': datetime.now().isoformat(),
+    }
+
+
+def backend_from_settings(settings) -> Optional[RTDBBackend]:
+    """
+    Build the LocalBackend configured in settings, or None for the real database.
+
+    RecordingBackend needs an initialized firebase_admin app, so FirebaseService
+    wraps its FirebaseBackend itself when FIREBASE_BACKEND is 'record'.
+    """
+    if getattr(settings, 'FIREBASE_BACKEND', 'firebase') != 'local':
+        return None
+
+    options = {
+        'latency': getattr(settings, 'FIREBASE_LOCAL_LATENCY_MS', 0) / 1000.0,
+        'jitter': getattr(settings, 'FIREBASE_LOCAL_JITTER_MS', 0) / 1000.0,
+        'failure_rate': getattr(settings, 'FIREBASE_LOCAL_FAILURE_RATE', 0.0),
+        'seed': getattr(settings, 'FIREBASE_LOCAL_SEED', None),
+    }
+    fixture_path = getattr(settings, 'FIREBASE_FIXTURE_PATH', None)
+    if fixture_path and os.path.exists(fixture_path):
+        logger.info("Using local RTDB fixture %s", fixture_path)
+        return LocalBackend.from_fixture(fixture_path, **options)
+
+    sensors_path = getattr(settings, 'FIREBASE_SENSORS_PATH', '/sensors')
+    devices = getattr(settings, 'FIREBASE_LOCAL_DEVICES', 3)
+    logger.info("Using synthetic local RTDB with %s sensors", devices)
+    return LocalBackend.synthetic(sensors_path, devices=devices, **options)
@@ -0,0 +1,167 @@
+"""
+Async client for the Realtime Database REST API.
+
+``firebase_admin.db`` is synchronous, so every fetch holds a worker thread
+until RTDB answers. ``AsyncRTDBClient`` makes the same reads over the REST
+API with httpx instead: the async feed view (served through
+agriboost.asgi) can then have many fetches in flight on one event loop.
+
+- Connections are pooled and kept alive between requests, bounded by
+  FIREBASE_ASYNC_MAX_CONNECTIONS.
+- Requests carry an OAuth2 access token for the firebase_admin app's
+  service account. The token is refreshed shortly before it expires (and
+  once more if RTDB rejects it), by one coroutine while the others wait.
+
+An httpx.AsyncClient's connections belong to the event loop that opened
+them, so FirebaseBackend keeps one client per loop (see ``for_loop``).
+Pooling only pays off on a long-lived loop such as the ASGI server's; a
+client made on a one-off loop is closed when that loop shuts down.
+"""
+
+import asyncio
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+import httpx
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+try:
+    import firebase_admin
+    from google.auth.transport.requests import Request as GoogleAuthRequest
+except ImportError:
+    firebase_admin = None
+
+# Scopes RTDB REST requests need (the same ones firebase_admin.db asks for)
+SCOPES = (
+    'https://www.googleapis.com/auth/firebase.database',
+    'https://www.googleapis.com/auth/userinfo.email',
+)
+
+
+class AsyncRTDBClient:
+    """
+    Pooled async HTTP client for RTDB reads.
+
+    Args:
+        database_url: Database root, e.g. https://<project>-default-rtdb.firebaseio.com
+        credential: google.auth credentials to sign requests with (None sends none)
+        timeout: Seconds to wait for a response
+        max_connections: Upper bound on open connections
+        max_keepalive: Idle connections kept open for reuse
+        transport: httpx transport override (tests)
+    """
+
+    def __init__(self, database_url: str, credential=None, timeout: float = 5.0,
+                 max_connections: int = 100, max_keepalive: int = 20,
+                 transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.database_url = database_url.rstrip('/')
+        self._credential = credential
+        self._token_lock = asyncio.Lock()
+        self._client = httpx.AsyncClient(
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive,
+                keepalive_expiry=60.0,
+            ),
+            transport=transport,
+        )
+
+    @classmethod
+    def from_app(cls) -> 'AsyncRTDBClient':
+        """Build a client for the default firebase_admin app (which must be initialized)."""
+        app = firebase_admin.get_app()
+        credential = app.credential.get_credential()
+        if hasattr(credential, 'with_scopes'):
+            # A copy of our own: refreshing it never races the SDK's threads
+            credential = credential.with_scopes(list(SCOPES))
+        return cls(
+            app.options.get('databaseURL'),
+            credential=credential,
+            timeout=getattr(settings, 'FIREBASE_HTTP_TIMEOUT_SECONDS', 5),
+            max_connections=getattr(settings, 'FIREBASE_ASYNC_MAX_CONNECTIONS', 100),
+            max_keepalive=getattr(settings, 'FIREBASE_ASYNC_MAX_KEEPALIVE', 20),
+        )
+
+    async def _token(self, force_refresh: bool = False) -> Optional[str]:
+        """Current access token, refreshing it first if it is about to expire."""
+        credential = self._credential
+        if credential is None:
+            return None
+        if credential.valid and not force_refresh:
+            return credential.token
+        stale = credential.token
+        async with self._token_lock:
+            # Someone else may have refreshed while we waited for the lock
+            if not credential.valid or (force_refresh and credential.token == stale):
+                # google-auth refreshes synchronously; it happens about once an hour
+                await asyncio.to_thread(credential.refresh, GoogleAuthRequest())
+                logger.debug("Refreshed RTDB access token")
+        return credential.token
+
+    async def get(self, path: str, shallow: bool = False) -> Any:
+        """
+        Read the value at path (children replaced by True when shallow).
+
+        Raises:
+            httpx.HTTPError: On network errors, timeouts and non-2xx responses
+        """
+        url = f"{self.database_url}/{path.strip('/')}.json"
+        params = {'shallow': 'true'} if shallow else None
+        response = await self._request(url, params, await self._token())
+        if response.status_code == 401 and self._credential is not None:
+            # Token revoked or expired early: refresh once and retry
+            response = await self._request(url, params, await self._token(force_refresh=True))
+        response.raise_for_status()
+        return response.json()
+
+    async def _request(self, url: str, params: Optional[Dict], token: Optional[str]) -> httpx.Response:
+        headers = {'Authorization': f'Bearer {token}'} if token else None
+        return await self._client.get(url, params=params, headers=headers)
+
+    async def aclose(self):
+        await self._client.aclose()
+
+
+class LoopClients:
+    """
+    One AsyncRTDBClient per event loop, created on first use on that loop.
+
+    Each client is closed by a task that waits on its loop until it is
+    cancelled: ``asyncio.run`` (and so a one-off ``async_to_sync`` loop)
+    cancels leftover tasks before closing the loop, so the connections are
+    closed while their loop still runs.
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._lock = threading.Lock()
+        self._clients: Dict[asyncio.AbstractEventLoop, AsyncRTDBClient] = {}
+
+    def for_loop(self) -> AsyncRTDBClient:
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            with self._lock:
+                # Loops closed without cancelling their tasks: nothing can be awaited there any more
+                self._clients = {key: value for key, value in self._clients.items() if not key.is_closed()}
+                client = self._clients.get(loop)
+                if client is None:
+                    client = self._clients[loop] = self._factory()
+                    loop.create_task(self._close_with_loop(loop, client))
+        return client
+
+    async def _close_with_loop(self, loop: asyncio.AbstractEventLoop, client: AsyncRTDBClient):
+        try:
+            await loop.create_future()
+        finally:
+            with self._lock:
+                if self._clients.get(loop) is client:
+                    del self._clients[loop]
+            await client.aclose()
+
+    def __len__(self) -> int:
+        return len(self._clients)
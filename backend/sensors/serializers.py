@@ -25,6 +25,7 @@ class FertilizerPredictionSerializer(serializers.ModelSerializer):
             'fertilizer_amount',
             'confidence_score',
             'recommendation_details',
+            'alternatives',
             'created_at',
             'updated_at'
         ]
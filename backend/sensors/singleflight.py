@@ -0,0 +1,119 @@
+"""
+Single-flight request coalescing.
+
+Under a threaded server several requests often ask for the same Firebase
+node at the same moment. ``SingleFlight.do`` lets the first caller for a
+key run the fetch while every concurrent caller for that key waits for
+and shares its result (or exception), so a burst of N requests costs one
+upstream call instead of N.
+
+``AsyncSingleFlight`` does the same for coroutines on an event loop.
+"""
+
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+
+class _Call:
+    """An in-flight call and its outcome."""
+
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Deduplicate concurrent calls that share a key."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """
+        Run fn once for all concurrent callers with the same key.
+
+        Args:
+            key: Identifies the work (e.g. the database path being fetched)
+            fn: Zero-argument callable doing the work
+
+        Returns:
+            fn's result; callers that joined an in-flight call share it.
+            If fn raises, every caller waiting on it gets the exception.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            # Forget the call before releasing waiters so later callers
+            # start a fresh fetch instead of reading this result forever
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+        return call.result
+
+    def in_flight(self) -> int:
+        """Number of keys currently being fetched."""
+        with self._lock:
+            return len(self._calls)
+
+
+class AsyncSingleFlight:
+    """
+    Deduplicate concurrent awaits that share a key.
+
+    The work runs as a task of its own, so a caller that is cancelled (e.g.
+    its client disconnected) does not cancel it for the others. Calls are
+    tracked per event loop, since a task can only be awaited on its own loop.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Tuple[asyncio.AbstractEventLoop, Hashable], asyncio.Task] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Await fn() once for all concurrent callers with the same key.
+
+        Args:
+            key: Identifies the work (e.g. the database path being fetched)
+            fn: Zero-argument coroutine function doing the work
+
+        Returns:
+            fn's result, shared by every caller that joined the call. If fn
+            raises, every caller gets the exception.
+        """
+        call_key = (asyncio.get_running_loop(), key)
+        task = self._calls.get(call_key)
+        if task is None:
+            task = self._calls[call_key] = asyncio.ensure_future(fn())
+            task.add_done_callback(lambda done: self._finished(call_key, done))
+        return await asyncio.shield(task)
+
+    def _finished(self, call_key, task: asyncio.Task):
+        if self._calls.get(call_key) is task:
+            del self._calls[call_key]
+        if not task.cancelled():
+            # Mark the exception as retrieved even if every caller went away
+            task.exception()
+
+    def in_flight(self) -> int:
+        """Number of keys currently being fetched, across event loops."""
+        return len(self._calls)
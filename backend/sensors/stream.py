@@ -0,0 +1,228 @@
+"""
+Push-based sensor snapshot built on the Firebase RTDB streaming API.
+
+Instead of fetching the sensors node on every feed request, a single
+background listener (``Reference.listen``) mirrors the node in process
+memory and keeps the latest normalized reading for every sensor. Feed
+requests read that snapshot without doing any I/O.
+
+The listener is started lazily by the first feed request so management
+commands never open a streaming connection.
+
+Normalizing an event's readings can touch the database (alert rules,
+anomaly detector state), so it runs outside the lock that guards the
+mirror; only the tree update and the snapshot swap hold it.
+"""
+
+import atexit
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+from .firebase_service import FirebaseService
+from .ingestion import SensorIngestion
+from .live import LiveFeedHub
+
+logger = logging.getLogger(__name__)
+
+
+class SensorStream:
+    """In-memory mirror of the sensors node, kept current by an RTDB listener."""
+
+    _lock = threading.Lock()
+    # Serializes events, so one event's snapshot swap never overwrites a later one's
+    _apply_lock = threading.Lock()
+    _registration = None
+    _started = False
+
+    # Raw mirror of the sensors node and the normalized reading per device
+    _tree = None
+    _snapshot: Dict[str, Dict] = {}
+
+    # Wall-clock and monotonic time of the last event received
+    _last_event_at: Optional[datetime] = None
+    _last_event_monotonic: Optional[float] = None
+
+    @classmethod
+    def is_enabled(cls) -> bool:
+        """Check whether streaming is enabled in settings."""
+        return getattr(settings, 'FIREBASE_STREAM_ENABLED', True)
+
+    @classmethod
+    def ensure_started(cls) -> bool:
+        """
+        Start the background listener if it is not running yet.
+
+        Returns:
+            True if a listener is running, False if streaming is unavailable
+        """
+        if cls._started:
+            return True
+        if not cls.is_enabled() or not FirebaseService.is_connected():
+            return False
+
+        with cls._lock:
+            if cls._started:
+                return True
+            try:
+                sensors_path = getattr(settings, 'FIREBASE_SENSORS_PATH', '/sensors')
+                cls._registration = FirebaseService.backend().listen(sensors_path, cls._on_event)
+                cls._started = True
+                logger.info("Stream listener started on %s", sensors_path)
+            except Exception as e:
+                logger.warning("Could not start stream listener: %s", e)
+                cls._registration = None
+                return False
+        return True
+
+    @classmethod
+    async def aensure_started(cls) -> bool:
+        """Coroutine version of ensure_started; only an actual start leaves the event loop."""
+        if cls._started:
+            return True
+        if not cls.is_enabled():
+            return False
+        return await sync_to_async(cls.ensure_started)()
+
+    @classmethod
+    def stop(cls):
+        """Close the listener and forget the cached snapshot."""
+        with cls._lock:
+            registration = cls._registration
+            cls._registration = None
+            cls._started = False
+            cls._tree = None
+            cls._snapshot = {}
+            cls._last_event_at = None
+            cls._last_event_monotonic = None
+        if registration is not None:
+            try:
+                registration.close()
+            except Exception:
+                pass
+
+    @classmethod
+    def _on_event(cls, event):
+        """Apply a streaming event to the mirror and re-normalize touched devices."""
+        try:
+            cls.apply_event(event.event_type, event.path, event.data)
+        except Exception:
+            # Never let a bad payload kill the listener thread
+            logger.exception("Failed to apply stream event")
+        finally:
+            # Long-lived thread: drop connections that are broken or past CONN_MAX_AGE
+            close_old_connections()
+
+    @classmethod
+    def apply_event(cls, event_type: str, path: str, data):
+        """
+        Apply a ``put`` or ``patch`` event to the in-memory mirror.
+
+        Args:
+            event_type: 'put' replaces the value at path, 'patch' merges children
+            path: Path relative to the sensors node ('/' for the node itself)
+            data: Event payload
+        """
+        segments = [segment for segment in path.split('/') if segment]
+
+        with cls._apply_lock:
+            with cls._lock:
+                if event_type == 'put':
+                    cls._tree = cls._set_path(cls._tree, segments, data)
+                elif event_type == 'patch' and isinstance(data, dict):
+                    for key, value in data.items():
+                        child = segments + [segment for segment in key.split('/') if segment]
+                        cls._tree = cls._set_path(cls._tree, child, value)
+                else:
+                    return
+
+                # _set_path copies what it changes, so tree stays as it is now once the lock is released
+                tree = cls._tree
+                devices = FirebaseService.split_devices(tree)
+                if not segments or segments[0] not in devices or len(devices) != len(cls._snapshot):
+                    # Root replaced, layout changed or a device was added/removed
+                    touched = list(devices.keys())
+                else:
+                    touched = [segments[0]]
+
+            normalized = FirebaseService.normalize_readings({device_id: devices[device_id] for device_id in touched})
+            updated = {reading['device_id']: reading for reading in normalized}
+
+            with cls._lock:
+                if cls._tree is not tree:
+                    # Stopped while normalizing
+                    return
+                # Keep the database order of sensors stable across events
+                cls._snapshot = {device_id: updated.get(device_id) or cls._snapshot[device_id] for device_id in devices}
+                cls._last_event_at = datetime.now()
+                cls._last_event_monotonic = time.monotonic()
+
+        # Every stream event is a real change, so it is recorded in the history table
+        SensorIngestion.add_many(normalized)
+        LiveFeedHub.publish(cls.get_snapshot())
+
+    @staticmethod
+    def _set_path(tree, segments: List[str], value):
+        """Return tree with value stored at segments (None deletes the key)."""
+        if not segments:
+            return value
+
+        if isinstance(tree, list):
+            tree = {str(index): item for index, item in enumerate(tree) if item is not None}
+        elif not isinstance(tree, dict):
+            tree = {}
+        else:
+            tree = dict(tree)
+
+        head = segments[0]
+        if len(segments) == 1:
+            if value is None:
+                tree.pop(head, None)
+            else:
+                tree[head] = value
+        else:
+            child = SensorStream._set_path(tree.get(head), segments[1:], value)
+            if child in (None, {}):
+                tree.pop(head, None)
+            else:
+                tree[head] = child
+        return tree
+
+    @classmethod
+    def get_snapshot(cls, device_ids: Optional[List[str]] = None) -> Optional[Dict]:
+        """
+        Return the latest snapshot without doing any I/O.
+
+        Args:
+            device_ids: Only include these sensors (None includes every sensor)
+
+        Returns:
+            Feed payload with sensors, last_updated, source and age_seconds,
+            or None if no event has been received yet
+        """
+        snapshot = cls._snapshot
+        last_event_monotonic = cls._last_event_monotonic
+        last_event_at = cls._last_event_at
+        if last_event_monotonic is None or not snapshot:
+            return None
+
+        if device_ids is None:
+            sensors = list(snapshot.values())
+        else:
+            sensors = [snapshot[device_id] for device_id in device_ids if device_id in snapshot]
+
+        return {
+            'sensors': sensors,
+            'last_updated': last_event_at.isoformat(),
+            'source': 'firebase_stream',
+            'age_seconds': round(time.monotonic() - last_event_monotonic, 3),
+        }
+
+
+atexit.register(SensorStream.stop)
@@ -1,3 +1,1887 @@
-from django.test import TestCase
+import asyncio
+import contextlib
+import gzip
+import importlib.util
+import io
+import json
+import logging
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import time
+import warnings
+from unittest import mock
 
-# Create your tests here.
+from datetime import datetime, timedelta
+
+import httpx
+import numpy as np
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIHandler
+from django.core.management import call_command
+from django.core.signals import request_finished, request_started
+from django.db import OperationalError, close_old_connections, transaction
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from agriboost import export, log, metrics
+
+from .alert_rules import BUILTIN_RULES, AlertEngine, RuleSpec
+from .anomaly import AnomalyDetector, MetricDetector
+from .circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+from .downsampling import lttb, lttb_indices
+from .features import FeatureAssembler, unnamed_features
+from .feed_cache import SensorFeedCache
+from .firebase_service import FirebaseService
+from .forest import CompiledForest
+from .history_import import PUSH_CHARS, HistoryImport, JSONRecordScanner
+from .history_service import SensorHistoryService
+from .ingestion import SensorIngestion
+from .live import LiveFeedHub
+from .model_registry import FertilizerModels, model_dir
+from .models import (
+    AlertRule, FertilizerPrediction, SensorDetectorState, SensorImportCheckpoint, SensorReading, SensorRollup,
+)
+from . import normalization
+from .normalization import FIELD_INDEX, NUMERIC_FIELDS, normalize_batch, normalize_reading
+from .rollups import SensorRollups
+from .rtdb import Event, LocalBackend, RecordingBackend
+from .rtdb_async import AsyncRTDBClient, LoopClients
+from .singleflight import AsyncSingleFlight, SingleFlight
+from .stream import SensorStream
+
+CALLERS = 200
+
+
+def run_concurrently(target, callers=CALLERS):
+    """Start callers threads that call target at the same moment and collect the results."""
+    barrier = threading.Barrier(callers)
+    results = [None] * callers
+    errors = []
+
+    def worker(index):
+        barrier.wait()
+        try:
+            results[index] = target()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(index,)) for index in range(callers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=30)
+    return results, errors
+
+
+class SingleFlightTests(SimpleTestCase):
+    def test_concurrent_callers_share_one_call(self):
+        group = SingleFlight()
+        calls = []
+
+        def fetch():
+            calls.append(1)
+            time.sleep(0.2)
+            return {'value': 42}
+
+        results, errors = run_concurrently(lambda: group.do('/IoT_Sensors', fetch))
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(all(result is results[0] for result in results))
+        self.assertEqual(group.in_flight(), 0)
+
+    def test_error_is_shared_and_not_cached(self):
+        group = SingleFlight()
+        calls = []
+
+        def failing():
+            calls.append(1)
+            time.sleep(0.2)
+            raise RuntimeError("upstream down")
+
+        results, errors = run_concurrently(lambda: group.do('key', failing))
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len(errors), CALLERS)
+        # The failure is not remembered: the next call runs again
+        self.assertEqual(group.do('key', lambda: 'ok'), 'ok')
+
+    def test_different_keys_run_separately(self):
+        group = SingleFlight()
+        self.assertEqual(group.do('a', lambda: 1), 1)
+        self.assertEqual(group.do('b', lambda: 2), 2)
+
+
+@override_settings(SENSOR_ANOMALY_ENABLED=False)
+class FirebaseServiceConcurrencyTests(SimpleTestCase):
+    def setUp(self):
+        self._saved = (FirebaseService._initialized, FirebaseService._firebase_connected)
+
+    def tearDown(self):
+        FirebaseService._initialized, FirebaseService._firebase_connected = self._saved
+
+    def test_concurrent_feed_fetches_make_one_upstream_call(self):
+        upstream_calls = []
+
+        def slow_fetch(sensors_path, device_ids):
+            upstream_calls.append(sensors_path)
+            time.sleep(0.2)
+            return {'sensor_1': {'temprature': 30, 'Moisture': 40, 'PH': 6.5}}
+
+        with mock.patch.object(FirebaseService, '_fetch_device_readings', side_effect=slow_fetch):
+            results, errors = run_concurrently(FirebaseService.fetch_device_readings)
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(upstream_calls), 1)
+        self.assertTrue(all(result == {'sensor_1': {'temprature': 30, 'Moisture': 40, 'PH': 6.5}} for result in results))
+
+    def test_initialize_runs_once(self):
+        init_calls = []
+
+        def slow_init():
+            init_calls.append(1)
+            time.sleep(0.2)
+            FirebaseService._firebase_connected = False
+            FirebaseService._initialized = True
+
+        FirebaseService._initialized = False
+        with mock.patch.object(FirebaseService, '_initialize_sdk', side_effect=slow_init):
+            results, errors = run_concurrently(FirebaseService.is_connected)
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(init_calls), 1)
+        self.assertEqual(results, [False] * CALLERS)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def fail():
+    raise ConnectionError("RTDB unreachable")
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker('test', failure_threshold=3, backoff=5.0, max_backoff=20.0, clock=self.clock)
+
+    def trip(self):
+        for _ in range(3):
+            with self.assertRaises(ConnectionError):
+                self.breaker.call(fail)
+
+    def test_opens_after_threshold_and_fails_fast(self):
+        self.trip()
+        self.assertEqual(self.breaker.state, OPEN)
+        upstream = mock.Mock()
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.call(upstream)
+        upstream.assert_not_called()
+
+    def test_single_probe_after_backoff(self):
+        self.trip()
+        self.clock.now = 5.0
+        self.assertTrue(self.breaker.allow())
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+        # Only one probe at a time
+        self.assertFalse(self.breaker.allow())
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, CLOSED)
+
+    def test_failed_probe_doubles_backoff(self):
+        self.trip()
+        self.clock.now = 5.0
+        with self.assertRaises(ConnectionError):
+            self.breaker.call(fail)
+        self.assertEqual(self.breaker.state, OPEN)
+        self.assertAlmostEqual(self.breaker.retry_in(), 10.0)
+        self.clock.now = 14.0
+        self.assertFalse(self.breaker.allow())
+        self.clock.now = 15.0
+        self.assertTrue(self.breaker.allow())
+
+
+@override_settings(SENSOR_ANOMALY_ENABLED=False)
+class FirebaseServiceOutageTests(SimpleTestCase):
+    def setUp(self):
+        self._saved = (FirebaseService._initialized, FirebaseService._firebase_connected, FirebaseService._breaker)
+        FirebaseService._initialized = FirebaseService._firebase_connected = True
+        FirebaseService._breaker = CircuitBreaker('firebase', failure_threshold=2, backoff=60.0)
+        FirebaseService._last_good = {}
+        FirebaseService._last_good_at = {}
+        AlertEngine.use_rules(BUILTIN_RULES)
+
+    def tearDown(self):
+        AlertEngine.reset()
+        FirebaseService._initialized, FirebaseService._firebase_connected, FirebaseService._breaker = self._saved
+        FirebaseService._last_good = {}
+        FirebaseService._last_good_at = {}
+
+    def test_serves_last_known_good_snapshot_while_open(self):
+        reading = {'sensor_1': {'temprature': 30, 'Moisture': 40, 'PH': 6.5}}
+        with mock.patch.object(FirebaseService, '_fetch_device_readings', return_value=reading):
+            fresh = FirebaseService.get_sensor_readings()
+        self.assertNotIn('stale', fresh)
+
+        upstream = mock.Mock(side_effect=ConnectionError("timeout"))
+        with mock.patch.object(FirebaseService, '_fetch_device_readings', upstream):
+            for _ in range(5):
+                data = FirebaseService.get_sensor_readings()
+
+        # Two failures open the breaker; the remaining calls never reach RTDB
+        self.assertEqual(upstream.call_count, 2)
+        self.assertTrue(data['stale'])
+        self.assertGreaterEqual(data['age_seconds'], 0)
+        self.assertEqual(data['sensors'][0]['temperature'], 30.0)
+        self.assertEqual(data['source'], 'firebase')
+
+    def test_placeholder_without_any_good_snapshot(self):
+        with mock.patch.object(FirebaseService, '_fetch_device_readings', side_effect=ConnectionError("timeout")):
+            data = FirebaseService.get_sensor_readings()
+        self.assertEqual(data['source'], 'placeholder')
+
+
+@override_settings(SENSOR_ANOMALY_ENABLED=False)
+class LocalBackendTests(SimpleTestCase):
+    def setUp(self):
+        self._saved = (FirebaseService._initialized, FirebaseService._firebase_connected,
+                       FirebaseService._backend, FirebaseService._breaker)
+        AlertEngine.use_rules(BUILTIN_RULES)
+
+    def tearDown(self):
+        AlertEngine.reset()
+        (FirebaseService._initialized, FirebaseService._firebase_connected,
+         FirebaseService._backend, FirebaseService._breaker) = self._saved
+        FirebaseService._layouts = {}
+        FirebaseService._last_good = {}
+        FirebaseService._last_good_at = {}
+
+    def test_feed_served_from_synthetic_backend(self):
+        FirebaseService.use_backend(LocalBackend.synthetic('/IoT_Sensors', devices=4, seed=7))
+        data = FirebaseService.get_sensor_readings()
+
+        self.assertEqual(data['source'], 'firebase')
+        self.assertEqual(sorted(sensor['device_id'] for sensor in data['sensors']),
+                         ['sensor_1', 'sensor_2', 'sensor_3', 'sensor_4'])
+
+    def test_injected_failures_fall_back_to_last_good(self):
+        backend = LocalBackend.synthetic('/IoT_Sensors', devices=2, seed=7)
+        FirebaseService.use_backend(backend)
+        FirebaseService._breaker = CircuitBreaker('firebase', failure_threshold=2, backoff=60.0)
+        FirebaseService.get_sensor_readings()
+
+        backend.failure_rate = 1.0
+        calls_before = backend.get_count
+        for _ in range(5):
+            data = FirebaseService.get_sensor_readings()
+
+        self.assertTrue(data['stale'])
+        self.assertEqual(backend.get_count - calls_before, 2)
+
+    def test_recorded_fixture_replays(self):
+        source = LocalBackend.synthetic('/IoT_Sensors', devices=2, seed=3)
+        with tempfile.TemporaryDirectory() as directory:
+            fixture = os.path.join(directory, 'rtdb.json')
+            recorded = RecordingBackend(source, fixture).get('/IoT_Sensors')
+            replay = LocalBackend.from_fixture(fixture)
+
+        self.assertEqual(replay.get('/IoT_Sensors'), recorded)
+        self.assertEqual(replay.get('/IoT_Sensors', shallow=True), {'sensor_1': True, 'sensor_2': True})
+
+    def test_listen_delivers_initial_put_and_updates(self):
+        backend = LocalBackend.synthetic('/IoT_Sensors', devices=1, seed=3)
+        events = []
+        received = threading.Event()
+
+        def callback(event):
+            events.append(event)
+            if len(events) == 2:
+                received.set()
+
+        registration = backend.listen('/IoT_Sensors', callback)
+        backend.tick('/IoT_Sensors')
+        self.assertTrue(received.wait(5))
+        registration.close()
+
+        self.assertEqual((events[0].event_type, events[0].path), ('put', '/'))
+        self.assertEqual((events[1].event_type, events[1].path), ('put', '/sensor_1'))
+
+
+@override_settings(FIREBASE_STREAM_ENABLED=False, SENSOR_FEED_CACHE_SECONDS=0, SENSOR_ANOMALY_ENABLED=False)
+class MultiSensorFeedTests(SimpleTestCase):
+    def setUp(self):
+        self._saved = (FirebaseService._initialized, FirebaseService._firebase_connected,
+                       FirebaseService._backend, FirebaseService._breaker)
+        AlertEngine.use_rules(BUILTIN_RULES)
+        # Each sensor spells its fields differently, as the real devices do
+        FirebaseService.use_backend(LocalBackend({'IoT_Sensors': {
+            'sensor_1': {'temprature': 24.5, 'Moisture': 41, 'PH': 6.4},
+            'sensor_2': {'temperature': 31.0, 'soil_moisture': 22, 'ph': 7.1},
+            'sensor_3': {'Temperature': 18.0, 'Moisture': '55', 'PH': 'n/a'},
+        }}))
+
+    def tearDown(self):
+        AlertEngine.reset()
+        (FirebaseService._initialized, FirebaseService._firebase_connected,
+         FirebaseService._backend, FirebaseService._breaker) = self._saved
+        FirebaseService._layouts = {}
+        FirebaseService._last_good = {}
+        FirebaseService._last_good_at = {}
+
+    def feed(self, **params):
+        response = self.client.get('/api/sensors/feed/', params)
+        self.assertEqual(response.status_code, 200)
+        return {sensor['device_id']: sensor for sensor in json.loads(response.content)['sensors']}
+
+    def test_every_sensor_is_normalized_with_its_own_spellings(self):
+        sensors = self.feed()
+
+        self.assertEqual(list(sensors), ['sensor_1', 'sensor_2', 'sensor_3'])
+        self.assertEqual({device_id: (sensor['temperature'], sensor['soil_moisture'], sensor['soil_ph'])
+                          for device_id, sensor in sensors.items()},
+                         {'sensor_1': (24.5, 41.0, 6.4), 'sensor_2': (31.0, 22.0, 7.1), 'sensor_3': (18.0, 55.0, 6.5)})
+        self.assertEqual(sensors['sensor_3']['missing_fields'], sensors['sensor_1']['missing_fields'] + ['soil_ph'])
+        # Alerts come from each sensor's own values
+        self.assertEqual(sensors['sensor_1']['alerts'], [])
+        self.assertTrue(any('moisture' in alert for alert in sensors['sensor_2']['alerts']))
+
+    def test_devices_parameter_limits_the_sensors(self):
+        sensors = self.feed(devices='sensor_3, sensor_1,unknown')
+
+        self.assertEqual(list(sensors), ['sensor_1', 'sensor_3'])
+        self.assertEqual(sensors['sensor_3']['temperature'], 18.0)
+
+    def test_unknown_devices_only_give_an_empty_feed(self):
+        self.assertEqual(self.feed(devices='unknown'), {})
+
+
+@override_settings(SENSOR_ANOMALY_ENABLED=False)
+class FirebaseLayoutTests(SimpleTestCase):
+    def setUp(self):
+        self._saved = (FirebaseService._initialized, FirebaseService._firebase_connected,
+                       FirebaseService._backend, FirebaseService._breaker)
+        self.backend = LocalBackend.synthetic('/IoT_Sensors', devices=2, seed=5)
+        FirebaseService.use_backend(self.backend)
+        self.calls = []
+        get = self.backend.get
+        self.backend.get = lambda path, shallow=False: self.calls.append((path, shallow)) or get(path, shallow)
+
+    def tearDown(self):
+        (FirebaseService._initialized, FirebaseService._firebase_connected,
+         FirebaseService._backend, FirebaseService._breaker) = self._saved
+        FirebaseService._layouts = {}
+        FirebaseService._last_good = {}
+        FirebaseService._last_good_at = {}
+
+    def add_sensor(self, device_id):
+        self.backend.set(f'/IoT_Sensors/{device_id}', dict(self.backend.get('/IoT_Sensors/sensor_1')))
+        self.calls.clear()
+
+    def test_all_sensors_are_read_in_one_call(self):
+        readings = FirebaseService.fetch_device_readings()
+        self.assertEqual(sorted(readings), ['sensor_1', 'sensor_2'])
+        self.assertEqual(self.calls, [('/IoT_Sensors', True), ('/IoT_Sensors', False)])
+
+        self.add_sensor('sensor_3')
+        readings = FirebaseService.fetch_device_readings()
+
+        self.assertEqual(sorted(readings), ['sensor_1', 'sensor_2', 'sensor_3'])
+        self.assertEqual(self.calls, [('/IoT_Sensors', False)])
+        self.assertEqual(FirebaseService._layouts['/IoT_Sensors']['devices'], ['sensor_1', 'sensor_2', 'sensor_3'])
+
+    def test_chosen_sensors_are_read_child_by_child(self):
+        readings = FirebaseService.fetch_device_readings(['sensor_2'])
+
+        self.assertEqual(list(readings), ['sensor_2'])
+        self.assertEqual(self.calls, [('/IoT_Sensors', True), ('/IoT_Sensors/sensor_2', False)])
+
+    @override_settings(FIREBASE_LAYOUT_RETRY_SECONDS=0)
+    def test_unknown_sensor_triggers_discovery(self):
+        FirebaseService.fetch_device_readings(['sensor_1'])
+        self.add_sensor('sensor_3')
+
+        readings = FirebaseService.fetch_device_readings(['sensor_3'])
+
+        self.assertEqual(list(readings), ['sensor_3'])
+        self.assertEqual(self.calls, [('/IoT_Sensors', True), ('/IoT_Sensors/sensor_3', False)])
+
+    def test_unknown_sensor_discovery_is_rate_limited(self):
+        FirebaseService.fetch_device_readings(['sensor_1'])
+        self.calls.clear()
+
+        for _ in range(3):
+            self.assertEqual(FirebaseService.fetch_device_readings(['sensor_9']), {})
+        self.assertEqual(self.calls, [])
+
+    @override_settings(FIREBASE_LAYOUT_TTL_SECONDS=0)
+    def test_layout_expires_after_ttl(self):
+        FirebaseService.fetch_device_readings(['sensor_1'])
+        self.calls.clear()
+
+        FirebaseService.fetch_device_readings(['sensor_1'])
+
+        self.assertEqual(self.calls, [('/IoT_Sensors', True), ('/IoT_Sensors/sensor_1', False)])
+
+
+def load_benchmark(name):
+    """Import a module from backend/benchmarks (not a package)."""
+    spec = importlib.util.spec_from_file_location(f'benchmarks_{name}', settings.BASE_DIR / 'benchmarks' / f'{name}.py')
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class NormalizationTests(SimpleTestCase):
+    # Every alias position, None fallbacks, strings with blanks, bad and
+    # empty values, and each timestamp format (all fixed, so never "now");
+    # four payloads share a key-set and switch formats, twice over as each
+    # normalization path runs
+    PAYLOADS = [
+        {'temperature': '31.5', 'Humidity': 55, 'moisture': ' 22.25 ', 'ph': 7, 'ec': None,
+         'electrical_conductivity': 2.2, 'N': True, 'P': 'bad', 'K': '', 'battery_level': 15,
+         'name': 'Probe', 'time': 1790000000},
+        {'label': None, 'sensor_name': 'Field 2', 'Temp': 41.0, 'hum': None, 'Hum': '70',
+         'soilMoisture': 12, 'soilPh': '8.5', 'updated_at': datetime(2026, 10, 1, 6, 0)},
+        {'temprature': None, 'temperature': 8, 'pH': 4.5, 'timestamp': '2026-10-01T06:00:00+05:00'},
+        {'temprature': 25.0, 'PH': 6.5, 'timestamp': '2026-10-01T06:00:00Z'},
+        {'temprature': 26.0, 'PH': 6.4, 'timestamp': 1790000060},
+        {'temprature': 27.0, 'PH': 6.3, 'timestamp': '2026-10-01 06:02:00'},
+        {'temprature': 28.0, 'PH': 6.2, 'timestamp': '2026-10-01T06:03:00+5'},
+        {'Temperature': 0, 'Moisture': 0.0, 'battery': '0', 'timestamp': ''},
+    ]
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.benchmark = load_benchmark('normalize')
+
+    def assertMatchesLegacy(self, payloads):
+        # The legacy function prints a warning per unconvertible value
+        with contextlib.redirect_stdout(io.StringIO()):
+            legacy = [self.benchmark.legacy_normalize_sensor_data(payload) for payload in payloads]
+        for name, normalized in (
+            ('normalize_reading', [normalize_reading(payload) for payload in payloads]),
+            ('normalize_sensor_data', [FirebaseService.normalize_sensor_data(payload) for payload in payloads]),
+            ('normalize_batch', normalize_batch(payloads)),
+        ):
+            for expected, reading in zip(legacy, normalized):
+                reading = {key: value for key, value in reading.items() if key != 'missing_fields'}
+                self.assertEqual(reading, expected, name)
+
+    def test_matches_the_original_normalization(self):
+        self.assertMatchesLegacy(self.PAYLOADS[:-1])
+
+    def test_matches_the_original_normalization_on_benchmark_payloads(self):
+        self.assertMatchesLegacy(self.benchmark.make_payloads(500))
+
+    def test_missing_fields_lists_the_defaults(self):
+        reading = normalize_reading(self.PAYLOADS[0])
+        self.assertEqual(sorted(reading['missing_fields']), ['phosphorous', 'potassium'])
+        self.assertEqual((reading['phosphorous'], reading['potassium'], reading['nitrogen']), (30.0, 40.0, 1.0))
+
+        reading = normalize_reading(self.PAYLOADS[-1])
+        self.assertEqual((reading['temperature'], reading['soil_moisture'], reading['battery']), (0.0, 0.0, 0.0))
+        self.assertNotIn('temperature', reading['missing_fields'])
+        self.assertIn('soil_ph', reading['missing_fields'])
+
+    def test_timestamp_format_is_detected_once_per_key_set(self):
+        payloads = [{'temprature': 20.0, 'timestamp': f'2026-10-01T06:0{minute}:00Z', 'detect_once': 1}
+                    for minute in range(5)]
+        with mock.patch.object(normalization, '_detect_timestamp_parser',
+                               wraps=normalization._detect_timestamp_parser) as detect:
+            readings = [normalize_reading(payload) for payload in payloads]
+            self.assertEqual(detect.call_count, 1)
+
+            # Another format in the same key-set is detected again
+            normalize_reading(dict(payloads[0], timestamp=1790000000))
+            self.assertEqual(detect.call_count, 2)
+
+        self.assertEqual(readings[4]['timestamp'], '2026-10-01T06:04:00+00:00')
+
+
+def reading_values(*rows):
+    """Value matrix for alert evaluation from {field: value} dicts (other fields at their defaults)."""
+    values = np.tile([float(default) for _, _, default in NUMERIC_FIELDS], (len(rows), 1))
+    for index, row in enumerate(rows):
+        for field, value in row.items():
+            values[index, FIELD_INDEX[field]] = value
+    return values
+
+
+class AlertEngineTests(SimpleTestCase):
+    def setUp(self):
+        AlertEngine.use_rules(BUILTIN_RULES)
+
+    def tearDown(self):
+        AlertEngine.reset()
+
+    def test_hysteresis_and_deduplication(self):
+        raised = []
+        temperatures = [40.5, 41.0, 39.5, 40.2, 38.9, 40.5]
+        with mock.patch.object(AlertEngine, '_raised', side_effect=lambda rule, *args: raised.append(rule.name)):
+            alerts = [
+                AlertEngine.evaluate(reading_values({'temperature': value}), ['sensor_1'])[0]
+                for value in temperatures
+            ]
+
+        # Active until the temperature drops below 40 - 1 degree of hysteresis
+        self.assertEqual([bool(row) for row in alerts], [True, True, True, True, False, True])
+        self.assertEqual(alerts[0], ["High temperature alert: 40.5°C exceeds 40°C threshold"])
+        # Raised once per episode, not once per poll
+        self.assertEqual(raised, ['High temperature', 'High temperature'])
+
+    def test_batch_evaluates_every_sensor_in_one_pass(self):
+        values = reading_values({'temperature': 45}, {'soil_ph': 4.2, 'soil_moisture': 12}, {})
+        alerts = AlertEngine.evaluate(values, ['sensor_1', 'sensor_2', 'sensor_3'])
+
+        self.assertEqual(len(alerts[0]), 1)
+        self.assertEqual(alerts[1], [
+            "Low pH alert: 4.2 below 5.0 threshold",
+            "Low soil moisture alert: 12.0% below 30% threshold",
+        ])
+        self.assertEqual(alerts[2], [])
+
+    def test_device_rule_overrides_global_rule(self):
+        device_rule = RuleSpec('device-1', 'Greenhouse heat', 'sensor_2', '', 'temperature', 'gt', 45.0, 0.0,
+                               "{device_id} above {threshold}")
+        AlertEngine.use_rules(BUILTIN_RULES + (device_rule,))
+
+        alerts = AlertEngine.evaluate(reading_values({'temperature': 42}, {'temperature': 46}), ['sensor_1', 'sensor_2'])
+
+        self.assertEqual(alerts[0], ["High temperature alert: 42.0°C exceeds 40°C threshold"])
+        self.assertEqual(alerts[1], ["sensor_2 above 45.0"])
+
+    def test_crop_scope(self):
+        rice = RuleSpec('crop-1', 'Dry paddy', '', 'Rice', 'soil_moisture', 'lt', 60.0, 0.0, "dry")
+        AlertEngine.use_rules((rice,), crop_type='Sugarcane')
+        self.assertEqual(AlertEngine.evaluate(reading_values({'soil_moisture': 40}), ['sensor_1']), [[]])
+
+        AlertEngine.reset()
+        AlertEngine.use_rules((rice,), crop_type='Rice')
+        self.assertEqual(AlertEngine.evaluate(reading_values({'soil_moisture': 40}), ['sensor_1']), [['dry']])
+
+    def test_repeated_sensor_in_batch_sees_earlier_rows(self):
+        values = reading_values({'temperature': 41}, {'temperature': 39.5}, {'temperature': 38})
+        alerts = AlertEngine.evaluate(values, ['sensor_1', 'sensor_1', 'sensor_1'])
+        self.assertEqual([bool(row) for row in alerts], [True, True, False])
+
+
+class AlertRuleModelTests(TestCase):
+    def tearDown(self):
+        AlertEngine.reset()
+
+    def test_default_rules_are_loaded_and_edits_invalidate(self):
+        self.assertEqual(len(AlertEngine.rules()), len(BUILTIN_RULES))
+
+        AlertRule.objects.create(name='Low battery', metric='battery', operator='lt', threshold=20.0,
+                                 message="Battery at {value}%")
+        alerts = AlertEngine.evaluate(reading_values({'battery': 15}), ['sensor_1'])
+
+        self.assertEqual(alerts, [["Battery at 15.0%"]])
+
+
+def sensor_readings(device_id, temperatures, start=datetime(2026, 10, 1, 6, 0), **fixed):
+    """Normalized readings one minute apart with the given temperatures."""
+    return [
+        {'device_id': device_id, 'label': 'NPK Sensor', 'temperature': temperature, 'nitrogen': 52.0,
+         'timestamp': (start + timedelta(minutes=index)).isoformat(), **fixed}
+        for index, temperature in enumerate(temperatures)
+    ]
+
+
+class AnomalyDetectorTests(TestCase):
+    def setUp(self):
+        AnomalyDetector.reset()
+
+    def tearDown(self):
+        AnomalyDetector.reset()
+
+    def test_spike_is_flagged_and_does_not_poison_the_baseline(self):
+        readings = sensor_readings('sensor_1', [24.0 + 0.3 * ((index % 5) - 2) for index in range(30)] + [61.0, 24.2])
+        AnomalyDetector.inspect(readings)
+
+        self.assertEqual([reading['anomalies'] for reading in readings[:30]], [[]] * 30)
+        self.assertEqual(readings[30]['anomalies'], ['temperature:spike', 'temperature:outlier'])
+        self.assertEqual(readings[31]['anomalies'], [])
+
+    def test_stuck_probe_is_flagged(self):
+        readings = sensor_readings('sensor_1', [27.4] * 25)
+        AnomalyDetector.inspect(readings)
+
+        # Nitrogen is constant too, but quantized metrics are not checked for flat lines
+        self.assertEqual(readings[18]['anomalies'], [])
+        self.assertEqual(readings[19]['anomalies'], ['temperature:stuck'])
+        self.assertEqual(readings[24]['anomalies'], ['temperature:stuck'])
+
+    def test_same_reading_is_applied_once(self):
+        readings = sensor_readings('sensor_1', [24.0, 24.5])
+        AnomalyDetector.inspect(readings)
+        AnomalyDetector.inspect([dict(readings[1], anomalies=None)])
+
+        self.assertEqual(AnomalyDetector._detectors['sensor_1']['temperature'].count, 2)
+
+    def test_fields_filled_by_normalization_are_skipped(self):
+        payloads = [{'temprature': 25.0 + 0.1 * (index % 3), 'PH': '', 'EC': 'n/a', 'timestamp': timestamp}
+                    for index, timestamp in enumerate(reading['timestamp'] for reading in
+                                                      sensor_readings('sensor_1', [0] * 3))]
+        readings = normalize_batch(payloads)
+        self.assertEqual(readings, [normalize_reading(payload) for payload in payloads])
+        self.assertIn('soil_ph', readings[0]['missing_fields'])
+        self.assertIn('ec', readings[0]['missing_fields'])
+        self.assertIn('nitrogen', readings[0]['missing_fields'])
+        self.assertNotIn('temperature', readings[0]['missing_fields'])
+
+        for reading in readings:
+            reading['device_id'] = 'sensor_1'
+        AnomalyDetector.inspect(readings)
+
+        # 25.0 is also temperature's default, but here it was measured
+        self.assertEqual(set(AnomalyDetector._detectors['sensor_1']), {'temperature'})
+        self.assertEqual(AnomalyDetector._detectors['sensor_1']['temperature'].count, 3)
+
+    def test_flush_saves_state_and_inspect_starts_no_flusher(self):
+        with mock.patch.object(SensorIngestion, 'ensure_flusher') as ensure_flusher:
+            AnomalyDetector.inspect(sensor_readings('sensor_1', [24.0]))
+            ensure_flusher.assert_not_called()
+
+        self.assertEqual(SensorIngestion.flush(), 0)
+        self.assertFalse(AnomalyDetector.has_unsaved())
+        self.assertEqual(SensorDetectorState.objects.filter(device_id='sensor_1').count(), 2)
+
+    @override_settings(SENSOR_INGEST_BATCH_SIZE=1000)
+    def test_state_survives_restart_and_flagged_values_skip_rollups(self):
+        temperatures = [24.0 + 0.2 * (index % 3) for index in range(30)]
+        SensorIngestion.add_many(sensor_readings('sensor_1', temperatures))
+        SensorIngestion.flush()
+
+        # A new worker process starts with no detectors in memory
+        AnomalyDetector.reset()
+        spike = sensor_readings('sensor_1', [70.0], start=datetime(2026, 10, 1, 6, 30))
+        SensorIngestion.add_many(spike)
+        SensorIngestion.flush()
+
+        self.assertEqual(AnomalyDetector._detectors['sensor_1']['temperature'].count, 31)
+        stored = SensorReading.objects.get(temperature=70.0)
+        self.assertEqual(stored.anomalies, 'temperature:spike,temperature:outlier')
+        hour = SensorRollup.objects.get(device_id='sensor_1', metric='temperature', resolution='hour')
+        self.assertEqual(hour.count, 30)
+        self.assertLess(hour.max_value, 70.0)
+
+
+class FakeCredential:
+    """google.auth credentials stand-in that counts refreshes."""
+
+    def __init__(self):
+        self.token = None
+        self.refreshes = 0
+
+    @property
+    def valid(self):
+        return self.token is not None
+
+    def refresh(self, request):
+        self.refreshes += 1
+        self.token = f"token-{self.refreshes}"
+
+
+class AsyncRTDBClientTests(SimpleTestCase):
+    def test_reads_with_token_and_refreshes_once_on_401(self):
+        requests = []
+
+        def handler(request):
+            requests.append(request)
+            if request.headers['Authorization'] == 'Bearer token-1':
+                return httpx.Response(401)
+            return httpx.Response(200, json={'sensor_1': True})
+
+        credential = FakeCredential()
+
+        async def read():
+            client = AsyncRTDBClient('https://example.firebaseio.com/', credential=credential,
+                                     transport=httpx.MockTransport(handler))
+            try:
+                return await client.get('/IoT_Sensors', shallow=True)
+            finally:
+                await client.aclose()
+
+        self.assertEqual(asyncio.run(read()), {'sensor_1': True})
+        self.assertEqual(credential.refreshes, 2)
+        self.assertEqual(str(requests[-1].url), 'https://example.firebaseio.com/IoT_Sensors.json?shallow=true')
+
+    def test_concurrent_reads_share_one_token_refresh(self):
+        credential = FakeCredential()
+
+        async def read_many():
+            client = AsyncRTDBClient('https://example.firebaseio.com', credential=credential,
+                                     transport=httpx.MockTransport(lambda request: httpx.Response(200, json=1)))
+            try:
+                return await asyncio.gather(*(client.get(f'/sensors/{index}') for index in range(50)))
+            finally:
+                await client.aclose()
+
+        self.assertEqual(asyncio.run(read_many()), [1] * 50)
+        self.assertEqual(credential.refreshes, 1)
+
+    def test_loop_clients_are_closed_with_their_loop(self):
+        made = []
+
+        def factory():
+            made.append(mock.Mock(aclose=mock.AsyncMock()))
+            return made[-1]
+
+        clients = LoopClients(factory)
+
+        async def use_twice():
+            return clients.for_loop() is clients.for_loop()
+
+        # Each one-off async_to_sync loop gets its own client, closed before the loop is
+        self.assertTrue(async_to_sync(use_twice)())
+        self.assertTrue(async_to_sync(use_twice)())
+
+        self.assertEqual(len(made), 2)
+        for client in made:
+            client.aclose.assert_awaited_once_with()
+        self.assertEqual(len(clients), 0)
+
+
+@override_settings(SENSOR_ANOMALY_ENABLED=False)
+class SensorStreamTests(SimpleTestCase):
+    def setUp(self):
+        SensorStream.stop()
+        AlertEngine.use_rules(BUILTIN_RULES)
+        self.ingested = []
+        for target, attribute, side_effect in ((SensorIngestion, 'add_many', self.ingested.append),
+                                               (LiveFeedHub, 'publish', None)):
+            patcher = mock.patch.object(target, attribute, side_effect=side_effect)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        SensorStream.apply_event('put', '/', {
+            'sensor_1': {'temprature': 24.0, 'Moisture': 40, 'timestamp': '2026-10-01T06:00:00'},
+            'sensor_2': {'temprature': 21.0, 'Moisture': 45, 'timestamp': '2026-10-01T06:00:00'},
+        })
+
+    def tearDown(self):
+        SensorStream.stop()
+        AlertEngine.reset()
+
+    def readings(self, *device_ids):
+        return {sensor['device_id']: (sensor['temperature'], sensor['soil_moisture'])
+                for sensor in SensorStream.get_snapshot(list(device_ids) or None)['sensors']}
+
+    def test_put_at_root_mirrors_every_sensor(self):
+        self.assertEqual(self.readings(), {'sensor_1': (24.0, 40.0), 'sensor_2': (21.0, 45.0)})
+        self.assertEqual([reading['device_id'] for reading in self.ingested[0]], ['sensor_1', 'sensor_2'])
+        self.assertEqual(SensorStream.get_snapshot()['source'], 'firebase_stream')
+
+    def test_patch_merges_into_one_sensor_and_renormalizes_only_it(self):
+        untouched = SensorStream._snapshot['sensor_2']
+
+        SensorStream.apply_event('patch', '/sensor_1', {'temprature': 30.5, 'timestamp': '2026-10-01T06:01:00'})
+
+        self.assertEqual(self.readings(), {'sensor_1': (30.5, 40.0), 'sensor_2': (21.0, 45.0)})
+        self.assertIs(SensorStream._snapshot['sensor_2'], untouched)
+        self.assertEqual([reading['device_id'] for reading in self.ingested[-1]], ['sensor_1'])
+
+    def test_patch_at_root_with_nested_keys(self):
+        SensorStream.apply_event('patch', '/', {'sensor_2/Moisture': 55, 'sensor_1/temprature': 25.0})
+
+        self.assertEqual(self.readings(), {'sensor_1': (25.0, 40.0), 'sensor_2': (21.0, 55.0)})
+
+    def test_put_on_a_leaf_replaces_only_that_value(self):
+        SensorStream.apply_event('put', '/sensor_2/temprature', 19.5)
+
+        self.assertEqual(self.readings('sensor_2'), {'sensor_2': (19.5, 45.0)})
+
+    def test_sensors_are_added_and_removed(self):
+        SensorStream.apply_event('put', '/sensor_3', {'temprature': 26.0, 'Moisture': 38})
+        self.assertEqual(list(self.readings()), ['sensor_1', 'sensor_2', 'sensor_3'])
+
+        SensorStream.apply_event('put', '/sensor_1', None)
+        self.assertEqual(list(self.readings()), ['sensor_2', 'sensor_3'])
+        self.assertNotIn('sensor_1', SensorStream._tree)
+
+    def test_other_events_are_ignored(self):
+        SensorStream.apply_event('keep-alive', '/', None)
+        SensorStream.apply_event('patch', '/sensor_1', 'not an object')
+
+        self.assertEqual(self.readings(), {'sensor_1': (24.0, 40.0), 'sensor_2': (21.0, 45.0)})
+        self.assertEqual(len(self.ingested), 1)
+
+    def test_no_snapshot_before_the_first_event(self):
+        SensorStream.stop()
+        self.assertIsNone(SensorStream.get_snapshot())
+
+    def test_readings_are_normalized_outside_the_snapshot_lock(self):
+        normalize = FirebaseService.normalize_readings
+        lock_was_free = []
+
+        def checking_normalize(raw_readings):
+            lock_was_free.append(SensorStream._lock.acquire(blocking=False))
+            if lock_was_free[-1]:
+                SensorStream._lock.release()
+            return normalize(raw_readings)
+
+        with mock.patch.object(FirebaseService, 'normalize_readings', side_effect=checking_normalize):
+            SensorStream.apply_event('patch', '/sensor_1', {'temprature': 26.0})
+
+        self.assertEqual(lock_was_free, [True])
+        self.assertEqual(self.readings('sensor_1'), {'sensor_1': (26.0, 40.0)})
+
+    def test_listener_closes_old_connections_after_every_event(self):
+        with mock.patch('sensors.stream.close_old_connections') as close_old_connections, \
+                mock.patch.object(SensorStream, 'apply_event', side_effect=[None, ValueError('bad payload')]), \
+                self.assertLogs('sensors.stream', 'ERROR'):
+            SensorStream._on_event(Event('put', '/sensor_1', {'temprature': 26.0}))
+            SensorStream._on_event(Event('put', '/sensor_1', 'garbage'))
+
+        self.assertEqual(close_old_connections.call_count, 2)
+
+
+@override_settings(SENSOR_ANOMALY_ENABLED=False)
+class AsyncFeedTests(SimpleTestCase):
+    def setUp(self):
+        self._saved = (FirebaseService._initialized, FirebaseService._firebase_connected,
+                       FirebaseService._backend, FirebaseService._breaker)
+        AlertEngine.use_rules(BUILTIN_RULES)
+
+    def tearDown(self):
+        AlertEngine.reset()
+        (FirebaseService._initialized, FirebaseService._firebase_connected,
+         FirebaseService._backend, FirebaseService._breaker) = self._saved
+        FirebaseService._layouts = {}
+        FirebaseService._last_good = {}
+        FirebaseService._last_good_at = {}
+
+    def test_async_single_flight_shares_one_call(self):
+        group = AsyncSingleFlight()
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return {'value': 42}
+
+        async def burst():
+            return await asyncio.gather(*(group.do('/IoT_Sensors', fetch) for _ in range(CALLERS)))
+
+        results = asyncio.run(burst())
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(all(result is results[0] for result in results))
+        self.assertEqual(group.in_flight(), 0)
+
+    def test_concurrent_feed_requests_on_one_event_loop(self):
+        backend = LocalBackend.synthetic('/IoT_Sensors', devices=4, seed=7, latency=0.05)
+        FirebaseService.use_backend(backend)
+
+        async def burst():
+            return await asyncio.gather(*(FirebaseService.aget_sensor_readings() for _ in range(CALLERS)))
+
+        started = time.monotonic()
+        results = asyncio.run(burst())
+        elapsed = time.monotonic() - started
+
+        self.assertEqual({len(result['sensors']) for result in results}, {4})
+        # One layout query plus one read of the whole sensors node
+        self.assertEqual(backend.get_count, 2)
+        self.assertLess(elapsed, 2.0)
+
+
+@override_settings(SENSOR_FEED_CACHE_SECONDS=60)
+class SensorFeedCacheTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.temperature = 24.0
+        self.fetched = []
+
+        async def fetch(device_ids=None):
+            self.fetched.append(device_ids)
+            return {'sensors': [{'device_id': device_id, 'temperature': self.temperature, 'timestamp': time.time()}
+                                for device_id in device_ids or ['sensor_1']],
+                    'source': 'firebase'}
+
+        patcher = mock.patch('sensors.views.aget_feed_data', fetch)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(cache.clear)
+
+    def test_polls_within_ttl_share_one_fetch_and_etag(self):
+        first = self.client.get('/api/sensors/feed/')
+        again = self.client.get('/api/sensors/feed/')
+        current = self.client.get('/api/sensors/feed/', HTTP_IF_NONE_MATCH=first['ETag'])
+        strong = self.client.get('/api/sensors/feed/', HTTP_IF_NONE_MATCH=first['ETag'].removeprefix('W/'))
+
+        self.assertEqual([first.status_code, again.status_code, current.status_code, strong.status_code],
+                         [200, 200, 304, 304])
+        self.assertTrue(first['ETag'].startswith('W/"'))
+        self.assertEqual(again.content, first.content)
+        self.assertEqual(current['ETag'], first['ETag'])
+        self.assertEqual(self.fetched, [None])
+
+    def test_matching_etag_gets_304_after_ttl_without_rendering(self):
+        etag = self.client.get('/api/sensors/feed/')['ETag']
+        cache.clear()    # the entry expired
+
+        with mock.patch.object(SensorFeedCache._renderer, 'render', wraps=SensorFeedCache._renderer.render) as render:
+            unchanged = self.client.get('/api/sensors/feed/', HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(render.call_count, 0)
+            # A client without the ETag still gets the body, rendered from the kept payload
+            fresh = self.client.get('/api/sensors/feed/')
+
+        self.assertEqual(unchanged.status_code, 304)
+        self.assertEqual(unchanged['ETag'], etag)
+        self.assertEqual(fresh.status_code, 200)
+        self.assertEqual(json.loads(fresh.content)['sensors'][0]['temperature'], 24.0)
+        self.assertEqual(len(self.fetched), 2)
+
+    def test_changed_readings_get_a_new_etag_after_ttl(self):
+        etag = self.client.get('/api/sensors/feed/')['ETag']
+        cache.clear()
+        self.temperature = 25.0
+
+        response = self.client.get('/api/sensors/feed/', HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(json.loads(response.content)['sensors'][0]['temperature'], 25.0)
+
+    def test_device_order_does_not_change_the_body(self):
+        first = self.client.get('/api/sensors/feed/', {'devices': 'sensor_2,sensor_1'})
+        second = self.client.get('/api/sensors/feed/', {'devices': 'sensor_1, sensor_2,sensor_1'})
+
+        self.assertEqual([sensor['device_id'] for sensor in json.loads(first.content)['sensors']],
+                         ['sensor_1', 'sensor_2'])
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(self.fetched, [['sensor_1', 'sensor_2']])
+
+    @override_settings(SENSOR_FEED_CACHE_SECONDS=0)
+    def test_zero_ttl_fetches_every_time(self):
+        etag = self.client.get('/api/sensors/feed/')['ETag']
+        response = self.client.get('/api/sensors/feed/', HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len(self.fetched), 2)
+        self.assertNotIn('sensors:feed:*', cache)
+
+
+def live_payload(temperature):
+    return {'sensors': [{'device_id': 'sensor_1', 'temperature': temperature, 'timestamp': str(temperature)}],
+            'source': 'firebase'}
+
+
+class LiveFeedTests(SimpleTestCase):
+    def setUp(self):
+        LiveFeedHub.reset()
+        LiveFeedHub.publish(live_payload(24.0))
+
+    def tearDown(self):
+        LiveFeedHub.reset()
+
+    def test_publish_only_bumps_the_version_when_values_change(self):
+        self.assertFalse(LiveFeedHub.publish(dict(live_payload(24.0), last_updated='later')))
+        self.assertTrue(LiveFeedHub.publish(live_payload(25.0)))
+        self.assertEqual(LiveFeedHub.latest()[0], 2)
+
+    async def test_poll_returns_newer_snapshot(self):
+        response = await self.async_client.get('/api/sensors/live/poll/', {'since': 0})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)['version'], 1)
+
+    async def test_poll_times_out_without_changes(self):
+        response = await self.async_client.get('/api/sensors/live/poll/', {'since': 1, 'timeout': 0.05})
+        self.assertEqual(response.status_code, 204)
+
+    async def test_poll_is_woken_by_a_publish_from_another_thread(self):
+        threading.Timer(0.05, LiveFeedHub.publish, (live_payload(26.0),)).start()
+
+        response = await self.async_client.get('/api/sensors/live/poll/', {'since': 1, 'timeout': 5})
+
+        payload = json.loads(response.content)
+        self.assertEqual((payload['version'], payload['sensors'][0]['temperature']), (2, 26.0))
+
+    async def test_version_from_another_process_gets_the_snapshot(self):
+        response = await self.async_client.get('/api/sensors/live/poll/', {'since': 57, 'timeout': 5})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)['version'], 1)
+
+    async def test_invalid_timeout_is_rejected(self):
+        for timeout in ('nan', 'soon'):
+            response = await self.async_client.get('/api/sensors/live/poll/', {'timeout': timeout})
+            self.assertEqual(response.status_code, 400)
+
+    async def test_sse_sends_snapshots_after_last_event_id(self):
+        response = await self.async_client.get('/api/sensors/live/', headers={'Last-Event-ID': '1'})
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        events = aiter(response.streaming_content)
+
+        self.assertEqual(await anext(events), b'retry: 3000\n\n')
+        threading.Timer(0.05, LiveFeedHub.publish, (live_payload(27.0),)).start()
+        event = (await asyncio.wait_for(anext(events), 5)).decode()
+        await events.aclose()
+
+        lines = event.strip().split('\n')
+        self.assertEqual(lines[:2], ['id: 2', 'event: sensors'])
+        self.assertEqual(json.loads(lines[2][len('data: '):])['sensors'][0]['temperature'], 27.0)
+
+    @override_settings(SENSOR_LIVE_POLL_SECONDS=0.01)
+    def test_poller_feeds_the_hub_and_stops(self):
+        polled = threading.Event()
+
+        def fetch():
+            polled.set()
+            return live_payload(30.0)
+
+        LiveFeedHub.subscribe(fetch)
+        poller = LiveFeedHub._poller
+        self.assertTrue(polled.wait(5))
+        LiveFeedHub.stop_poller(timeout=5)
+
+        self.assertFalse(poller.is_alive())
+        self.assertEqual(LiveFeedHub.latest()[0], 2)
+
+
+def reference_lttb(x, y, threshold):
+    """Textbook LTTB, one point at a time (bucket edges in exact integer arithmetic)."""
+    length, buckets = len(x), threshold - 2
+
+    def edge(bucket):
+        return bucket * (length - 2) // buckets + 1
+
+    selected = [0]
+    for bucket in range(buckets):
+        start, end = edge(bucket), edge(bucket + 1)
+        following = range(end, min(edge(bucket + 2), length))
+        average_x = sum(x[index] for index in following) / len(following)
+        average_y = sum(y[index] for index in following) / len(following)
+        anchor = selected[-1]
+        areas = [abs((x[anchor] - average_x) * (y[index] - y[anchor])
+                     - (x[anchor] - x[index]) * (average_y - y[anchor]))
+                 for index in range(start, end)]
+        selected.append(start + areas.index(max(areas)))
+    return selected + [length - 1]
+
+
+class DownsamplingTests(SimpleTestCase):
+    def test_lttb_matches_the_textbook_algorithm(self):
+        rng = np.random.default_rng(3)
+        x = np.cumsum(rng.uniform(1, 90, 2000))
+        y = np.cumsum(rng.normal(0, 1, 2000))
+
+        for threshold in (3, 10, 97, 500, 1999):
+            self.assertEqual(lttb_indices(x, y, threshold).tolist(), reference_lttb(x.tolist(), y.tolist(), threshold))
+
+    def test_lttb_keeps_the_ends_and_a_lone_peak(self):
+        x = np.arange(1000, dtype=np.float64)
+        y = np.zeros(1000)
+        y[437] = 50.0
+
+        kept_x, kept_y = lttb(x, y, 20)
+
+        self.assertEqual(len(kept_x), 20)
+        self.assertEqual((kept_x[0], kept_x[-1]), (0.0, 999.0))
+        self.assertIn(437.0, kept_x)
+        self.assertEqual(kept_y.max(), 50.0)
+        self.assertTrue(np.all(np.diff(kept_x) > 0))
+
+    def test_lttb_small_inputs_and_thresholds(self):
+        x = np.arange(5.0)
+
+        self.assertEqual(lttb_indices(x, x, 5).tolist(), [0, 1, 2, 3, 4])
+        self.assertEqual(lttb_indices(x, x, 50).tolist(), [0, 1, 2, 3, 4])
+        self.assertEqual(lttb_indices(x, x, 2).tolist(), [0, 4])
+        self.assertEqual(lttb_indices(x, x, 0).tolist(), [])
+        self.assertEqual(lttb_indices(x[:2], x[:2], 1).tolist(), [0, 1])
+
+    def test_choose_resolution_picks_the_coarsest_with_enough_buckets(self):
+        end = datetime(2026, 10, 1)
+        cases = [
+            (timedelta(days=365), 300, 'day'),
+            (timedelta(days=30), 500, 'hour'),
+            (timedelta(hours=24), 500, 'minute'),
+            (timedelta(hours=24), 1440, 'minute'),
+            (timedelta(hours=24), 1441, 'raw'),
+            (timedelta(hours=2), 500, 'raw'),
+        ]
+        for window, points, expected in cases:
+            with self.subTest(window=window, points=points):
+                self.assertEqual(SensorHistoryService.choose_resolution(end - window, end, points), expected)
+
+
+class SensorHistoryTests(TestCase):
+    def setUp(self):
+        AnomalyDetector.reset()
+        # Two hours of gentle readings with one heat peak (written without the detectors, so it is rolled up)
+        temperatures = [24.0 + 0.1 * (index % 7) for index in range(120)]
+        temperatures[75] = 38.0
+        SensorIngestion.write_rows([SensorIngestion.to_model(reading)
+                                    for reading in sensor_readings('sensor_1', temperatures)])
+
+    def tearDown(self):
+        AnomalyDetector.reset()
+
+    def history(self, **params):
+        return self.client.get('/api/sensors/history/', dict({'device': 'sensor_1', 'metric': 'temperature'}, **params))
+
+    def test_window_is_served_from_minute_rollups_and_downsampled(self):
+        response = self.history(**{'from': '2026-10-01T06:00:00', 'to': '2026-10-01T07:59:00', 'points': 20})
+
+        self.assertEqual(response.status_code, 200)
+        series = response.json()
+        self.assertEqual((series['resolution'], series['source_count'], series['count']), ('minute', 120, 20))
+        values = [point['value'] for point in series['points']]
+        self.assertEqual(max(values), 38.0)
+        stored = SensorReading.objects.order_by('timestamp').values_list('timestamp', flat=True)
+        self.assertEqual([datetime.fromisoformat(series['points'][index]['timestamp']) for index in (0, -1)],
+                         [stored.first(), stored.last()])
+
+    def test_short_window_reads_raw_readings(self):
+        response = self.history(**{'from': '2026-10-01T07:10:00', 'to': '2026-10-01T07:19:00'})
+
+        series = response.json()
+        self.assertEqual((series['resolution'], series['source_count'], series['count']), ('raw', 10, 10))
+        self.assertEqual(series['points'][5]['value'], 38.0)
+
+    def test_invalid_queries_are_rejected(self):
+        window = {'from': '2026-10-01T06:00:00', 'to': '2026-10-01T07:00:00'}
+        responses = [
+            self.client.get('/api/sensors/history/', {'metric': 'temperature'}),
+            self.history(metric='colour'),
+            self.history(points='many'),
+            self.history(**{'from': 'yesterday'}),
+            self.history(**{'from': window['to'], 'to': window['from']}),
+        ]
+
+        self.assertEqual([response.status_code for response in responses], [400] * 5)
+        self.assertIn('device', responses[0].json())
+        self.assertIn('metric', responses[1].json())
+
+
+def push_id(milliseconds, suffix='abcdefghijkl'):
+    """Firebase push id created at the given unix time in ms."""
+    prefix = ''
+    for _ in range(8):
+        prefix = PUSH_CHARS[milliseconds % 64] + prefix
+        milliseconds //= 64
+    return prefix + suffix
+
+
+class HistoryImportTests(TestCase):
+    START_MS = 1790000000000
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        AnomalyDetector.reset()
+
+    def tearDown(self):
+        self.directory.cleanup()
+        AnomalyDetector.reset()
+
+    def write(self, name, content):
+        path = os.path.join(self.directory.name, name)
+        opener = gzip.open if name.endswith('.gz') else open
+        with opener(path, 'wt', encoding='utf-8') as handle:
+            handle.write(content)
+        return path
+
+    def export(self, devices=2, readings=5):
+        """RTDB export with push-id history per sensor and a non-sensor node."""
+        return {
+            'config': {'interval': 60},
+            'sensors': {
+                f'sensor_{device}': {
+                    push_id(self.START_MS + index * 60000): {'temprature': 20 + index, 'Moisture': 40, 'PH': 6.5}
+                    for index in range(readings)
+                }
+                for device in range(1, devices + 1)
+            },
+        }
+
+    def test_scanner_matches_full_parse_with_tiny_chunks(self):
+        document = {'a': {'b': [1, {'c': 'x}{', 'd': None}], 'e': {'f': -1.5e3, 'g': True}}, 'h': 'ü'}
+        text = json.dumps(document, ensure_ascii=False).encode()
+
+        records = list(JSONRecordScanner(io.BytesIO(text), chunk_size=3))
+
+        self.assertEqual(records, [
+            (('a', 'b', '1'), {'c': 'x}{', 'd': None}),
+            (('a', 'e'), {'f': -1500.0, 'g': True}),
+            ((), {'h': 'ü'}),
+        ])
+
+    def test_json_export_imports_history_under_root(self):
+        path = self.write('export.json.gz', json.dumps(self.export()))
+
+        checkpoint = HistoryImport(path, root='/sensors', batch_size=3).run()
+
+        self.assertTrue(checkpoint.completed)
+        self.assertEqual((checkpoint.records_done, checkpoint.rows_written), (10, 10))
+        first = SensorReading.objects.filter(device_id='sensor_2').order_by('timestamp').first()
+        # Timestamps come from the push ids
+        self.assertEqual(first.timestamp.timestamp(), self.START_MS / 1000)
+        self.assertEqual((first.temperature, first.soil_moisture, first.humidity), (20.0, 40.0, 60.0))
+
+    def test_csv_import_uses_device_column_and_skips_rows_without_timestamp(self):
+        path = self.write('history.csv', (
+            "device_id,timestamp,temperature,Moisture\n"
+            "field_a,2026-10-01T06:00:00+05:00,21.5,44\n"
+            "field_a,2026-10-01T06:01:00+05:00,21.7,\n"
+            "field_b,,22.0,41\n"
+        ))
+
+        checkpoint = HistoryImport(path).run()
+
+        self.assertEqual((checkpoint.rows_written, checkpoint.records_skipped), (2, 1))
+        self.assertEqual(
+            list(SensorReading.objects.order_by('timestamp').values_list('device_id', 'temperature', 'soil_moisture')),
+            [('field_a', 21.5, 44.0), ('field_a', 21.7, 50.0)],
+        )
+
+    def test_interrupted_import_resumes_without_duplicates(self):
+        path = self.write('export.json', json.dumps(self.export(devices=1, readings=7)))
+        write_rows = SensorIngestion.write_rows
+        calls = []
+
+        def failing_write(rows):
+            calls.append(len(rows))
+            if len(calls) == 2:
+                raise RuntimeError("connection lost")
+            return write_rows(rows)
+
+        with mock.patch.object(SensorIngestion, 'write_rows', side_effect=failing_write):
+            with self.assertRaises(RuntimeError):
+                HistoryImport(path, batch_size=3).run()
+        self.assertEqual(SensorImportCheckpoint.objects.get().records_done, 3)
+
+        importer = HistoryImport(path, batch_size=3)
+        checkpoint = importer.run()
+
+        self.assertEqual(importer.resumed_from, 3)
+        self.assertTrue(checkpoint.completed)
+        self.assertEqual((checkpoint.records_done, checkpoint.rows_written), (7, 7))
+        self.assertEqual(SensorReading.objects.count(), 7)
+        self.assertEqual(SensorRollup.objects.get(resolution='day', metric='temperature').count, 7)
+
+    def test_imported_readings_go_through_the_anomaly_detectors(self):
+        history = {
+            push_id(self.START_MS + index * 60000): {'temprature': 24.0 + 0.3 * ((index % 5) - 2),
+                                                     'Moisture': 40 + index % 3}
+            for index in range(30)
+        }
+        spike_at = self.START_MS + 30 * 60000
+        history[push_id(spike_at)] = {'temprature': 61.0, 'Moisture': 41}
+        path = self.write('spike.json', json.dumps({'sensors': {'sensor_1': history}}))
+
+        HistoryImport(path, batch_size=7).run()
+
+        spike = SensorReading.objects.get(temperature=61.0)
+        self.assertEqual(spike.anomalies, 'temperature:spike,temperature:outlier')
+        self.assertEqual(SensorReading.objects.exclude(anomalies='').count(), 1)
+        day = SensorRollup.objects.get(device_id='sensor_1', metric='temperature', resolution='day')
+        self.assertEqual(day.count, 30)
+        # Saved with the chunks, so live ingestion carries on from the imported history
+        state = SensorDetectorState.objects.get(device_id='sensor_1', metric='temperature')
+        self.assertEqual(MetricDetector.from_json(state.state).count, 31)
+        self.assertFalse(AnomalyDetector.has_unsaved())
+
+    def test_failed_chunk_reloads_the_committed_detector_state(self):
+        path = self.write('export.json', json.dumps(self.export(devices=1, readings=7)))
+        write_rows = SensorIngestion.write_rows
+        calls = []
+
+        def failing_write(rows):
+            calls.append(len(rows))
+            if len(calls) == 2:
+                raise RuntimeError("connection lost")
+            return write_rows(rows)
+
+        with mock.patch.object(SensorIngestion, 'write_rows', side_effect=failing_write):
+            with self.assertRaises(RuntimeError):
+                HistoryImport(path, batch_size=3).run()
+        self.assertNotIn('sensor_1', AnomalyDetector._detectors)
+
+        HistoryImport(path, batch_size=3).run()
+
+        self.assertEqual(AnomalyDetector._detectors['sensor_1']['temperature'].count, 7)
+
+
+class HistoryExportTests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.user = User.objects.create_user('grower@example.com', 'pw', full_name='Grower')
+        other = User.objects.create_user('other@example.com', 'pw', full_name='Other')
+        for owner, fertilizer in ((self.user, 'Urea'), (self.user, 'DAP'), (other, '14-35-14')):
+            FertilizerPrediction.objects.create(
+                user=owner, temperature=25, moisture=40, nitrogen=30, phosphorous=20, potassium=10,
+                recommended_fertilizer=fertilizer, confidence_score=0.8,
+            )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_csv_export_streams_only_the_users_rows(self):
+        response = self.client.get('/api/sensors/predictions/export/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertIn('attachment;', response['Content-Disposition'])
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0].split(',')[:3], ['id', 'user__email', 'created_at'])
+        self.assertEqual([line.split(',')[13] for line in lines[1:]], ['Urea', 'DAP'])
+
+    def test_chunks_are_bounded_by_chunk_size(self):
+        chunks = list(export.iter_chunks(export.queryset_for('fertilizer_predictions'), ('id',), size=2))
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 1])
+
+    def test_sensor_export_filters_by_device(self):
+        SensorIngestion.write_rows([SensorIngestion.to_model(reading) for reading in (
+            sensor_readings('sensor_1', [24.0, 24.5]) + sensor_readings('sensor_2', [30.0])
+        )])
+
+        response = self.client.get('/api/sensors/history/export/', {'device': 'sensor_1'})
+
+        rows = b''.join(response.streaming_content).decode().splitlines()[1:]
+        self.assertEqual([row.split(',')[0] for row in rows], ['sensor_1', 'sensor_1'])
+
+    def test_unavailable_format_is_rejected(self):
+        response = self.client.get('/api/sensors/predictions/export/', {'type': 'xlsx'})
+        self.assertEqual(response.status_code, 400)
+
+    @mock.patch.object(export, 'chunk_size', return_value=1)
+    def test_parquet_export_writes_one_row_group_per_chunk(self, _):
+        if export.pq is None:
+            self.skipTest("pyarrow is not installed")
+        response = self.client.get('/api/sensors/predictions/export/', {'type': 'parquet'})
+
+        parquet = export.pq.ParquetFile(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual((parquet.metadata.num_rows, parquet.metadata.num_row_groups), (2, 2))
+        self.assertEqual(parquet.read().column('recommended_fertilizer').to_pylist(), ['Urea', 'DAP'])
+        self.assertEqual(parquet.schema_arrow.field('created_at').type, export.pa.timestamp('us', tz='UTC'))
+
+    @mock.patch.object(export, 'chunk_size', return_value=1)
+    def test_asgi_export_is_sent_chunk_by_chunk(self, _):
+        # Keep the test transaction's connection open across the request
+        for signal in (request_started, request_finished):
+            signal.disconnect(close_old_connections)
+            self.addCleanup(signal.connect, close_old_connections)
+
+        events = []
+        iter_chunks = export.iter_chunks
+
+        def recorded_chunks(*args, **kwargs):
+            for chunk in iter_chunks(*args, **kwargs):
+                events.append('chunk')
+                yield chunk
+
+        messages = []
+        requests = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+
+        async def receive():
+            if requests:
+                return requests.pop()
+            # The client stays connected
+            await asyncio.Event().wait()
+
+        async def send(message):
+            messages.append(message)
+            if message['type'] == 'http.response.body' and message.get('body'):
+                events.append('body')
+
+        token = str(AccessToken.for_user(self.user))
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+            'scheme': 'http', 'path': '/api/sensors/predictions/export/', 'raw_path': b'/api/sensors/predictions/export/',
+            'query_string': b'', 'root_path': '', 'client': ('127.0.0.1', 40000), 'server': ('testserver', 80),
+            'headers': [(b'host', b'testserver'), (b'authorization', f'Bearer {token}'.encode())],
+        }
+        with mock.patch.object(export, 'iter_chunks', side_effect=recorded_chunks):
+            async_to_sync(ASGIHandler())(scope, receive, send)
+
+        self.assertEqual(messages[0]['status'], 200)
+        # Each chunk goes out before the next one is read: header, then row by row
+        self.assertEqual(events, ['body', 'chunk', 'body', 'chunk', 'body'])
+        body = b''.join(message.get('body', b'') for message in messages[1:]).decode()
+        self.assertEqual([line.split(',')[13] for line in body.splitlines()[1:]], ['Urea', 'DAP'])
+
+
+class FertilizerModelRegistryTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        for name in os.listdir(settings.FERTILIZER_MODEL_DIR):
+            if name.endswith('.pkl'):
+                shutil.copy(os.path.join(settings.FERTILIZER_MODEL_DIR, name), self.directory)
+        settings_override = override_settings(FERTILIZER_MODEL_DIR=self.directory, FERTILIZER_MODEL_CHECK_SECONDS=0)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        FertilizerModels.reset()
+        self.addCleanup(FertilizerModels.reset)
+
+    def test_published_version_is_swapped_in(self):
+        base = FertilizerModels.get()
+        call_command('publish_fertilizer_model', 'v2', stdout=io.StringIO())
+
+        current = FertilizerModels.get()
+
+        self.assertEqual((base.version, current.version), ('base', 'v2'))
+        self.assertTrue(all(name.endswith('.joblib') for name in os.listdir(os.path.join(self.directory, 'v2'))))
+        # The old bundle stays usable by requests that already hold it
+        row = [[25, 60, 40, 2, 8, 30, 10, 20]]
+        with unnamed_features():
+            self.assertEqual(base.model.predict(row).tolist(), current.model.predict(row).tolist())
+
+    def test_incomplete_version_directory_is_ignored(self):
+        os.mkdir(os.path.join(self.directory, 'v3'))
+        shutil.copy(os.path.join(self.directory, 'classifier1.pkl'), os.path.join(self.directory, 'v3'))
+
+        self.assertEqual(FertilizerModels.get().version, 'base')
+
+    def test_broken_pointer_keeps_the_loaded_bundle(self):
+        base = FertilizerModels.get()
+        with open(os.path.join(self.directory, 'CURRENT'), 'w') as pointer:
+            pointer.write('v9\n')
+
+        with self.assertLogs('sensors.model_registry', 'ERROR'):
+            self.assertIs(FertilizerModels.get(), base)
+
+
+class FeatureAssemblerTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.bundle = FertilizerModels.load('base', model_dir())
+
+    def reading(self, **overrides):
+        return dict({
+            'temperature': 28.5, 'humidity': 61.0, 'moisture': 43.0, 'nitrogen': 37,
+            'potassium': 4, 'phosphorous': 12, 'soil_type': 'Clayey', 'crop_type': 'Sugarcane',
+        }, **overrides)
+
+    def test_row_matches_the_label_encoded_dataframe(self):
+        import pandas as pd
+
+        for soil_type in self.bundle.soil_encoder.classes_:
+            reading = self.reading(soil_type=soil_type)
+            frame = pd.DataFrame([{
+                'Temparature': reading['temperature'], 'Humidity': reading['humidity'],
+                'Moisture': reading['moisture'], 'Soil_Type': soil_type, 'Crop_Type': reading['crop_type'],
+                'Nitrogen': reading['nitrogen'], 'Potassium': reading['potassium'],
+                'Phosphorous': reading['phosphorous'],
+            }])
+            frame['Soil_Type'] = self.bundle.soil_encoder.transform(frame['Soil_Type'])
+            frame['Crop_Type'] = self.bundle.crop_encoder.transform(frame['Crop_Type'])
+
+            row = self.bundle.features.row(reading)
+
+            np.testing.assert_array_equal(row, frame.to_numpy(dtype=np.float64))
+            with unnamed_features():
+                np.testing.assert_array_equal(self.bundle.model.predict_proba(row),
+                                              self.bundle.model.predict_proba(frame))
+
+    def test_unknown_label_raises_value_error(self):
+        with self.assertRaisesRegex(ValueError, 'previously unseen labels'):
+            self.bundle.features.row(self.reading(soil_type='Peaty'))
+
+    def test_missing_value_becomes_nan_and_matrix_stacks_rows(self):
+        readings = [self.reading(), self.reading(potassium=None, soil_type='Red')]
+
+        matrix = self.bundle.features.matrix(readings)
+
+        self.assertEqual(matrix.shape, (2, len(self.bundle.features.feature_names)))
+        np.testing.assert_array_equal(matrix[0], self.bundle.features.row(readings[0])[0])
+        self.assertTrue(np.isnan(matrix[1, self.bundle.features.feature_names.index('Potassium')]))
+
+    def test_feature_name_warning_is_silenced_only_around_the_model_call(self):
+        matrix = self.bundle.features.matrix([self.reading()])
+        self.assertFalse(any(pattern is not None and pattern.search('X does not have valid feature names')
+                             for _, pattern, *_ in warnings.filters))
+
+        with override_settings(FERTILIZER_COMPILED_FOREST_MAX_ROWS=0), warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            self.bundle.predict_proba(matrix)
+        self.assertEqual(caught, [])
+
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            self.bundle.model.predict_proba(matrix)
+        self.assertIn('valid feature names', str(caught[0].message))
+
+    def test_model_with_other_columns_is_rejected(self):
+        model = mock.Mock(feature_names_in_=np.array(['Temperature', 'Humidity']))
+
+        with self.assertRaises(ValueError):
+            FeatureAssembler(model, self.bundle.soil_encoder, self.bundle.crop_encoder)
+
+
+class FertilizerPredictTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('grower@example.com', 'pw', full_name='Grower')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def reading(self, index=0, **overrides):
+        return dict({
+            'temperature': 20 + index % 15, 'humidity': 55.0, 'moisture': 30 + index % 30,
+            'nitrogen': index % 40, 'potassium': index % 20, 'phosphorous': index % 45,
+            'soil_type': ('Loamy', 'Clayey', 'Sandy', 'Black', 'Red')[index % 5],
+        }, **overrides)
+
+    @override_settings(FERTILIZER_BATCH_CHUNK_SIZE=4)
+    def test_batch_matches_single_predictions_and_is_saved(self):
+        readings = [self.reading(index) for index in range(10)]
+
+        response = self.client.post('/api/sensors/predict/batch/', readings, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 10)
+        bundle = FertilizerModels.get()
+        for reading, result in zip(readings, response.data['predictions']):
+            row = bundle.features.row(dict(reading, crop_type='Sugarcane'))
+            with unnamed_features():
+                expected = bundle.fertilizer_encoder.inverse_transform(bundle.model.predict(row))[0]
+                self.assertAlmostEqual(result['confidence_score'], bundle.model.predict_proba(row).max())
+            self.assertEqual(result['recommended_fertilizer'], expected)
+            self.assertEqual(FertilizerPrediction.objects.get(pk=result['id']).recommended_fertilizer, expected)
+        self.assertEqual(FertilizerPrediction.objects.filter(user=self.user).count(), 10)
+        self.assertEqual(json.loads(FertilizerPrediction.objects.get(pk=result['id']).alternatives),
+                         result['alternatives'])
+        self.assertLessEqual(set(response.data['guides']),
+                             {result['recommended_fertilizer'] for result in response.data['predictions']})
+
+    @override_settings(FERTILIZER_BATCH_MAX_ROWS=3)
+    def test_invalid_or_oversized_batches_are_rejected(self):
+        too_many = self.client.post('/api/sensors/predict/batch/',
+                                    {'readings': [self.reading(index) for index in range(4)]}, format='json')
+        bad_row = self.client.post('/api/sensors/predict/batch/',
+                                   [self.reading(0), self.reading(1, soil_type='Peaty')], format='json')
+        not_a_list = self.client.post('/api/sensors/predict/batch/', self.reading(0), format='json')
+
+        self.assertEqual([too_many.status_code, bad_row.status_code, not_a_list.status_code], [400, 400, 400])
+        self.assertIn('soil_type', bad_row.data['readings'][1])
+        self.assertFalse(FertilizerPrediction.objects.exists())
+
+    def test_single_prediction_returns_and_stores_top_fertilizers(self):
+        reading = self.reading(7)
+        feed = mock.AsyncMock(return_value={'sensors': []})
+
+        # Under WSGI the enrichment step reads Firebase with the sync client, without an event loop
+        with mock.patch.object(FirebaseService, 'aget_sensor_readings', feed), \
+                mock.patch.object(FirebaseService, 'get_sensor_readings', return_value={'sensors': []}) as sync_feed:
+            response = self.client.post('/api/sensors/predict/', reading, format='json')
+        sync_feed.assert_called_once_with()
+        feed.assert_not_called()
+
+        self.assertEqual(response.status_code, 200)
+        bundle = FertilizerModels.get()
+        row = bundle.features.row(dict(reading, crop_type='Sugarcane'))
+        with unnamed_features():
+            proba = bundle.model.predict_proba(row)[0]
+            expected = bundle.fertilizer_encoder.inverse_transform(bundle.model.predict(row))[0]
+        top = response.data['prediction']['top_fertilizers']
+        self.assertEqual(top[0]['fertilizer'], expected)
+        self.assertEqual(top[0]['fertilizer'], response.data['prediction']['recommended_fertilizer'])
+        self.assertEqual([item['probability'] for item in top],
+                         [p for p in sorted(proba, reverse=True)[:settings.FERTILIZER_TOP_K] if p > 0])
+        stored = FertilizerPrediction.objects.get(pk=response.data['prediction_history']['id'])
+        self.assertEqual(json.loads(stored.alternatives), top[1:])
+
+
+class CompiledForestTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.model = FertilizerModels.load('base', model_dir()).model
+
+    def test_matches_sklearn_predict_proba(self):
+        rng = np.random.default_rng(3)
+        rows = 3000
+        X = np.column_stack([
+            rng.uniform(10, 45, rows), rng.uniform(20, 95, rows), rng.uniform(10, 80, rows),
+            rng.integers(0, 5, rows), rng.integers(0, 17, rows),
+            rng.uniform(0, 150, rows), rng.uniform(0, 200, rows), rng.uniform(0, 90, rows),
+        ])
+        X[rng.random(X.shape) < 0.02] = np.nan
+        forest = CompiledForest.compile(self.model)
+
+        with mock.patch('sensors.forest.BLOCK_ROWS', 1000):
+            proba = forest.predict_proba(X)
+
+        with unnamed_features():
+            np.testing.assert_allclose(proba, self.model.predict_proba(X), rtol=0, atol=1e-12)
+            np.testing.assert_array_equal(forest.predict(X), self.model.predict(X))
+
+    def test_only_fitted_forests_compile(self):
+        with self.assertRaises(ValueError):
+            CompiledForest.compile(mock.Mock(spec=['predict_proba']))
+        with self.assertRaises(ValueError):
+            CompiledForest.compile(self.model).predict_proba(np.zeros((1, 3)))
+
+
+class MetricsTests(SimpleTestCase):
+    def test_registry_renders_prometheus_text_format(self):
+        registry = metrics.Registry()
+        requests = registry.counter('demo_requests_total', 'Requests.', ('path',))
+        latency = registry.histogram('demo_seconds', 'Latency.', buckets=(0.1, 1.0))
+        requests.labels('/a"b').inc()
+        requests.labels('/a"b').inc(2)
+        for value in (0.05, 0.5, 3):
+            latency.observe(value)
+
+        self.assertEqual(registry.render().splitlines(), [
+            '# HELP demo_requests_total Requests.',
+            '# TYPE demo_requests_total counter',
+            'demo_requests_total{path="/a\\"b"} 3',
+            '# HELP demo_seconds Latency.',
+            '# TYPE demo_seconds histogram',
+            'demo_seconds_bucket{le="0.1"} 1',
+            'demo_seconds_bucket{le="1"} 2',
+            'demo_seconds_bucket{le="+Inf"} 3',
+            'demo_seconds_sum 3.55',
+            'demo_seconds_count 3',
+        ])
+        with self.assertRaises(ValueError):
+            requests.labels('/a', 'extra')
+
+    def test_stage_timer_records_duration_and_errors(self):
+        histogram = metrics.STAGE_SECONDS.labels('test_stage')
+        errors = metrics.STAGE_ERRORS.labels('test_stage')
+        count, failed = sum(histogram.counts), errors.value
+
+        with metrics.stage_timer('test_stage'):
+            pass
+        with self.assertRaises(KeyError):
+            with metrics.stage_timer('test_stage'):
+                raise KeyError('boom')
+
+        self.assertEqual((sum(histogram.counts), errors.value), (count + 2, failed + 1))
+
+    def test_metrics_view_is_off_by_default_and_token_protected(self):
+        with override_settings(METRICS_ENABLED=False):
+            self.assertEqual(self.client.get('/metrics').status_code, 404)
+        with override_settings(METRICS_ENABLED=True, METRICS_TOKEN='s3cret'):
+            denied = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer wrong')
+            allowed = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer s3cret')
+
+        self.assertEqual(denied.status_code, 403)
+        self.assertEqual(allowed.status_code, 200)
+        self.assertEqual(allowed['Content-Type'], metrics.CONTENT_TYPE)
+        self.assertIn('# TYPE agriboost_stage_duration_seconds histogram', allowed.content.decode())
+
+
+@override_settings(SENSOR_INGEST_BATCH_SIZE=1000, SENSOR_ANOMALY_ENABLED=False)
+def log_record(msg, level=logging.INFO, *args, name='sensors.test', **extra):
+    record = logging.LogRecord(name, level, __file__, 0, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+class LoggingTests(SimpleTestCase):
+    def test_rate_limit_passes_a_burst_per_template_then_reports_suppressed(self):
+        rate_limit = log.RateLimitFilter(burst=2, interval=60.0)
+        now = [1000.0]
+
+        with mock.patch('agriboost.log.time.monotonic', lambda: now[0]):
+            passed = [rate_limit.filter(log_record('Sensor %s offline', logging.INFO, index)) for index in range(5)]
+            other = rate_limit.filter(log_record('Another message'))
+            error = rate_limit.filter(log_record('Sensor %s offline', logging.ERROR, 9))
+            now[0] += 61.0
+            resumed = log_record('Sensor %s offline', logging.INFO, 5)
+            resumed_passed = rate_limit.filter(resumed)
+
+        self.assertEqual(passed, [True, True, False, False, False])
+        self.assertTrue(other)
+        self.assertTrue(error)
+        self.assertTrue(resumed_passed)
+        self.assertEqual(resumed.suppressed, 3)
+
+    def test_sampling_keeps_one_debug_record_in_rate(self):
+        sampling = log.SamplingFilter(rate=3)
+        debug = [log_record('Polled %s', logging.DEBUG, index) for index in range(9)]
+
+        kept = [record for record in debug if sampling.filter(record)]
+
+        self.assertEqual(len(kept), 3)
+        self.assertEqual({record.sample_rate for record in kept}, {3})
+        self.assertTrue(all(sampling.filter(log_record('Polled', level)) for level in (logging.INFO, logging.WARNING)))
+
+    def test_queued_handler_writes_json_lines_from_the_listener(self):
+        stream = io.StringIO()
+        handler = log.queued_stream_handler(stream)
+        handler.setFormatter(log.JsonFormatter())
+        try:
+            handler.handle(log_record('Flushed %s readings', logging.INFO, 12, device_id='sensor_1'))
+        finally:
+            handler.listener.stop()
+
+        entry = json.loads(stream.getvalue())
+        self.assertEqual(entry['msg'], 'Flushed 12 readings')
+        self.assertEqual(entry['device_id'], 'sensor_1')
+        self.assertEqual(entry['level'], 'INFO')
+
+    def test_full_queue_drops_records_and_reports_the_count(self):
+        handler = log.DroppingQueueHandler(queue.Queue(2))
+        handler.setFormatter(log.JsonFormatter())
+
+        for index in range(5):
+            handler.handle(log_record('Reading %s', logging.INFO, index))
+        self.assertEqual(handler.dropped, 3)
+        handler.queue.get_nowait()
+        handler.queue.get_nowait()
+        handler.handle(log_record('Reading %s', logging.INFO, 5))
+
+        warning, record = (json.loads(handler.queue.get_nowait().msg) for _ in range(2))
+        self.assertEqual(warning['dropped'], 3)
+        self.assertEqual(record['msg'], 'Reading 5')
+        self.assertEqual(handler.dropped, 0)
+
+
+class SensorIngestionTests(TestCase):
+    def setUp(self):
+        SensorIngestion._buffer = []
+        self.addCleanup(setattr, SensorIngestion, '_buffer', [])
+
+    def test_duplicates_are_written_and_rolled_up_once(self):
+        readings = sensor_readings('sensor_1', [20.0, 21.0, 22.0])
+        SensorIngestion.add_many(readings + [dict(readings[0])])
+        self.assertEqual(SensorIngestion.flush(), 3)
+
+        SensorIngestion.add_many(sensor_readings('sensor_1', [20.0, 21.0, 22.0, 23.0]))
+        self.assertEqual(SensorIngestion.flush(), 1)
+
+        self.assertEqual(SensorReading.objects.count(), 4)
+        self.assertEqual(SensorRollup.objects.get(metric='temperature', resolution='hour').count, 4)
+
+    def test_rows_stored_by_another_writer_are_not_rolled_up_again(self):
+        readings = sensor_readings('sensor_1', [20.0, 21.0, 22.0])
+        rows = [SensorIngestion.to_model(reading) for reading in readings]
+        # Another worker stores the first reading after this one checked what is new
+        SensorReading.objects.create(**{field.attname: getattr(rows[0], field.attname)
+                                        for field in SensorReading._meta.concrete_fields if field.attname != 'id'})
+
+        with transaction.atomic():
+            written = SensorIngestion._insert(rows)
+
+        self.assertEqual(written, 2)
+        self.assertEqual(SensorReading.objects.count(), 3)
+        self.assertEqual(SensorRollup.objects.get(metric='temperature', resolution='hour').count, 2)
+
+    def test_failed_flush_keeps_the_readings_for_the_next_one(self):
+        SensorIngestion.add_many(sensor_readings('sensor_1', [20.0, 21.0]))
+        with mock.patch.object(SensorRollups, 'apply', side_effect=OperationalError('database is locked')):
+            with self.assertRaises(OperationalError):
+                SensorIngestion.flush()
+        SensorIngestion.add_many(sensor_readings('sensor_1', [22.0], start=datetime(2026, 10, 1, 6, 2)))
+
+        self.assertEqual(len(SensorIngestion._buffer), 3)
+        self.assertEqual(SensorIngestion.flush(), 3)
+        self.assertEqual(list(SensorReading.objects.order_by('timestamp').values_list('temperature', flat=True)),
+                         [20.0, 21.0, 22.0])
+
+
+class SensorIngestionFlusherTests(SimpleTestCase):
+    def test_flush_loop_keeps_running_after_a_failed_flush(self):
+        stop = mock.Mock()
+        stop.wait.side_effect = [False, False, True]
+
+        with mock.patch.object(SensorIngestion, '_stop_event', stop), \
+                mock.patch.object(SensorIngestion, 'flush', side_effect=[OperationalError('locked'), 2]) as flush, \
+                mock.patch('sensors.ingestion.close_old_connections'), \
+                self.assertLogs('sensors.ingestion', 'ERROR'):
+            SensorIngestion._flush_loop()
+
+        self.assertEqual(flush.call_count, 2)
+        stop.wait.assert_called_with(SensorIngestion.flush_seconds())
+
+    def test_shutdown_skips_the_flush_with_nothing_to_write(self):
+        with mock.patch.object(SensorIngestion, '_stop_event'), \
+                mock.patch.object(AnomalyDetector, 'has_unsaved', return_value=False), \
+                mock.patch.object(SensorIngestion, '_buffer', []), \
+                mock.patch.object(SensorIngestion, '_tables_exist') as tables_exist, \
+                mock.patch.object(SensorIngestion, 'flush') as flush:
+            SensorIngestion.shutdown()
+
+        tables_exist.assert_not_called()
+        flush.assert_not_called()
+
+    def test_shutdown_skips_the_flush_without_tables(self):
+        with mock.patch.object(SensorIngestion, '_stop_event'), \
+                mock.patch.object(SensorIngestion, '_buffer', [mock.Mock()]), \
+                mock.patch.object(SensorIngestion, 'flush') as flush, \
+                mock.patch('sensors.ingestion.connection') as connection, \
+                self.assertLogs('sensors.ingestion', 'WARNING'):
+            connection.introspection.table_names.return_value = ['auth_user']
+            SensorIngestion.shutdown()
+
+        flush.assert_not_called()
+
+
+class SensorRollupTests(TestCase):
+    def readings(self, temperatures, start=datetime(2026, 10, 1, 6, 0), device_id='sensor_1'):
+        return [SensorIngestion.to_model(reading) for reading in sensor_readings(device_id, temperatures, start=start)]
+
+    def rollup(self, resolution='hour', metric='temperature'):
+        return SensorRollup.objects.get(device_id='sensor_1', metric=metric, resolution=resolution)
+
+    def test_batches_are_merged_into_the_same_buckets(self):
+        SensorRollups.apply(self.readings([20.0, 24.0], start=datetime(2026, 10, 1, 6, 10)))
+        # A later batch carrying an older reading does not replace last_value
+        SensorRollups.apply(self.readings([18.0, 30.0], start=datetime(2026, 10, 1, 6, 0)))
+
+        hour = self.rollup()
+        self.assertEqual((hour.min_value, hour.max_value, hour.sum_value, hour.count), (18.0, 30.0, 92.0, 4))
+        self.assertEqual(hour.last_value, 24.0)
+        self.assertEqual(hour.mean_value, 23.0)
+        self.assertEqual(SensorRollup.objects.filter(metric='temperature', resolution='minute').count(), 4)
+        self.assertEqual(self.rollup('day', 'nitrogen').count, 4)
+
+    def test_bucket_created_by_another_writer_is_added_to(self):
+        bucket = SensorRollups.bucket_start(self.readings([0])[0].timestamp, 'hour')
+        SensorRollup.objects.create(
+            device_id='sensor_1', metric='temperature', resolution='hour', bucket_start=bucket,
+            min_value=25.0, max_value=25.0, sum_value=25.0, count=1, last_value=25.0,
+            last_timestamp=bucket,
+        )
+
+        SensorRollups.apply(self.readings([21.0, 22.0]))
+
+        hour = self.rollup()
+        self.assertEqual((hour.min_value, hour.max_value, hour.count, hour.last_value), (21.0, 25.0, 3, 22.0))
+
+    def test_rebuild_matches_incremental_rollups(self):
+        SensorIngestion.write_rows(self.readings([20.0 + index for index in range(7)]))
+        incremental = list(SensorRollup.objects.order_by('metric', 'resolution', 'bucket_start').values_list(
+            'metric', 'resolution', 'bucket_start', 'min_value', 'max_value', 'sum_value', 'count', 'last_value'))
+
+        self.assertEqual(SensorRollups.rebuild(chunk_size=3), 7)
+
+        rebuilt = list(SensorRollup.objects.order_by('metric', 'resolution', 'bucket_start').values_list(
+            'metric', 'resolution', 'bucket_start', 'min_value', 'max_value', 'sum_value', 'count', 'last_value'))
+        self.assertEqual(rebuilt, incremental)
+
+    def test_interrupted_rebuild_keeps_the_old_rollups(self):
+        SensorIngestion.write_rows(self.readings([20.0 + index for index in range(7)]))
+        apply = SensorRollups.apply
+        calls = []
+
+        def failing_apply(readings):
+            calls.append(len(readings))
+            if len(calls) == 2:
+                raise OperationalError('interrupted')
+            return apply(readings)
+
+        with mock.patch.object(SensorRollups, 'apply', side_effect=failing_apply):
+            with self.assertRaises(OperationalError):
+                SensorRollups.rebuild(chunk_size=3)
+
+        self.assertEqual(self.rollup().count, 7)
@@ -3,10 +3,19 @@ URL patterns for the sensors app API endpoints.
 """
 
 from django.urls import path
-from .views import SensorFeedView, FertilizerPredictView, FertilizerHistoryView
+from .views import SensorFeedView, FertilizerPredictView, FertilizerHistoryView, SensorHistoryView
+from .views import FertilizerBatchPredictView
+from .views import FertilizerExportView, SensorReadingExportView
+from .views import sensor_live_feed, sensor_live_poll
 
 urlpatterns = [
     path("feed/", SensorFeedView.as_view(), name="sensor-feed"),
     path("predict/", FertilizerPredictView.as_view(), name="fertilizer-predict"),
+    path("predict/batch/", FertilizerBatchPredictView.as_view(), name="fertilizer-predict-batch"),
     path("predictions/", FertilizerHistoryView.as_view(), name="fertilizer-history"),
+    path("predictions/export/", FertilizerExportView.as_view(), name="fertilizer-export"),
+    path("history/", SensorHistoryView.as_view(), name="sensor-history"),
+    path("history/export/", SensorReadingExportView.as_view(), name="sensor-history-export"),
+    path("live/", sensor_live_feed, name="sensor-live"),
+    path("live/poll/", sensor_live_poll, name="sensor-live-poll"),
 ]
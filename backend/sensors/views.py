@@ -245,28 +245,98 @@ from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from .firebase_service import FirebaseService
+from .stream import SensorStream
+from .live import LiveFeedHub
+from .feed_cache import SensorFeedCache
+from .history_service import SensorHistoryService, DEFAULT_POINTS, DEFAULT_WINDOW, MAX_POINTS
 from .models import FertilizerPrediction
 from .serializers import FertilizerPredictionSerializer, FertilizerPredictionCreateSerializer
-import pickle
-import pandas as pd
+from .model_registry import FertilizerModels
+from .features import unnamed_features
+from .prediction import alternatives_text, batch_max_rows, predict_batch, rank, ranking_json, recommendation_details
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.utils.dateparse import parse_datetime
+from django.views import View
+from agriboost.export import ExportView
+from agriboost.metrics import stage_timer
+import logging
+import math
 
-# Load ML model and encoders
-model = pickle.load(open("sensors/fertilizer model/classifier1.pkl", "rb"))
-fertilizer_encoder = pickle.load(open("sensors/fertilizer model/fertilizer1.pkl", "rb"))
-soil_encoder = pickle.load(open("sensors/fertilizer model/soil_encoder.pkl", "rb"))
-crop_encoder = pickle.load(open("sensors/fertilizer model/crop_encoder.pkl", "rb"))
+logger = logging.getLogger(__name__)
 
 
-class SensorFeedView(APIView):
-    """Fetch live sensor readings from Firebase."""
-    permission_classes = [AllowAny]
+def get_feed_data(device_ids=None):
+    """
+    Current feed payload for the given sensors (None means all).
 
-    def get(self, request):
+    Serves the in-memory stream snapshot; only polls Firebase until the
+    listener has delivered its first event (or if streaming is off).
+    """
+    sensor_data = None
+    if SensorStream.ensure_started():
+        sensor_data = SensorStream.get_snapshot(device_ids)
+    if sensor_data is None:
+        sensor_data = FirebaseService.get_sensor_readings(device_ids)
+        sensor_data.setdefault('age_seconds', 0.0)
+    return sensor_data
+
+
+async def aget_feed_data(device_ids=None):
+    """Coroutine version of get_feed_data; Firebase is polled through the async RTDB client."""
+    sensor_data = None
+    if await SensorStream.aensure_started():
+        sensor_data = SensorStream.get_snapshot(device_ids)
+    if sensor_data is None:
+        sensor_data = await FirebaseService.aget_sensor_readings(device_ids)
+        sensor_data.setdefault('age_seconds', 0.0)
+    return sensor_data
+
+
+class SensorFeedView(View):
+    """
+    Fetch live sensor readings from Firebase.
+
+    Optional query parameter ``devices`` (comma separated sensor ids) limits
+    the response - and the Firebase nodes fetched - to those sensors, which
+    are listed in id order whatever order they were asked in.
+
+    Responses are served from SensorFeedCache and carry an ETag; a request
+    whose If-None-Match matches gets 304 Not Modified, also when the cached
+    entry has expired (the feed is fetched again but not rendered).
+
+    This is an async view (open to anyone, like before): served through
+    agriboost.asgi, concurrent feed requests wait on RTDB on the event loop
+    instead of holding a thread each.
+    """
+
+    async def get(self, request):
         try:
-            sensor_data = FirebaseService.get_sensor_readings()
-            return Response(sensor_data, status=status.HTTP_200_OK)
+            devices_param = request.GET.get('devices')
+            device_ids = None
+            if devices_param:
+                # Canonical order: the cached body is shared by every order of the same ids
+                device_ids = sorted({device_id.strip() for device_id in devices_param.split(',') if device_id.strip()})
+
+            if_none_match = request.headers.get('If-None-Match', '')
+            entry = SensorFeedCache.get(device_ids)
+            if entry is None:
+                entry = await SensorFeedCache.arender(device_ids, aget_feed_data, if_none_match)
+
+            if SensorFeedCache.matches(entry.etag, if_none_match):
+                response = HttpResponseNotModified()
+            else:
+                response = HttpResponse(SensorFeedCache.body(entry), content_type='application/json',
+                                        status=status.HTTP_200_OK)
+            response['ETag'] = entry.etag
+            patch_cache_control(response, public=True, max_age=int(SensorFeedCache.ttl()))
+            return response
         except Exception as e:
-            return Response(
+            return JsonResponse(
                 {
                     'error': 'Failed to fetch sensor readings',
                     'detail': str(e),
@@ -573,6 +643,28 @@ FERTILIZER_GUIDE = {
 }
 
 
+def clean_sensor(firebase_data):
+    """First sensor whose reading was not flagged by sensors.anomaly (None if every one was)."""
+    return next((sensor for sensor in firebase_data.get('sensors') or [] if not sensor.get('anomalies')), None)
+
+
+def fetch_prediction_sensor_data(request):
+    """
+    Firebase enrichment step of FertilizerPredictView.
+
+    Under agriboost.asgi the (sync) view runs in a worker thread of the
+    server's event loop, so async_to_sync awaits the feed on that loop with
+    its pooled RTDB connections. Under WSGI there is no loop to borrow; a
+    new loop per request would pool nothing, so the sync client is used.
+
+    Returns:
+        Feed payload as returned by FirebaseService.get_sensor_readings
+    """
+    if isinstance(request._request, ASGIRequest):
+        return async_to_sync(FirebaseService.aget_sensor_readings)()
+    return FirebaseService.get_sensor_readings()
+
+
 class FertilizerPredictView(APIView):
     """Predict fertilizer recommendation using ML model."""
     permission_classes = [IsAuthenticated]
@@ -606,9 +698,10 @@ class FertilizerPredictView(APIView):
                 
                 # Try to get soil_ph and ec from Firebase if not in frontend data
                 try:
-                    firebase_data = FirebaseService.get_sensor_readings()
-                    if firebase_data.get('sensors') and len(firebase_data['sensors']) > 0:
-                        firebase_sensor = firebase_data['sensors'][0]
+                    firebase_data = fetch_prediction_sensor_data(request)
+                    # Faulty (spiking or stuck) readings are never used to fill gaps
+                    firebase_sensor = clean_sensor(firebase_data)
+                    if firebase_sensor is not None:
                         if sensor_data['soil_ph'] is None:
                             sensor_data['soil_ph'] = firebase_sensor.get('soil_ph')
                         if sensor_data['ec'] is None:
@@ -620,15 +713,20 @@ class FertilizerPredictView(APIView):
                     
             else:
                 # No frontend data - use Firebase data only
-                firebase_data = FirebaseService.get_sensor_readings()
+                firebase_data = fetch_prediction_sensor_data(request)
                 if not firebase_data.get('sensors') or len(firebase_data['sensors']) == 0:
                     return Response(
                         {'error': 'No sensor data available. Provide sensor readings or wait for Firebase data.'},
                         status=status.HTTP_400_BAD_REQUEST
                     )
-                
-                # Get normalized sensor data from Firebase (uses normalize_sensor_data method)
-                firebase_sensor = firebase_data['sensors'][0]
+
+                # Normalized reading of the first sensor not flagged as faulty
+                firebase_sensor = clean_sensor(firebase_data)
+                if firebase_sensor is None:
+                    return Response(
+                        {'error': 'Sensor readings look faulty (spiking or stuck values). Provide sensor readings instead.'},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
                 
                 # Map Firebase fields correctly: soil_moisture -> moisture
                 sensor_data = {
@@ -647,50 +745,31 @@ class FertilizerPredictView(APIView):
                 crop_type = sensor_data['crop_type']
 
             # -------------------------------
-            # 2. Build DataFrame with EXACT training column names
+            # 2. Build the feature row in the training column order
             # -------------------------------
-            # Column order and spelling must match training data EXACTLY:
             # Temparature, Humidity, Moisture, Soil_Type, Crop_Type, Nitrogen, Potassium, Phosphorous
-            data_for_model = pd.DataFrame([{
-                "Temparature": sensor_data['temperature'],  # Note: typo in training column name
-                "Humidity": sensor_data['humidity'],
-                "Moisture": sensor_data['moisture'],  # Correct field name
-                "Soil_Type": soil_type,
-                "Crop_Type": crop_type,  # Fixed to "Sugarcane"
-                "Nitrogen": sensor_data['nitrogen'],
-                "Potassium": sensor_data['potassium'],
-                "Phosphorous": sensor_data['phosphorous']  # Correct spelling
-            }])
-
-            # Encode categorical variables using loaded encoders
-            data_for_model["Soil_Type"] = soil_encoder.transform(data_for_model["Soil_Type"])
-            data_for_model["Crop_Type"] = crop_encoder.transform(data_for_model["Crop_Type"])
+            # (see sensors.features); soil and crop types are label-encoded by dict lookup.
+            # One bundle for the whole request, even if a new version is swapped in meanwhile
+            bundle = FertilizerModels.get()
+            model = bundle.model
+            with stage_timer('feature_build'):
+                data_for_model = bundle.features.row(dict(sensor_data, soil_type=soil_type, crop_type=crop_type))
 
             # -------------------------------
             # 3. Predict fertilizer using trained model
             # -------------------------------
-            pred_encoded = model.predict(data_for_model)[0]
-            fertilizer_name = fertilizer_encoder.inverse_transform([pred_encoded])[0]
-            
-            # Get confidence score if model supports predict_proba
-            confidence_score = None
-            try:
-                if hasattr(model, 'predict_proba'):
-                    proba = model.predict_proba(data_for_model)[0]
-                    confidence_score = float(max(proba))
-                elif hasattr(model, 'decision_function'):
-                    # For some models, use decision function scores
-                    scores = model.decision_function(data_for_model)[0]
-                    if len(scores) == 1:
-                        # Binary classification - convert to probability-like score
-                        confidence_score = float(1 / (1 + abs(scores[0])))
-                    else:
-                        # Multi-class - use max score normalized
-                        max_score = max(scores)
-                        confidence_score = float(max_score / (sum(scores) + 1e-10))
-            except Exception:
-                # If confidence calculation fails, leave as None
-                pass
+            if hasattr(model, 'predict_proba'):
+                # One pass: the class is the most probable fertilizer, the next ones are alternatives
+                with stage_timer('model_predict_proba'):
+                    ranked = rank(bundle, data_for_model)[0]
+                fertilizer_name, confidence_score = ranked[0]
+            else:
+                with stage_timer('model_predict'), unnamed_features():
+                    pred_encoded = model.predict(data_for_model)[0]
+                fertilizer_name = bundle.fertilizer_encoder.inverse_transform([pred_encoded])[0]
+                ranked = [(fertilizer_name, None)]
+                with unnamed_features():
+                    confidence_score = self._decision_confidence(model, data_for_model)
 
             # -------------------------------
             # 4. Get instructions and precautions for the fertilizer
@@ -721,29 +800,25 @@ class FertilizerPredictView(APIView):
             # -------------------------------
             # 5. Save prediction using EXACT model field names
             # -------------------------------
-            fertilizer_prediction = FertilizerPrediction.objects.create(
-                user=request.user,
-                temperature=sensor_data['temperature'],
-                humidity=sensor_data.get('humidity'),
-                moisture=sensor_data['moisture'],  # Model field is 'moisture', not 'soil_moisture'
-                soil_ph=sensor_data.get('soil_ph'),
-                ec=sensor_data.get('ec'),
-                nitrogen=sensor_data['nitrogen'],
-                phosphorous=sensor_data['phosphorous'],  # Model field is 'phosphorous', not 'phosphorus'
-                potassium=sensor_data['potassium'],
-                soil_type=sensor_data.get('soil_type'),
-                crop_type=sensor_data.get('crop_type', 'Sugarcane'),
-                recommended_fertilizer=fertilizer_name,
-                fertilizer_amount=None,  # Not calculated by model
-                confidence_score=confidence_score,
-                recommendation_details=(
-                    f"Predicted using ML model for {sensor_data.get('soil_type', 'Unknown')} "
-                    f"soil and {sensor_data.get('crop_type', 'Sugarcane')} crop. "
-                    f"Based on current sensor readings: Temperature={sensor_data['temperature']}°C, "
-                    f"Moisture={sensor_data['moisture']}%, N={sensor_data['nitrogen']}, "
-                    f"P={sensor_data['phosphorous']}, K={sensor_data['potassium']}."
+            with stage_timer('fertilizer_history_write'):
+                fertilizer_prediction = FertilizerPrediction.objects.create(
+                    user=request.user,
+                    temperature=sensor_data['temperature'],
+                    humidity=sensor_data.get('humidity'),
+                    moisture=sensor_data['moisture'],  # Model field is 'moisture', not 'soil_moisture'
+                    soil_ph=sensor_data.get('soil_ph'),
+                    ec=sensor_data.get('ec'),
+                    nitrogen=sensor_data['nitrogen'],
+                    phosphorous=sensor_data['phosphorous'],  # Model field is 'phosphorous', not 'phosphorus'
+                    potassium=sensor_data['potassium'],
+                    soil_type=sensor_data.get('soil_type'),
+                    crop_type=sensor_data.get('crop_type', 'Sugarcane'),
+                    recommended_fertilizer=fertilizer_name,
+                    fertilizer_amount=None,  # Not calculated by model
+                    confidence_score=confidence_score,
+                    recommendation_details=recommendation_details(sensor_data),
+                    alternatives=alternatives_text(ranked)
                 )
-            )
 
             # -------------------------------
             # 6. Prepare response with required JSON structure
@@ -754,7 +829,9 @@ class FertilizerPredictView(APIView):
                     "instructions": instructions,
                     "precautions": precautions,
                     "fertilizer_amount": fertilizer_prediction.fertilizer_amount,
-                    "confidence_score": confidence_score
+                    "confidence_score": confidence_score,
+                    # Recommendation first, then the fallback options
+                    "top_fertilizers": ranking_json(ranked)
                 },
                 "prediction_history": FertilizerPredictionSerializer(fertilizer_prediction).data,
                 "sensor_readings": {
@@ -775,14 +852,88 @@ class FertilizerPredictView(APIView):
             return Response(response_data, status=status.HTTP_200_OK)
 
         except Exception as e:
-            import traceback
             error_detail = str(e)
-            traceback.print_exc()
+            logger.exception("Fertilizer prediction failed")
             return Response(
                 {"error": "Failed to predict fertilizer", "detail": error_detail},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+    @staticmethod
+    def _decision_confidence(model, data_for_model):
+        """Probability-like score for models without predict_proba (None if unavailable)."""
+        try:
+            if hasattr(model, 'decision_function'):
+                # For some models, use decision function scores
+                scores = model.decision_function(data_for_model)[0]
+                if len(scores) == 1:
+                    # Binary classification - convert to probability-like score
+                    return float(1 / (1 + abs(scores[0])))
+                # Multi-class - use max score normalized
+                max_score = max(scores)
+                return float(max_score / (sum(scores) + 1e-10))
+        except Exception:
+            # If confidence calculation fails, leave as None
+            pass
+        return None
+
+
+class FertilizerBatchPredictView(APIView):
+    """
+    Predict fertilizer recommendations for many readings in one request.
+
+    Endpoint: POST /api/sensors/predict/batch/
+
+    The body is a JSON array of readings (the fields of the single predict
+    endpoint), or an object with the array under "readings". At most
+    FERTILIZER_BATCH_MAX_ROWS readings. Readings are not enriched from
+    Firebase; crop type is always Sugarcane. Every prediction is saved to
+    the user's history, or none is if the batch fails.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        readings = request.data.get('readings') if isinstance(request.data, dict) else request.data
+        if not isinstance(readings, list):
+            return Response(
+                {'error': 'Expected a JSON array of readings, or an object with a "readings" array.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        serializer = FertilizerPredictionCreateSerializer(
+            data=readings, many=True, allow_empty=False, max_length=batch_max_rows()
+        )
+        if not serializer.is_valid():
+            return Response({'readings': serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+        sensor_data = serializer.validated_data
+        for reading in sensor_data:
+            reading['crop_type'] = 'Sugarcane'  # Fixed crop type, as in FertilizerPredictView
+
+        # One bundle for the whole batch, even if a new version is swapped in meanwhile
+        bundle = FertilizerModels.get()
+        try:
+            predictions = predict_batch(bundle, sensor_data, request.user)
+        except ValueError as e:
+            return Response(
+                {"error": "Failed to predict fertilizer", "detail": str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        except Exception as e:
+            logger.exception("Batch fertilizer prediction failed")
+            return Response(
+                {"error": "Failed to predict fertilizer", "detail": str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+        recommended = {prediction['recommended_fertilizer'] for prediction in predictions}
+        return Response({
+            "count": len(predictions),
+            "model_version": bundle.version,
+            "predictions": predictions,
+            # Instructions and precautions once per fertilizer rather than per reading
+            "guides": {name: FERTILIZER_GUIDE[name] for name in sorted(recommended) if name in FERTILIZER_GUIDE},
+            "message": "Fertilizer predictions completed successfully"
+        }, status=status.HTTP_200_OK)
+
 
 class FertilizerHistoryView(APIView):
     """Get fertilizer prediction history for the authenticated user."""
@@ -795,3 +946,167 @@ class FertilizerHistoryView(APIView):
             'count': predictions.count(),
             'results': serializer.data
         }, status=status.HTTP_200_OK)
+
+
+class FertilizerExportView(ExportView):
+    """
+    Download the user's fertilizer prediction history.
+
+    Endpoint: GET /api/sensors/predictions/export/?type=csv|parquet
+    """
+    export = 'fertilizer_predictions'
+
+
+class SensorHistoryView(APIView):
+    """
+    Downsampled history of one sensor metric for charts.
+
+    Endpoint: GET /api/sensors/history/?device=&metric=&from=&to=&points=N
+
+    ``from``/``to`` are ISO 8601 datetimes (default: the last 24 hours) and
+    ``points`` caps the number of points returned (default 500, max 5000).
+    """
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        params = request.query_params
+        device_id = params.get('device')
+        metric = params.get('metric')
+        if not device_id:
+            return Response({'device': 'This query parameter is required.'}, status=status.HTTP_400_BAD_REQUEST)
+        if metric not in SensorHistoryService.METRICS:
+            return Response(
+                {'metric': f"Must be one of: {', '.join(SensorHistoryService.METRICS)}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            points = int(params.get('points', DEFAULT_POINTS))
+        except ValueError:
+            return Response({'points': 'Must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+        points = max(3, min(points, MAX_POINTS))
+
+        end = self._parse_datetime(params.get('to')) if params.get('to') else timezone.now()
+        start = self._parse_datetime(params.get('from')) if params.get('from') else end - DEFAULT_WINDOW
+        if start is None or end is None:
+            return Response({'detail': 'from/to must be ISO 8601 datetimes.'}, status=status.HTTP_400_BAD_REQUEST)
+        if start >= end:
+            return Response({'detail': '"from" must be before "to".'}, status=status.HTTP_400_BAD_REQUEST)
+
+        series = SensorHistoryService.get_series(device_id, metric, start, end, points)
+        return Response(series, status=status.HTTP_200_OK)
+
+    @staticmethod
+    def _parse_datetime(value):
+        try:
+            parsed = parse_datetime(value)
+        except ValueError:
+            return None
+        if parsed is not None and timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed)
+        return parsed
+
+
+class SensorReadingExportView(ExportView):
+    """
+    Download stored sensor readings.
+
+    Endpoint: GET /api/sensors/history/export/?type=csv|parquet&device=&from=&to=
+
+    All filters are optional; ``from``/``to`` are ISO 8601 datetimes.
+    """
+    export = 'sensor_readings'
+
+    def filter_queryset(self, queryset, request):
+        params = request.query_params
+        if params.get('device'):
+            queryset = queryset.filter(device_id=params['device'])
+        for param, lookup in (('from', 'timestamp__gte'), ('to', 'timestamp__lte')):
+            if params.get(param):
+                value = SensorHistoryView._parse_datetime(params[param])
+                if value is None:
+                    raise ValueError('from/to must be ISO 8601 datetimes.')
+                queryset = queryset.filter(**{lookup: value})
+        return queryset
+
+
+# -------------------------------
+# Live feed (async views; serve through agriboost.asgi for one event loop
+# to hold many connections instead of a thread per client)
+# -------------------------------
+
+async def _prime_live_feed():
+    """Publish an initial snapshot if the hub has not received one yet."""
+    version, _ = LiveFeedHub.latest()
+    if version == 0:
+        LiveFeedHub.publish(await sync_to_async(get_feed_data)())
+
+
+async def sensor_live_feed(request):
+    """
+    Push sensor snapshots with Server-Sent Events.
+
+    Endpoint: GET /api/sensors/live/
+
+    Sends an ``sensors`` event with the full feed payload (plus ``version``)
+    whenever a sensor value changes, and a keepalive comment otherwise.
+    Reconnecting clients send Last-Event-ID and only get newer versions
+    (or the current one, if the id is from another worker or before a restart).
+    """
+    await _prime_live_feed()
+    last_event_id = request.headers.get('Last-Event-ID', '')
+    since = int(last_event_id) if last_event_id.isdigit() else 0
+    heartbeat = getattr(settings, 'SENSOR_LIVE_HEARTBEAT_SECONDS', 15.0)
+
+    async def events():
+        LiveFeedHub.subscribe(get_feed_data)
+        try:
+            yield "retry: 3000\n\n"
+            version = since
+            while True:
+                change = await LiveFeedHub.wait_for_change(version, heartbeat)
+                if change is None:
+                    yield ": keepalive\n\n"
+                    continue
+                version, message = change
+                yield f"id: {version}\nevent: sensors\ndata: {message}\n\n"
+        finally:
+            LiveFeedHub.unsubscribe()
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+async def sensor_live_poll(request):
+    """
+    Long-poll fallback for clients without EventSource support.
+
+    Endpoint: GET /api/sensors/live/poll/?since=<version>&timeout=<seconds>
+
+    Returns the feed payload as soon as a version other than ``since`` exists,
+    or 204 No Content after ``timeout`` seconds (default 25, max 60).
+    """
+    await _prime_live_feed()
+    try:
+        since = int(request.GET.get('since', 0))
+        timeout = float(request.GET.get('timeout', 25))
+        if math.isnan(timeout):
+            raise ValueError(timeout)
+        timeout = min(max(timeout, 0.0), 60.0)
+    except ValueError:
+        return HttpResponse(
+            '{"detail": "since and timeout must be numbers."}',
+            status=status.HTTP_400_BAD_REQUEST,
+            content_type='application/json',
+        )
+
+    LiveFeedHub.subscribe(get_feed_data)
+    try:
+        change = await LiveFeedHub.wait_for_change(since, timeout)
+    finally:
+        LiveFeedHub.unsubscribe()
+    if change is None:
+        return HttpResponse(status=status.HTTP_204_NO_CONTENT)
+    return HttpResponse(change[1], content_type='application/json')
@@ -1,6 +1,9 @@
 """
 Test script to check Firebase connection and data fetching.
 Run this from the backend directory: python test_firebase.py
+
+Without credentials, run it against the local stand-in:
+    FIREBASE_BACKEND=local python test_firebase.py
 """
 
 import os
@@ -27,12 +30,14 @@ print(f"   Firebase connected: {is_connected}")
 # First, let's explore the Firebase database structure
 print("\n2. Exploring Firebase database structure...")
 try:
-    from firebase_admin import db
+    backend = FirebaseService.backend()
+    if backend is None:
+        raise RuntimeError("Firebase is not connected")
+    print(f"   Backend: {backend.name}")
     
     # Check root level
     print("\n   Checking root level...")
-    root_ref = db.reference('/')
-    root_data = root_ref.get()
+    root_data = backend.get('/')
     if root_data:
         print(f"   Root level keys: {list(root_data.keys()) if isinstance(root_data, dict) else 'Not a dict'}")
         if isinstance(root_data, dict):
@@ -41,8 +46,7 @@ try:
     
     # Check /sensors path
     print("\n   Checking /sensors path...")
-    sensors_ref = db.reference('/sensors')
-    sensors_data = sensors_ref.get()
+    sensors_data = backend.get('/sensors')
     if sensors_data:
         print(f"   Found data at /sensors!")
         print(f"   Type: {type(sensors_data)}")
@@ -60,8 +64,7 @@ try:
     print("\n   Checking common alternative paths...")
     alt_paths = ['/', '/data', '/Sensor', '/sensor', '/SensorData', '/sensor_data', '/readings']
     for path in alt_paths:
-        alt_ref = db.reference(path)
-        alt_data = alt_ref.get()
+        alt_data = backend.get(path)
         if alt_data:
             print(f"   Found data at {path}!")
             if isinstance(alt_data, dict):
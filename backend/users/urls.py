@@ -1,6 +1,6 @@
 from django.urls import path
 from .views import RegisterView, LoginView, ProfileView, ChangePasswordView, VerifyOTPView
-from .views import UserHistoryListView
+from .views import UserHistoryListView, UserHistoryExportView
 
 urlpatterns = [
     path("register/", RegisterView.as_view(), name="register"),
@@ -9,4 +9,5 @@ urlpatterns = [
     path("profile/", ProfileView.as_view(), name="profile"),
     path("change-password/", ChangePasswordView.as_view(), name="change-password"),
     path("history/", UserHistoryListView.as_view(), name="user-history"),
+    path("history/export/", UserHistoryExportView.as_view(), name="user-history-export"),
 ]
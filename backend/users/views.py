@@ -10,6 +10,7 @@ from .models import UserHistory
 from .serializers import UserHistorySerializer
 from .utils import send_otp_email
 from .utils import generate_otp
+from agriboost.export import ExportView
 
 
 class RegisterView(APIView):
@@ -197,4 +198,9 @@ class UserHistoryListView(generics.ListAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return UserHistory.objects.filter(user=self.request.user).order_by("-created_at")
\ No newline at end of file
+        return UserHistory.objects.filter(user=self.request.user).order_by("-created_at")
+
+
+class UserHistoryExportView(ExportView):
+    """Download the user's account activity history (GET ?type=csv|parquet)."""
+    export = "user_history"